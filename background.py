@@ -0,0 +1,136 @@
+import itertools
+import queue
+import threading
+from concurrent.futures import CancelledError, Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from metrics import increment, timer
+
+# 后台线程数：重算任务依次执行，少占用页面线程的CPU
+BACKGROUND_WORKERS = 1
+
+# 任务优先级：页面正在等待的任务先于保存后预先提交的任务执行
+URGENT, PREFETCH = 0, 1
+
+
+class Recomputer:
+    """后台重算：数据保存后在线程池中重新计算派生结果（统计、排名、导出文件等），页面读取最近一次完成的结果
+
+    tasks 为 {名称: 计算函数}，保存后按顺序提交；on_demand 中的任务（如导出文件）保存后不提交，
+    首次读取某一版本的结果时才计算，结果同样按版本缓存。version 返回当前数据版本号（单调递增）。
+    同一任务同一版本只计算一次，页面请求与后台任务共用同一次计算；
+    提交新版本时取消尚未开始的旧版本任务，已开始的旧任务完成后仍可作为“最近一次的结果”。
+    页面等待的任务插到预先提交的任务之前执行。
+    工作线程为守护线程，进程退出时不等待排队中的任务（如大型导出）。
+    """
+
+    def __init__(self, tasks: Dict[str, Callable[[], Any]], version: Callable[[], int],
+                 workers: int = BACKGROUND_WORKERS, on_demand: Optional[Dict[str, Callable[[], Any]]] = None):
+        self._scheduled = list(tasks)
+        self._tasks = {**tasks, **(on_demand or {})}
+        self._version = version
+        self._lock = threading.Lock()
+        # 各任务最近提交的 (版本号, Future, 优先级) 与最近完成的 (版本号, 结果)
+        self._jobs: Dict[str, Tuple[int, Future, int]] = {}
+        self._results: Dict[str, Tuple[int, Any]] = {}
+        # 任务队列：(优先级, 序号, (任务名, 版本号, Future))，任务为 None 表示停止
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._workers = [threading.Thread(target=self._work, name=f'recompute-{i}', daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def schedule(self, version: Optional[int] = None):
+        """为数据版本 version（默认当前版本）提交全部预先计算的任务"""
+        version = self._version() if version is None else version
+        for name in self._scheduled:
+            self._submit(name, version)
+
+    def _submit(self, name: str, version: int, priority: int = PREFETCH) -> Future:
+        with self._lock:
+            result = self._results.get(name)
+            if result is not None and result[0] >= version:
+                future = Future()
+                future.set_result(result[1])
+                return future
+            job = self._jobs.get(name)
+            if job is not None and not job[1].cancelled():
+                failed = job[1].done() and job[1].exception() is not None
+                # 同一版本的任务已在计算或排队，直接共用（失败的任务重新提交）
+                if job[0] >= version and not failed:
+                    # 页面等待的预先提交任务还在排队时，取消后按高优先级重新提交（其他等待者随后改等新任务）
+                    if not (priority < job[2] and job[0] == version and job[1].cancel()):
+                        increment('recompute.deduplicated')
+                        return job[1]
+                elif job[1].cancel():
+                    increment('recompute.cancelled')
+            future = Future()
+            self._jobs[name] = (version, future, priority)
+            self._queue.put((priority, next(self._sequence), (name, version, future)))
+            return future
+
+    def _work(self):
+        while True:
+            _, _, item = self._queue.get()
+            if item is None:
+                return
+            name, version, future = item
+            # 已取消的任务不再执行
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._run(name, version))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def _run(self, name: str, version: int):
+        with self._lock:
+            # 排队期间已提交了更新的版本
+            if self._jobs[name][0] != version:
+                increment('recompute.skipped')
+                return None
+        with timer(f"recompute.{name}"):
+            value = self._tasks[name]()
+        with self._lock:
+            current = self._results.get(name)
+            if current is None or current[0] < version:
+                self._results[name] = (version, value)
+        return value
+
+    def get(self, name: str) -> Any:
+        """当前数据版本的结果：已完成时直接返回，计算中时等待同一任务，否则提交后等待"""
+        while True:
+            version = self._version()
+            with self._lock:
+                result = self._results.get(name)
+            if result is not None and result[0] >= version:
+                return result[1]
+            try:
+                self._submit(name, version, URGENT).result()
+            except CancelledError:
+                # 等待期间有新的保存，按新版本重新获取
+                continue
+
+    def latest(self, name: str) -> Tuple[Any, bool]:
+        """不等待：返回 (最近一次完成的结果, 是否为当前数据版本的结果)
+
+        不是当前版本时确保已提交当前版本的任务；尚无任何结果时等待当前版本计算完成。
+        """
+        version = self._version()
+        with self._lock:
+            result = self._results.get(name)
+        if result is None:
+            return self.get(name), True
+        if result[0] < version:
+            self._submit(name, version)
+            return result[1], False
+        return result[1], True
+
+    def shutdown(self):
+        """停止后台线程，取消排队中的任务（正在执行的任务完成后线程退出）"""
+        with self._lock:
+            for _, future, _ in self._jobs.values():
+                future.cancel()
+        for _ in self._workers:
+            self._queue.put((URGENT - 1, next(self._sequence), None))
@@ -0,0 +1,257 @@
+"""DataManager 性能基准：生成指定规模的模拟赛事数据，测量保存、加载、排名、统计和导出的耗时、吞吐量与峰值内存
+
+用法示例：
+    python benchmark.py                                   # 1k/10k/100k 选手，JSON 与 SQLite
+    python benchmark.py --sizes 1000000 --backends sqlite
+    python benchmark.py --output baseline.json            # 保存结果作为基线
+    python benchmark.py --baseline baseline.json --threshold 0.2   # 任一项比基线慢20%以上时退出码为1
+    python benchmark.py --sizes 10000 --operations cold_start cold_start_stats    # 新进程打开页面的冷启动耗时
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from data_manager import DataManager
+from exporter import EXPORT_FORMATS
+from storage import StorageBackend, create_storage
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+BACKENDS = ['json', 'sqlite']
+OPERATIONS = ['save', 'load', 'rank', 'stats', 'summary', 'save_one',
+              'export_contestants', 'export_scores', 'export_rankings', 'cold_start', 'cold_start_stats']
+
+# 在子进程中测量的项目，不测峰值内存
+PROCESS_OPERATIONS = {'cold_start', 'cold_start_stats'}
+
+# 冷启动：新的 Python 进程中用 AppTest 渲染一个页面，耗时包含解释器启动和全部导入
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+COLD_START_SCRIPT = """
+import sys
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=300)
+app.session_state['current_page'] = sys.argv[2]
+app.run()
+sys.exit(1 if app.exception else 0)
+"""
+
+# 单个选手保存（增量路径）测量的次数
+SAVE_ONE_COUNT = 100
+
+SURNAMES = '赵钱孙李周吴郑王冯陈褚卫蒋沈韩杨朱秦尤许何吕施张'
+PROVINCES = ['北京', '上海', '江苏', '浙江', '广东', '四川', '湖北', '山东', '河南', '福建']
+
+
+def generate_event(size: int, judges: int = 10, seed: int = 42) -> Tuple[List[Dict], Dict]:
+    """生成 size 名选手及每人 judges 个评委分数，相同参数生成的数据完全一致"""
+    rng = random.Random(seed)
+    contestants = []
+    scores = {}
+    for contestant_id in range(1, size + 1):
+        contestants.append({
+            'id': contestant_id,
+            'name': f"{rng.choice(SURNAMES)}选手{contestant_id}",
+            'gender': rng.choice(['男', '女']),
+            'age': rng.randint(16, 30),
+            'class_name': f"{rng.randint(1, 12)}班",
+            'school': f"第{rng.randint(1, 200)}中学",
+            'province': rng.choice(PROVINCES),
+            'city': '',
+            'phone': f"1{contestant_id:010d}"
+        })
+        base = rng.uniform(60, 95)
+        scores[str(contestant_id)] = [round(min(100.0, max(0.0, rng.gauss(base, 3))), 1) for _ in range(judges)]
+    return contestants, scores
+
+
+def _measure(func: Callable[[], object], memory: bool) -> Tuple[float, Optional[float]]:
+    """返回 (耗时秒数, 峰值内存MB)；测量内存时另跑一次，避免 tracemalloc 的开销计入耗时"""
+    gc.collect()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    if not memory:
+        return seconds, None
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak / 1024 / 1024
+
+
+def run_backend(backend: str, size: int, judges: int, seed: int, operations: List[str],
+                export_format: str, memory: bool) -> List[Dict]:
+    """在临时目录中对一个存储后端、一种规模执行各项测量"""
+    contestants, scores = generate_event(size, judges, seed)
+    directory = tempfile.mkdtemp(prefix=f"bench_{backend}_{size}_")
+    results = []
+
+    def fresh() -> DataManager:
+        # 每次使用新的存储实例，测量不命中内存缓存的冷启动路径
+        storage: StorageBackend = create_storage(backend, directory)
+        return DataManager(storage)
+
+    def save():
+        data_manager = fresh()
+        data_manager.set_judge_count(judges)
+        data_manager.save_contestants(contestants)
+        data_manager.save_scores(scores)
+
+    # 单个选手保存：预热好的 DataManager 和随机数（内存测量的第二次运行接着生成不同的分数）
+    warmed = {}
+    save_one_rng = random.Random(seed)
+
+    def warm_up():
+        # 冷加载和排名索引的整体建立不计入单个保存的耗时
+        data_manager = fresh()
+        data_manager.get_rank(1)
+        warmed['save_one'] = data_manager
+
+    def save_one():
+        data_manager = warmed['save_one']
+        for _ in range(SAVE_ONE_COUNT):
+            contestant_id = save_one_rng.randint(1, size)
+            data_manager.save_contestant_scores(contestant_id, [round(save_one_rng.uniform(60, 100), 1)
+                                                                for _ in range(judges)])
+
+    def export(target: str):
+        return lambda: getattr(fresh(), f"export_{target}")(export_format)
+
+    def cold_start(page: str):
+        # 在数据目录中启动，默认赛事的第1轮即为这份数据
+        env = dict(os.environ, SCORE_STORAGE=backend,
+                   PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(MAIN_SCRIPT),
+                                                            os.environ.get('PYTHONPATH')])))
+        env.pop('SCORE_DB_FILE', None)
+        env.pop('SCORE_EVENTS_DIR', None)
+        return lambda: subprocess.run([sys.executable, '-c', COLD_START_SCRIPT, MAIN_SCRIPT, page],
+                                      cwd=directory, env=env, check=True, capture_output=True)
+
+    measurements = {
+        'save': (save, size),
+        'load': (lambda: (fresh().contestant_table(), fresh().score_table()), size),
+        'rank': (lambda: fresh().get_rankings(), size),
+        'stats': (lambda: fresh().get_statistics(), size),
+        'summary': (lambda: fresh().get_summary(), size),
+        'save_one': (save_one, SAVE_ONE_COUNT),
+        'export_contestants': (export('contestants'), size),
+        'export_scores': (export('scores'), size),
+        'export_rankings': (export('rankings'), size),
+        'cold_start': (cold_start('main'), 1),
+        'cold_start_stats': (cold_start('statistics'), 1),
+    }
+    def precompute():
+        # 统计页用到的摘要和评委分析都已按当前数据版本保存
+        data_manager = fresh()
+        data_manager.get_summary()
+        data_manager.get_judge_analytics()
+
+    # 测量前的准备：摘要类项目测量读取已保存摘要的路径，单个保存只测量增量路径
+    prepare = {
+        'summary': precompute,
+        'cold_start_stats': precompute,
+        'save_one': warm_up,
+    }
+
+    try:
+        # 先写入数据，后续各项都基于同一份数据
+        save()
+        for operation in operations:
+            func, items = measurements[operation]
+            if operation in prepare:
+                prepare[operation]()
+            seconds, peak = _measure(func, memory and operation not in PROCESS_OPERATIONS)
+            results.append({
+                'backend': backend,
+                'size': size,
+                'operation': operation,
+                'seconds': round(seconds, 4),
+                'throughput': round(items / seconds, 1) if seconds else None,
+                'peak_mb': round(peak, 1) if peak is not None else None
+            })
+            print(_format_result(results[-1]), flush=True)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def _format_result(result: Dict) -> str:
+    peak = f"{result['peak_mb']:>9.1f} MB" if result['peak_mb'] is not None else f"{'-':>12}"
+    return (f"{result['backend']:<7}{result['size']:>9}  {result['operation']:<20}"
+            f"{result['seconds']:>10.3f} s{result['throughput'] or 0:>14.0f} /s{peak}")
+
+
+def compare(results: List[Dict], baseline: List[Dict], threshold: float, min_seconds: float) -> List[str]:
+    """与基线比较，返回慢于基线超过阈值的项目说明；耗时都很短的项目不比较以免受抖动影响"""
+    reference = {(r['backend'], r['size'], r['operation']): r['seconds'] for r in baseline}
+    regressions = []
+    for result in results:
+        before = reference.get((result['backend'], result['size'], result['operation']))
+        if before is None or max(before, result['seconds']) < min_seconds:
+            continue
+        if result['seconds'] > before * (1 + threshold):
+            regressions.append(
+                f"{result['backend']} {result['size']} {result['operation']}: "
+                f"{before:.3f}s -> {result['seconds']:.3f}s (+{(result['seconds'] / before - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="DataManager 性能基准")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="选手人数，可指定多个（如 1000 10000 100000 1000000）")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS, help="存储后端")
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS, default=OPERATIONS, help="测量项目")
+    parser.add_argument('--judges', type=int, default=10, help="评委人数")
+    parser.add_argument('--seed', type=int, default=42, help="随机种子")
+    parser.add_argument('--export-format', choices=list(EXPORT_FORMATS), default='xlsx', help="导出格式")
+    parser.add_argument('--no-memory', action='store_true', help="不测量峰值内存（省去第二次运行）")
+    parser.add_argument('--output', help="把结果保存为JSON文件（可作为之后比较的基线）")
+    parser.add_argument('--baseline', help="基线结果JSON文件")
+    parser.add_argument('--threshold', type=float, default=0.25, help="允许比基线慢的比例，默认0.25")
+    parser.add_argument('--min-seconds', type=float, default=0.05, help="耗时低于该值的项目不参与比较")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    print(f"{'backend':<7}{'size':>9}  {'operation':<20}{'time':>12}{'throughput':>17}{'peak':>12}")
+    results = []
+    for size in args.sizes:
+        for backend in args.backends:
+            results.extend(run_backend(backend, size, args.judges, args.seed, args.operations,
+                                       args.export_format, not args.no_memory))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        if regressions:
+            print(f"\n性能回退（超过 {args.threshold:.0%}）：", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print(f"\n与基线相比没有超过 {args.threshold:.0%} 的性能回退")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
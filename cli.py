@@ -0,0 +1,186 @@
+"""选手评分排名系统命令行工具：不启动 Streamlit 界面，用于定时导出、批量重新排名和数据迁移
+
+用法示例：
+    python cli.py import 选手名单.xlsx
+    python cli.py rank --top 10
+    python cli.py rank --aggregate sum --format csv
+    python cli.py stats
+    python cli.py export rankings --format parquet -o 排名.parquet
+    python cli.py --event 春季赛 --round 决赛 export scores --format csv
+    python cli.py report --group-by school --jobs 4 -o 各校报表.zip
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from data_manager import DataManager
+from events import AGGREGATE_METHODS, DEFAULT_EVENT, DEFAULT_ROUND, EventStore
+from columnar import CATEGORY_FIELDS
+from exporter import EXPORT_FORMATS, zip_files
+from ranking import RANK_METHODS
+from storage import StorageError
+
+# 排名输出的列：(字段, 列名)
+RANK_COLUMNS = [('rank', '排名'), ('id', 'ID'), ('name', '姓名'), ('class_name', '班级'),
+                ('school', '学校'), ('final_score', '最终得分')]
+
+# 导出对象：名称 -> (DataManager 导出方法名, 默认文件名前缀)
+EXPORT_TARGETS = {
+    'contestants': ('export_contestants', '选手信息'),
+    'scores': ('export_scores', '评分详情'),
+    'rankings': ('export_rankings', '选手排名'),
+}
+
+
+def _print_rows(rows: List[Dict], columns, fmt: str):
+    """按 text/csv/json 格式输出记录"""
+    if fmt == 'json':
+        json.dump(rows, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+        return
+    if fmt == 'csv':
+        writer = csv.writer(sys.stdout)
+        writer.writerow([label for _, label in columns])
+        for row in rows:
+            writer.writerow([round(row[field], 2) if isinstance(row.get(field), float) else row.get(field, '')
+                             for field, _ in columns])
+        return
+    print('\t'.join(label for _, label in columns))
+    for row in rows:
+        print('\t'.join(
+            f"{row[field]:.2f}" if isinstance(row.get(field), float) else str(row.get(field, ''))
+            for field, _ in columns
+        ))
+
+
+def cmd_import(data_manager: DataManager, args) -> int:
+    from importer import read_contestant_file
+
+    with open(args.file, 'rb') as f:
+        df = read_contestant_file(f, args.file)
+    result = data_manager.import_contestants(df)
+    print(f"成功导入 {result['imported']} 名选手")
+    for error in result['errors']:
+        print(f"第 {error['row']} 行：{error['message']}", file=sys.stderr)
+    return 1 if result['errors'] else 0
+
+
+def cmd_rank(data_manager: DataManager, args) -> int:
+    if args.aggregate:
+        rankings = EventStore(backend=args.storage).aggregate_rankings(args.event, method=args.aggregate,
+                                                                       rank_method=args.rank_method)
+        columns = RANK_COLUMNS[:-1] + [('total_score', '综合得分')]
+    else:
+        rankings = data_manager.get_top(args.top) if args.top else data_manager.get_rankings()
+        columns = RANK_COLUMNS
+    if args.top:
+        rankings = rankings[:args.top]
+    _print_rows(rankings, columns, args.format)
+    return 0
+
+
+def cmd_stats(data_manager: DataManager, args) -> int:
+    # 使用按数据版本保存的摘要，数据未变化时不必加载全部选手和评分
+    json.dump(data_manager.get_summary()['statistics'], sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return 0
+
+
+def cmd_export(data_manager: DataManager, args) -> int:
+    method, prefix = EXPORT_TARGETS[args.target]
+    data = getattr(data_manager, method)(args.format)
+    if data is None:
+        print("没有可导出的数据", file=sys.stderr)
+        return 1
+    output = args.output or f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{EXPORT_FORMATS[args.format][1]}"
+    with open(output, 'wb') as f:
+        f.write(data)
+    print(f"已导出到 {output}")
+    return 0
+
+
+def cmd_report(data_manager: DataManager, args) -> int:
+    files = data_manager.export_report(args.group_by, args.format, args.jobs)
+    if not files:
+        print("没有可导出的数据", file=sys.stderr)
+        return 1
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for name, data in files.items():
+            with open(os.path.join(args.output_dir, name), 'wb') as f:
+                f.write(data)
+        print(f"已导出 {len(files)} 个文件到 {args.output_dir}")
+        return 0
+    output = args.output or f"汇总报表_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    with open(output, 'wb') as f:
+        f.write(zip_files(files))
+    print(f"已导出 {len(files)} 个文件到 {output}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="选手评分排名系统命令行工具")
+    parser.add_argument('--event', default=DEFAULT_EVENT, help=f"赛事名称（默认：{DEFAULT_EVENT}）")
+    parser.add_argument('--round', dest='round_name', default=DEFAULT_ROUND, help=f"轮次名称（默认：{DEFAULT_ROUND}）")
+    parser.add_argument('--storage', choices=['json', 'sqlite'], help="存储后端（默认读取环境变量 SCORE_STORAGE）")
+    parser.add_argument('--time-budget', type=float, help="时间预算（秒），超出时以退出码3结束")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help="从CSV/Excel批量导入选手")
+    import_parser.add_argument('file', help="选手名单文件（.csv/.xlsx/.xls）")
+    import_parser.set_defaults(handler=cmd_import)
+
+    rank_parser = subparsers.add_parser('rank', help="输出排名")
+    rank_parser.add_argument('--top', type=int, help="只输出前N名")
+    rank_parser.add_argument('--aggregate', choices=list(AGGREGATE_METHODS),
+                             help="跨轮次综合排名：sum 加权求和，mean 加权平均")
+    rank_parser.add_argument('--rank-method', choices=list(RANK_METHODS), default='competition',
+                             help="综合排名同分时的名次方式：competition 1224，dense 1223，ordinal 1234")
+    rank_parser.add_argument('--format', choices=['text', 'csv', 'json'], default='text', help="输出格式")
+    rank_parser.set_defaults(handler=cmd_rank)
+
+    stats_parser = subparsers.add_parser('stats', help="输出统计信息（JSON）")
+    stats_parser.set_defaults(handler=cmd_stats)
+
+    export_parser = subparsers.add_parser('export', help="导出选手、评分或排名")
+    export_parser.add_argument('target', choices=list(EXPORT_TARGETS), help="导出对象")
+    export_parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='xlsx', help="导出格式")
+    export_parser.add_argument('-o', '--output', help="输出文件路径")
+    export_parser.set_defaults(handler=cmd_export)
+
+    report_parser = subparsers.add_parser('report', help="导出汇总报表（选手、评分、排名），可按学校等分组，每组一个文件")
+    report_parser.add_argument('--group-by', choices=list(CATEGORY_FIELDS), help="分组字段（默认不分组）")
+    report_parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='xlsx', help="导出格式")
+    report_parser.add_argument('--jobs', type=int, help="并行进程数（默认CPU核数）")
+    output_group = report_parser.add_mutually_exclusive_group()
+    output_group.add_argument('-o', '--output', help="输出zip文件路径")
+    output_group.add_argument('--output-dir', help="输出目录，各文件分别写出")
+    report_parser.set_defaults(handler=cmd_report)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    start = time.perf_counter()
+    try:
+        storage = EventStore(backend=args.storage).open(args.event, args.round_name)
+        data_manager = DataManager(storage, event=args.event, round_name=args.round_name)
+        code = args.handler(data_manager, args)
+    except (StorageError, ValueError, OSError) as e:
+        print(f"错误：{e}", file=sys.stderr)
+        return 2
+
+    elapsed = time.perf_counter() - start
+    if args.time_budget is not None and elapsed > args.time_budget:
+        print(f"超出时间预算：耗时 {elapsed:.2f} 秒，预算 {args.time_budget:.2f} 秒", file=sys.stderr)
+        return 3
+    return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,521 @@
+"""列式内存表示：选手和评分按列存放在 numpy 数组中
+
+选手的ID、年龄为整数数组，姓名、电话为UTF-8字节数组，性别/班级/学校/省份/城市按字典编码；
+评分为 float32 二维矩阵。ContestantTable / ScoreTable 都是只读的，可以像原来的选手列表、
+评分字典一样使用（访问时才生成字典和列表），也提供按列的批量查找、筛选和排序。
+"""
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+import journal
+
+# 选手表的字段（按导出顺序）
+CONTESTANT_FIELDS = ['id', 'name', 'gender', 'age', 'class_name', 'school', 'province', 'city', 'phone']
+
+# 字典编码的字段：取值种类少，每位选手只存一个整数编号
+CATEGORY_FIELDS = ('gender', 'class_name', 'school', 'province', 'city')
+
+# 以UTF-8字节串存放的字段
+STRING_FIELDS = ('name', 'phone')
+
+# 年龄为空；按列存放的年龄上限
+NO_AGE = -1
+MAX_AGE = np.iinfo(np.int16).max
+
+# 字节串超过该长度时整列改为对象数组，避免个别超长取值使定长数组整体膨胀
+MAX_STRING_BYTES = 64
+
+# 评分以 float32 存放，读取时四舍五入到该位数；不超过4位小数的分数与原值完全相同
+SCORE_DECIMALS = 4
+
+# 逐条生成记录时每批转换的行数
+CHUNK_ROWS = 10000
+
+
+def _is_str(value) -> bool:
+    return type(value) is str
+
+
+def _is_age(value) -> bool:
+    return value == '' or type(value) is int and 0 <= value <= MAX_AGE
+
+
+def _string_column(values: List[bytes]) -> np.ndarray:
+    column = np.array(values, dtype=np.bytes_) if values else np.array([], dtype='S1')
+    if column.itemsize > MAX_STRING_BYTES:
+        column = np.array(values, dtype=object)
+    return column
+
+
+def _encode_keys(column: np.ndarray, values: Iterable) -> np.ndarray:
+    """把查找的值转为与该列相同类型的数组"""
+    if column.dtype.kind in 'iu':
+        return np.asarray(values, dtype=np.int64)
+    keys = [v.encode('utf-8') if isinstance(v, str) else b'\xff' for v in values]
+    return np.array(keys, dtype=object if column.dtype == object else np.bytes_)
+
+
+def match_record(contestant: Dict, filters: Dict) -> bool:
+    """选手是否满足筛选条件（学校、省份、班级、性别精确匹配，keyword 匹配姓名或电话）"""
+    for field, value in filters.items():
+        if field == 'keyword':
+            if value not in str(contestant.get('name', '')) and value not in str(contestant.get('phone', '')):
+                return False
+        elif contestant.get(field, '') != value:
+            return False
+    return True
+
+
+class ContestantTable(Sequence):
+    """选手列存表，作为序列使用时按需生成与原来相同的选手字典"""
+
+    def __init__(self, ids: np.ndarray, ages: np.ndarray, strings: Dict[str, np.ndarray],
+                 codes: Dict[str, np.ndarray], categories: Dict[str, List[str]],
+                 extras: Optional[Dict[int, Dict]] = None):
+        self.ids = ids
+        self.ages = ages
+        self.strings = strings
+        self.codes = codes
+        self.categories = categories
+        # 无法按列存放的取值（类型不符或额外字段）：行号 -> {字段: 原值}
+        self.extras = extras or {}
+        # 按需建立的有序索引：字段 -> (行号顺序, 排好序的取值)
+        self._orders = {}
+        self._sort_keys = {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> 'ContestantTable':
+        """由选手字典列表建表"""
+        if isinstance(records, ContestantTable):
+            return records
+        records = records if isinstance(records, list) else list(records)
+        columns = {field: [record.get(field, '') for record in records] for field in CONTESTANT_FIELDS[1:]}
+        columns['id'] = [record['id'] for record in records]
+        known = set(CONTESTANT_FIELDS)
+        extras = {row: {k: v for k, v in record.items() if k not in known}
+                  for row, record in enumerate(records) if not record.keys() <= known}
+        return cls.from_columns(columns, extras)
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, list], extras: Optional[Dict[int, Dict]] = None) -> 'ContestantTable':
+        """由各字段的取值列表建表（列表会被修改）"""
+        extras = extras or {}
+
+        def column(field: str, valid) -> list:
+            """取出一列，不符合列类型的取值放入 extras 并以空值代替"""
+            values = columns.get(field) or [''] * len(columns['id'])
+            # 先按类型和不同的取值检查，全部合规时无需逐行处理
+            if set(map(type, values)) <= {int, str} and all(map(valid, set(values))):
+                return values
+            for row, value in enumerate(values):
+                if not valid(value):
+                    if value != '':
+                        extras.setdefault(row, {})[field] = value
+                    values[row] = ''
+            return values
+
+        ids = np.array(columns['id'], dtype=np.int64)
+        ages = np.array([NO_AGE if age == '' else age for age in column('age', _is_age)], dtype=np.int16)
+        strings = {field: _string_column([value.encode('utf-8') for value in column(field, _is_str)])
+                   for field in STRING_FIELDS}
+        codes, categories = {}, {}
+        for field in CATEGORY_FIELDS:
+            lookup: Dict[str, int] = {}
+            encoded = [lookup.setdefault(value, len(lookup)) for value in column(field, _is_str)]
+            # 编号按取值种类数选用最小的整数类型
+            codes[field] = np.array(encoded, dtype=np.min_scalar_type(max(len(lookup) - 1, 0)))
+            categories[field] = list(lookup)
+        return cls(ids, ages, strings, codes, categories, extras)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(np.arange(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('选手行号超出范围')
+        return self.take([index])[0]
+
+    def __iter__(self) -> Iterator[Dict]:
+        for start in range(0, len(self), CHUNK_ROWS):
+            yield from self.take(np.arange(start, min(start + CHUNK_ROWS, len(self))))
+
+    def take(self, rows) -> List[Dict]:
+        """按行号批量转换为选手字典"""
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = {
+            'id': self.ids[rows].tolist(),
+            'age': [age if age != NO_AGE else '' for age in self.ages[rows].tolist()],
+        }
+        for field in STRING_FIELDS:
+            columns[field] = [value.decode('utf-8') for value in self.strings[field][rows].tolist()]
+        for field in CATEGORY_FIELDS:
+            values = self.categories[field]
+            columns[field] = [values[code] for code in self.codes[field][rows].tolist()]
+        records = [dict(zip(CONTESTANT_FIELDS, row))
+                   for row in zip(*(columns[field] for field in CONTESTANT_FIELDS))]
+        if self.extras:
+            for record, row in zip(records, rows.tolist()):
+                extra = self.extras.get(row)
+                if extra:
+                    record.update(extra)
+        return records
+
+    def with_records(self, records: List[Dict]) -> 'ContestantTable':
+        """返回新增或替换了部分选手的新表（原表不变）：已有ID原位替换，新ID按给出顺序追加在末尾"""
+        if not records:
+            return self
+        # 同一批中ID重复时取最后一条
+        added = ContestantTable.from_records(list({record['id']: record for record in records}.values()))
+        rows = self.lookup('id', added.ids)
+        replaced = np.flatnonzero(rows >= 0)
+        appended = np.flatnonzero(rows < 0)
+        targets = rows[replaced]
+
+        def merge(old: np.ndarray, new: np.ndarray, dtype=None) -> np.ndarray:
+            column = old.astype(dtype or np.result_type(old, new))
+            column[targets] = new[replaced]
+            return np.concatenate([column, new[appended].astype(column.dtype)])
+
+        strings = {}
+        for field in STRING_FIELDS:
+            column = merge(self.strings[field], added.strings[field])
+            if column.dtype != object and column.itemsize > MAX_STRING_BYTES:
+                column = column.astype(object)
+            strings[field] = column
+        codes, categories = {}, {}
+        for field in CATEGORY_FIELDS:
+            values = list(self.categories[field])
+            lookup = {value: code for code, value in enumerate(values)}
+            remap = np.array([lookup.setdefault(value, len(lookup)) for value in added.categories[field]],
+                             dtype=np.int64)
+            values.extend(list(lookup)[len(values):])
+            dtype = np.min_scalar_type(max(len(values) - 1, 0))
+            codes[field] = merge(self.codes[field], remap[added.codes[field]], dtype)
+            categories[field] = values
+
+        extras = dict(self.extras)
+        for row in targets.tolist():
+            extras.pop(row, None)
+        new_rows = np.empty(len(added), dtype=np.int64)
+        new_rows[replaced] = targets
+        new_rows[appended] = len(self) + np.arange(len(appended))
+        for row, extra in added.extras.items():
+            extras[int(new_rows[row])] = extra
+
+        table = ContestantTable(merge(self.ids, added.ids), merge(self.ages, added.ages), strings, codes,
+                                categories, extras)
+        # 已建立的有序索引只删除、插入变化的行，不重新排序整列
+        changed = np.sort(new_rows)
+        for field in self._orders:
+            table._orders[field] = self._patched_order(field, table.column(field), targets, changed)
+        return table
+
+    def _patched_order(self, field: str, column: np.ndarray, replaced: np.ndarray, changed: np.ndarray):
+        """有序索引在部分行变化后的新值：column 为新表的该列，replaced 为被替换的行，changed 为新表中变化的行
+
+        同值的行按行号升序，与整列稳定排序的结果相同。
+        """
+        order, ordered = self._orders[field]
+        if len(replaced):
+            old = self.column(field)[replaced]
+            low = np.searchsorted(ordered, old, side='left')
+            high = np.searchsorted(ordered, old, side='right')
+            positions = [start + int(np.flatnonzero(order[start:stop] == row)[0])
+                         for start, stop, row in zip(low.tolist(), high.tolist(), replaced.tolist())]
+            order, ordered = np.delete(order, positions), np.delete(ordered, positions)
+        ordered = ordered.astype(column.dtype, copy=False)
+        values = column[changed]
+        by_value = np.argsort(values, kind='stable')
+        rows, values = changed[by_value], values[by_value]
+        positions = np.searchsorted(ordered, values, side='left')
+        if len(ordered):
+            # 与已有的行同值时，按行号插入到同值的行之间
+            for i in np.flatnonzero(ordered[np.minimum(positions, len(ordered) - 1)] == values).tolist():
+                start = positions[i]
+                stop = np.searchsorted(ordered, values[i], side='right')
+                positions[i] = start + np.searchsorted(order[start:stop], rows[i])
+        return np.insert(order, positions, rows), np.insert(ordered, positions, values)
+
+    def column(self, field: str) -> np.ndarray:
+        """某字段的原始列：ID/年龄为整数，姓名/电话为字节串，其余为字典编号"""
+        if field == 'id':
+            return self.ids
+        if field == 'age':
+            return self.ages
+        if field in STRING_FIELDS:
+            return self.strings[field]
+        return self.codes[field]
+
+    def _sorted(self, field: str):
+        cached = self._orders.get(field)
+        if cached is None:
+            column = self.column(field)
+            order = np.argsort(column, kind='stable')
+            cached = self._orders[field] = (order, column[order])
+        return cached
+
+    def lookup(self, field: str, values: Iterable) -> np.ndarray:
+        """按ID/姓名/电话批量查找行号，找不到为-1；取值重复时取最后一行（与原来的字典索引一致）"""
+        order, ordered = self._sorted(field)
+        keys = _encode_keys(ordered, values)
+        if not len(ordered) or not len(keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        at = np.searchsorted(ordered, keys, side='right') - 1
+        clipped = np.maximum(at, 0)
+        found = (at >= 0) & (ordered[clipped] == keys)
+        return np.where(found, order[clipped], -1)
+
+    def find(self, field: str, value) -> Optional[int]:
+        """按ID/姓名/电话查找单个选手的行号"""
+        row = int(self.lookup(field, [value])[0])
+        return row if row >= 0 else None
+
+    def position(self, contestant_id) -> Optional[int]:
+        """按选手ID查找行号"""
+        return self.find('id', contestant_id)
+
+    def distinct(self, field: str) -> List[str]:
+        """字典编码字段中实际出现的取值"""
+        counts = np.bincount(self.codes[field], minlength=len(self.categories[field]))
+        return [value for value, count in zip(self.categories[field], counts.tolist()) if count]
+
+    def mask(self, filters: Dict) -> np.ndarray:
+        """按筛选条件批量计算布尔掩码，语义与 match_record 相同"""
+        mask = np.ones(len(self), dtype=bool)
+        for field, value in filters.items():
+            if field == 'keyword':
+                keyword = value.encode('utf-8')
+                matched = np.zeros(len(self), dtype=bool)
+                for name in STRING_FIELDS:
+                    column = self.strings[name]
+                    if column.dtype == object:
+                        matched |= np.fromiter((keyword in v for v in column), dtype=bool, count=len(column))
+                    else:
+                        matched |= np.char.find(column, keyword) >= 0
+                mask &= matched
+            elif field in CATEGORY_FIELDS:
+                if value in self.categories[field]:
+                    mask &= self.codes[field] == self.categories[field].index(value)
+                else:
+                    mask[:] = False
+            elif field in STRING_FIELDS or field == 'id':
+                column = self.column(field)
+                mask &= column == _encode_keys(column, [value])[0]
+            elif field == 'age' and type(value) is int:
+                mask &= self.ages == value
+            else:
+                mask &= np.fromiter((record.get(field, '') == value for record in self),
+                                    dtype=bool, count=len(self))
+        # 非常规取值按字典逐条判断
+        for row in self.extras:
+            mask[row] = match_record(self[row], filters)
+        return mask
+
+    def sort_key(self, field: str) -> np.ndarray:
+        """排序用的整数键：数字按大小排在前，其余按字符串排序（与原来的排序规则一致）"""
+        key = self._sort_keys.get(field)
+        if key is not None:
+            return key
+        if field == 'id':
+            key = self.ids
+        elif field == 'age':
+            # 空年龄按字符串处理，排在所有数字之后
+            key = np.where(self.ages == NO_AGE, np.iinfo(np.int32).max, self.ages.astype(np.int32))
+        elif field in STRING_FIELDS:
+            key = np.unique(self.strings[field], return_inverse=True)[1].ravel()
+        elif field in CATEGORY_FIELDS:
+            values = self.categories[field]
+            ranks = np.empty(len(values), dtype=np.int64)
+            ranks[sorted(range(len(values)), key=values.__getitem__)] = np.arange(len(values))
+            key = ranks[self.codes[field]] if len(values) else np.zeros(0, dtype=np.int64)
+        else:
+            key = np.zeros(len(self), dtype=np.int64)
+        self._sort_keys[field] = key
+        return key
+
+    def order(self, rows: np.ndarray, field: str, descending: bool = False) -> np.ndarray:
+        """按字段对行号稳定排序；降序时同值保持原有先后（同 list.sort(reverse=True)）"""
+        key = self.sort_key(field)[rows]
+        if descending:
+            # 整数键取反后升序稳定排序即为降序稳定排序
+            key = -key.astype(np.int64)
+        return rows[np.argsort(key, kind='stable')]
+
+
+class ScoreTable(Mapping):
+    """评分列存表：选手ID数组 + float32 分数矩阵（NaN 为空缺）+ 每位选手的分数个数
+
+    作为映射使用时与原来的 {选手ID字符串: [评委分数]} 相同，按录入顺序迭代。
+    """
+
+    def __init__(self, ids: np.ndarray, matrix: np.ndarray, lengths: np.ndarray):
+        self.ids = ids
+        self.matrix = matrix
+        self.lengths = lengths
+        self._order = None
+
+    @classmethod
+    def empty(cls) -> 'ScoreTable':
+        return cls(np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.float32), np.zeros(0, dtype=np.int32))
+
+    @classmethod
+    def from_dict(cls, scores: Mapping) -> 'ScoreTable':
+        """由 {选手ID字符串: [评委分数]} 建表"""
+        if isinstance(scores, ScoreTable):
+            return scores
+        ids = np.fromiter((int(key) for key in scores), dtype=np.int64, count=len(scores))
+        lengths = np.fromiter((len(values) for values in scores.values()), dtype=np.int32, count=len(scores))
+        width = int(lengths.max()) if len(lengths) else 0
+        if len(lengths) and lengths.min() == width:
+            # 各选手评委人数一致时整体转换
+            try:
+                return cls(ids, np.array(list(scores.values()), dtype=np.float32).reshape(len(ids), width), lengths)
+            except (TypeError, ValueError):
+                pass
+        matrix = np.full((len(scores), width), np.nan, dtype=np.float32)
+        for row, values in enumerate(scores.values()):
+            matrix[row, :len(values)] = [np.nan if value is None else value for value in values]
+        return cls(ids, matrix, lengths)
+
+    @classmethod
+    def from_rows(cls, contestant_ids: np.ndarray, judges: np.ndarray, scores: np.ndarray) -> 'ScoreTable':
+        """由 (选手ID, 评委序号, 分数) 三列建表，选手按ID升序"""
+        ids, rows = np.unique(contestant_ids, return_inverse=True)
+        lengths = np.zeros(len(ids), dtype=np.int32)
+        np.maximum.at(lengths, rows, judges.astype(np.int32) + 1)
+        matrix = np.full((len(ids), int(lengths.max()) if len(ids) else 0), np.nan, dtype=np.float32)
+        matrix[rows, judges] = scores
+        return cls(ids, matrix, lengths)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[str]:
+        return (str(contestant_id) for contestant_id in self.ids.tolist())
+
+    def __contains__(self, key) -> bool:
+        try:
+            return self.row(int(key)) is not None
+        except (TypeError, ValueError):
+            return False
+
+    def __getitem__(self, key) -> List[float]:
+        try:
+            row = self.row(int(key))
+        except (TypeError, ValueError):
+            row = None
+        if row is None:
+            raise KeyError(key)
+        return self.scores(row)
+
+    def rows(self, contestant_ids) -> np.ndarray:
+        """批量查找选手所在行，没有评分为-1"""
+        if self._order is None:
+            order = np.argsort(self.ids, kind='stable')
+            self._order = (order, self.ids[order])
+        order, ordered = self._order
+        keys = np.asarray(contestant_ids, dtype=np.int64)
+        if not len(ordered) or not len(keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        at = np.minimum(np.searchsorted(ordered, keys), len(ordered) - 1)
+        return np.where(ordered[at] == keys, order[at], -1)
+
+    def row(self, contestant_id: int) -> Optional[int]:
+        row = int(self.rows([contestant_id])[0])
+        return row if row >= 0 else None
+
+    def decoded(self, rows=None) -> np.ndarray:
+        """取出若干行的 float64 分数矩阵（四舍五入到 SCORE_DECIMALS 位小数，空缺为NaN）"""
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        return np.round(matrix.astype(np.float64), SCORE_DECIMALS)
+
+    def scores(self, row: int) -> List[float]:
+        """某一行的评委分数列表"""
+        values = self.decoded(row)[:self.lengths[row]].tolist()
+        return [None if value != value else value for value in values]
+
+    def complete(self, judge_count: int, rows=None) -> np.ndarray:
+        """各行是否已有全部 judge_count 位评委的分数"""
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if matrix.shape[1] < judge_count:
+            return np.zeros(len(matrix), dtype=bool)
+        return ~np.isnan(matrix[:, :judge_count]).any(axis=1)
+
+    def score_lists(self, rows) -> List[List[float]]:
+        """若干行的评委分数列表"""
+        rows = np.asarray(rows, dtype=np.int64)
+        matrix = self.decoded(rows).tolist()
+        lengths = self.lengths[rows].tolist()
+        return [[None if value != value else value for value in values[:length]]
+                for values, length in zip(matrix, lengths)]
+
+    def to_dict(self) -> Dict[str, List[float]]:
+        """转换为 {选手ID字符串: [评委分数]}"""
+        result = {}
+        for start in range(0, len(self), CHUNK_ROWS):
+            rows = np.arange(start, min(start + CHUNK_ROWS, len(self)))
+            result.update(zip(map(str, self.ids[rows].tolist()), self.score_lists(rows)))
+        return result
+
+    def with_scores(self, updates: Mapping[int, List]) -> 'ScoreTable':
+        """返回替换了部分选手分数的新表（原表不变）；分数列表为空表示删除该选手"""
+        if not updates:
+            return self
+        width = max([self.matrix.shape[1]] + [len(values) for values in updates.values()])
+        matrix = np.full((len(self), width), np.nan, dtype=np.float32)
+        matrix[:, :self.matrix.shape[1]] = self.matrix
+        lengths = self.lengths.copy()
+        keep = np.ones(len(self), dtype=bool)
+        new_ids, new_rows = [], []
+        for contestant_id, row in zip(updates, self.rows(list(updates)).tolist()):
+            values = [np.nan if value is None else value for value in updates[contestant_id]]
+            if row < 0:
+                if values:
+                    new_ids.append(contestant_id)
+                    new_rows.append(values)
+            elif values:
+                matrix[row] = np.nan
+                matrix[row, :len(values)] = values
+                lengths[row] = len(values)
+            else:
+                keep[row] = False
+
+        ids = self.ids
+        if keep.all() and not new_ids:
+            # 选手不变时沿用按ID的有序索引
+            table = ScoreTable(ids, matrix, lengths)
+            table._order = self._order
+            return table
+        if not keep.all():
+            ids, matrix, lengths = ids[keep], matrix[keep], lengths[keep]
+        if new_ids:
+            added = np.full((len(new_rows), width), np.nan, dtype=np.float32)
+            for i, values in enumerate(new_rows):
+                added[i, :len(values)] = values
+            ids = np.concatenate([ids, np.array(new_ids, dtype=np.int64)])
+            matrix = np.concatenate([matrix, added])
+            lengths = np.concatenate([lengths, np.array([len(v) for v in new_rows], dtype=np.int32)])
+        table = ScoreTable(ids, matrix, lengths)
+        # 只追加了ID更大的选手时（ID单调分配），沿用并延长按ID的有序索引
+        if (keep.all() and self._order is not None and new_ids == sorted(new_ids)
+                and (not len(self.ids) or new_ids[0] > self._order[1][-1])):
+            order, ordered = self._order
+            table._order = (np.concatenate([order, len(self) + np.arange(len(new_ids))]),
+                            np.concatenate([ordered, np.array(new_ids, dtype=np.int64)]))
+        return table
+
+    def apply_events(self, events: List[Dict]) -> 'ScoreTable':
+        """应用评分事件日志，返回新表"""
+        # 只把涉及的选手转成列表，按原来的逐条规则应用后整体替换
+        affected = np.array(list(dict.fromkeys(int(event['id']) for event in events)), dtype=np.int64)
+        found = self.rows(affected)
+        present = found >= 0
+        scores = dict(zip(map(str, affected[present].tolist()), self.score_lists(found[present])))
+        journal.apply_events(scores, events)
+        return self.with_scores({contestant_id: scores.get(str(contestant_id), [])
+                                 for contestant_id in affected.tolist()})
@@ -1,75 +1,530 @@
-﻿import json
-import os
-import pandas as pd
-from typing import Dict, List, Any
-from datetime import datetime
-import io
+﻿from collections import deque
+from typing import Callable, Dict, List, Any, Optional
+import threading
+
+import numpy as np
+
+from background import BACKGROUND_WORKERS, Recomputer
+from columnar import CATEGORY_FIELDS, CHUNK_ROWS, ContestantTable, ScoreTable
+from events import EventStore
+from exporter import export_reports, export_rows
+from judges import analyze_judges
+from metrics import timed
+from ranking import RankingIndex, normalize_ranking, sort_keys
+from scoring import DEFAULT_JUDGE_COUNT, final_score, normalize_rule, score_matrix, summarize
+from stats import StatsAggregator
+from storage import CONTESTANT_COLUMN_NAMES, CONTESTANT_FIELDS, StorageBackend, create_storage
+
+# 保留最近多少条排行榜变更记录，订阅方落后更多时整体刷新
+CHANGE_LOG_SIZE = 1000
+
+# 排名导出的列
+RANKING_COLUMNS = ['排名', 'ID', '姓名', '性别', '年龄', '班级', '学校', '省份', '城市',
+                   '联系电话', '最终得分', '最高分', '最低分', '平均分']
+
+
+def _advance(version, part: int, written) -> Optional[tuple]:
+    """增量状态对应数据版本 version 时，计入一次写入后的数据版本
+    
+    written 为被写入的表（version[part]）的 (写入前版本, 写入后版本)。写入前版本与 version 中的一致时
+    返回写入后的数据版本；否则返回None，说明期间有其他写入未计入增量状态，需要整体重建。
+    """
+    if version is None or version[part] != written[0]:
+        return None
+    return version[:part] + (written[1],) + version[part + 1:]
+
 
 class DataManager:
-    def __init__(self):
-        self.contestants_file = "contestants.json"
-        self.scores_file = "scores.json"
-        
+    def __init__(self, storage: Optional[StorageBackend] = None, event: Optional[str] = None,
+                 round_name: Optional[str] = None):
+        # 存储后端可替换（JSON文件或SQLite），公开接口保持不变；
+        # 指定赛事和轮次时使用该轮次的独立存储分片
+        if storage is None and event is not None:
+            storage = EventStore().open(event, round_name)
+        self.storage = storage or create_storage()
+        self.event = event
+        self.round_name = round_name
+        # 排名索引及其对应的数据版本；版本不一致时整体重建
+        self._ranking = RankingIndex()
+        self._ranking_version = None
+        self._ranking_lock = threading.Lock()
+        # 选手写操作锁：批量导入的校验与写入在同一把锁内完成
+        self._contestant_lock = threading.RLock()
+        # 筛选项缓存：(选手数据版本, 各字段取值)
+        self._filter_options = None
+        # 评委分析缓存：(数据版本, 分析结果)
+        self._judge_analytics = None
+        # 统计聚合结果及其对应的数据版本；加锁顺序：选手锁/排名锁 -> 统计锁
+        self._stats = StatsAggregator()
+        self._stats_version = None
+        self._stats_lock = threading.Lock()
+        # 排行榜变更通知：版本号、最近的变更记录 (版本号, 选手ID列表或None表示全部)、订阅者
+        self._change_version = 0
+        self._change_log = deque(maxlen=CHANGE_LOG_SIZE)
+        self._change_storage_version = None
+        self._subscribers: List[Callable[[Dict], None]] = []
+        self._change_lock = threading.Lock()
+        # 后台重算（start_background 启动后可用）
+        self.background: Optional[Recomputer] = None
+    
+    def get_cache_stats(self) -> Dict:
+        """获取缓存命中统计"""
+        return self.storage.get_cache_stats()
+    
+    @timed()
+    def contestant_table(self) -> ContestantTable:
+        """选手信息的只读列存表（可按选手字典列表遍历，不可修改）"""
+        return self.storage.load_contestants()
+    
     def load_contestants(self) -> List[Dict]:
-        """加载选手信息"""
-        if os.path.exists(self.contestants_file):
-            try:
-                with open(self.contestants_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
+        """加载选手信息（可修改的选手字典列表，修改后用 save_contestants 保存）"""
+        return list(self.contestant_table())
     
+    @timed()
     def save_contestants(self, contestants: List[Dict]) -> bool:
         """保存选手信息"""
-        try:
-            with open(self.contestants_file, 'w', encoding='utf-8') as f:
-                json.dump(contestants, f, ensure_ascii=False, indent=2)
-            return True
-        except:
+        if not self.storage.save_contestants(contestants):
             return False
+        self._publish(None)
+        return True
+    
+    def _contestants_version(self):
+        return self.storage.get_version()[0]
+    
+    def _write_contestants(self, write: Callable[[], Optional[tuple]], contestants: List[Dict]) -> bool:
+        """执行选手写操作，统计结果对应写入前的数据时增量更新
+        
+        write 返回选手版本的 (写入前, 写入后)，期间有其他进程写入时不做增量更新，下次读取时整体重建。
+        """
+        with self._contestant_lock, self._stats_lock:
+            written = write()
+            if not written:
+                return False
+            stats_version = _advance(self._stats_version, 0, written)
+            if stats_version is not None:
+                for contestant in contestants:
+                    self._stats.update_contestant(contestant)
+                self._stats_version = stats_version
+        self._publish([contestant['id'] for contestant in contestants])
+        return True
+    
+    def _find(self, field: str, value) -> Optional[Dict]:
+        """按列存表的有序索引查找单个选手（写入后由存储后端增量维护，不重新排序）"""
+        table = self.contestant_table()
+        row = table.find(field, value)
+        return table[row] if row is not None else None
     
-    def load_scores(self) -> Dict:
-        """加载评分信息"""
-        if os.path.exists(self.scores_file):
-            try:
-                with open(self.scores_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
+    def get_contestant(self, contestant_id) -> Optional[Dict]:
+        """按ID查找选手"""
+        return self._find('id', int(contestant_id))
     
+    def find_by_phone(self, phone: str) -> Optional[Dict]:
+        """按联系电话查找选手"""
+        return self._find('phone', phone)
+    
+    def exists_name(self, name: str) -> bool:
+        """选手姓名是否已存在"""
+        return self._find('name', name) is not None
+    
+    @timed()
+    def add_contestant(self, contestant: Dict) -> bool:
+        """新增或更新单个选手，未提供ID时自动分配新ID（写回 contestant['id']）"""
+        if contestant.get('id') is None:
+            contestant['id'] = self.storage.allocate_ids(1)
+        return self._write_contestants(lambda: self.storage.upsert_contestant(contestant), [contestant])
+    
+    @timed()
+    def import_contestants(self, df) -> Dict:
+        """批量导入选手：整表校验、检查姓名和电话唯一、分配ID并一次写入
+        
+        返回 {'imported': 导入人数, 'errors': [{'row': 行号, 'message': 错误原因}]}
+        """
+        from importer import validate_contestants
+        
+        # 校验与写入在同一把锁内完成，避免并发新增造成重复
+        with self._contestant_lock:
+            table = self.contestant_table()
+            records, errors = validate_contestants(df, table)
+            next_id = self.storage.allocate_ids(len(records)) if records else 0
+            new_contestants = [{'id': next_id + i, **record} for i, record in enumerate(records)]
+            
+            if new_contestants and not self._write_contestants(
+                    lambda: self.storage.insert_contestants(new_contestants), new_contestants):
+                return {'imported': 0, 'errors': [{'row': 0, 'message': '保存失败，请重试！'}]}
+        return {'imported': len(new_contestants), 'errors': errors}
+    
+    @timed()
+    def score_table(self) -> ScoreTable:
+        """评分信息的只读列存表（可按 {选手ID字符串: [评委分数]} 读取，不可修改）"""
+        return self.storage.load_scores()
+    
+    def load_scores(self) -> Dict[str, List[float]]:
+        """加载评分信息（可修改的 {选手ID字符串: [评委分数]}，修改后用 save_scores 保存）"""
+        return self.score_table().to_dict()
+    
+    @timed()
     def save_scores(self, scores: Dict) -> bool:
         """保存评分信息"""
-        try:
-            with open(self.scores_file, 'w', encoding='utf-8') as f:
-                json.dump(scores, f, ensure_ascii=False, indent=2)
-            return True
-        except:
+        if not self.storage.save_scores(scores):
+            return False
+        self._publish(None)
+        return True
+    
+    @timed()
+    def save_contestant_scores(self, contestant_id, scores: List[float]) -> bool:
+        """保存单个选手的评委分数，并在排名索引中只调整该选手的位置"""
+        return self._write_contestant_scores(contestant_id,
+                                             lambda: self.storage.upsert_scores(contestant_id, scores))
+    
+    @timed()
+    def submit_judge_score(self, contestant_id, judge_index: int, score: Optional[float]) -> bool:
+        """提交单个评委对单个选手的分数（judge_index 从0开始，score 为None表示撤回）
+        
+        只写入该评委的分数，不改写其他评委已提交的分数，各评委可在各自设备上同时提交。
+        选手集齐全部评委的分数后才计入排名和统计。
+        """
+        judge_count = self.get_settings()['judge_count']
+        if not 0 <= judge_index < judge_count:
+            raise ValueError(f"评委序号必须在1到{judge_count}之间")
+        if score is not None and not 0 <= score <= 100:
+            raise ValueError("分数必须在0到100之间")
+        return self._write_contestant_scores(
+            contestant_id, lambda: self.storage.upsert_judge_score(contestant_id, judge_index, score))
+    
+    def _write_contestant_scores(self, contestant_id, write: Callable[[], Optional[tuple]]) -> bool:
+        """写入单个选手的分数，排名索引和统计中只调整该选手（分数不完整时移出排名）
+        
+        写入后只读取该选手的分数，不重新加载全部评分。
+        write 返回评分版本的 (写入前, 写入后)：写入前版本与增量状态一致时才增量更新并记为写入后的版本，
+        否则（期间有其他进程写入）保留原版本号，下次读取时整体重建。
+        """
+        with self._ranking_lock, self._stats_lock:
+            written = write()
+            if not written:
+                return False
+            ranking_version = _advance(self._ranking_version, 1, written)
+            stats_version = _advance(self._stats_version, 1, written)
+            if ranking_version is None and stats_version is None:
+                final = key = None
+            else:
+                final, key = self._ranking_entry(contestant_id, self.storage.load_contestant_scores(contestant_id))
+            if ranking_version is not None:
+                # 与整体重建一致：没有选手信息的分数不计入排名（统计中同样不计入，但保留得分以备补录选手）
+                if final is None or self.contestant_table().find('id', int(contestant_id)) is None:
+                    self._ranking.remove(int(contestant_id))
+                else:
+                    self._ranking.update(int(contestant_id), final, key)
+                self._ranking_version = ranking_version
+            if stats_version is not None:
+                self._stats.update_score(contestant_id, final)
+                self._stats_version = stats_version
+        self._publish([int(contestant_id)])
+        return True
+    
+    def _ranking_entry(self, contestant_id, scores: List[Optional[float]]):
+        """集齐全部评委分数时返回 (最终得分, 排序键)，分数不完整时返回 (None, None)"""
+        settings = self.get_settings()
+        judge_count = settings['judge_count']
+        if len(scores) < judge_count or None in scores[:judge_count]:
+            return None, None
+        summary = summarize(score_matrix([scores]), rule=settings['scoring_rule'])
+        keys = sort_keys([int(contestant_id)], summary, settings['ranking_rule']['tie_break'])
+        return float(summary['final'][0]), [float(key[0]) for key in keys]
+    
+    def get_score_progress(self, contestant_id) -> Dict:
+        """单个选手的评分进度：{'judge_count', 'scores': 各评委分数（未提交为None）, 'submitted': 已提交的评委序号,
+        'missing': 未提交的评委序号, 'complete': 是否已集齐}"""
+        judge_count = self.get_settings()['judge_count']
+        scores = self.storage.load_contestant_scores(contestant_id)
+        scores = (scores + [None] * judge_count)[:max(judge_count, len(scores))]
+        submitted = [i for i, score in enumerate(scores) if score is not None]
+        missing = [i for i in range(judge_count) if scores[i] is None]
+        return {'judge_count': judge_count, 'scores': scores, 'submitted': submitted,
+                'missing': missing, 'complete': not missing}
+    
+    def get_completeness_summary(self) -> Dict:
+        """全部选手的评分进度：{'judge_count', 'complete': 已集齐, 'partial': 部分评委已提交, 'unscored': 尚无分数}"""
+        judge_count = self.get_settings()['judge_count']
+        table = self.contestant_table()
+        scores = self.score_table()
+        rows = scores.rows(table.ids)
+        scored = rows[rows >= 0]
+        complete = int(scores.complete(judge_count, scored).sum())
+        return {'judge_count': judge_count, 'complete': complete,
+                'partial': len(scored) - complete, 'unscored': len(table) - len(scored)}
+    
+    def get_settings(self) -> Dict:
+        """获取赛事设置：评分规则、排名规则和评委人数，未设置时使用默认值"""
+        settings = self.storage.load_settings()
+        return {
+            'scoring_rule': normalize_rule(settings.get('scoring_rule')),
+            'ranking_rule': normalize_ranking(settings.get('ranking_rule')),
+            'judge_count': settings.get('judge_count', DEFAULT_JUDGE_COUNT)
+        }
+    
+    def get_scoring_rule(self) -> Dict:
+        """获取当前评分规则"""
+        return self.get_settings()['scoring_rule']
+    
+    @timed()
+    def set_scoring_rule(self, rule: Dict) -> bool:
+        """修改评分规则（随赛事设置保存），下次读取排名时按新规则一次性重新计算"""
+        settings = self.storage.load_settings()
+        settings['scoring_rule'] = normalize_rule(rule)
+        if not self.storage.save_settings(settings):
+            return False
+        self._publish(None)
+        return True
+    
+    def get_ranking_rule(self) -> Dict:
+        """获取当前排名规则（名次方式和决胜规则）"""
+        return self.get_settings()['ranking_rule']
+    
+    @timed()
+    def set_ranking_rule(self, rule: Dict) -> bool:
+        """修改排名规则（随赛事设置保存），下次读取排名时一次性重新计算全部名次"""
+        settings = self.storage.load_settings()
+        settings['ranking_rule'] = normalize_ranking(rule)
+        if not self.storage.save_settings(settings):
+            return False
+        self._publish(None)
+        return True
+    
+    def set_judge_count(self, judge_count: int) -> bool:
+        """修改评委人数；选手是否集齐分数随之变化，下次读取排名时整体重建"""
+        if judge_count < 1:
+            raise ValueError("评委人数至少为1")
+        settings = self.storage.load_settings()
+        settings['judge_count'] = int(judge_count)
+        if not self.storage.save_settings(settings):
             return False
+        self._publish(None)
+        return True
+    
+    def subscribe(self, callback: Callable[[Dict], None]) -> Callable[[], None]:
+        """订阅排行榜变更：每次保存后以 {'version': 版本号, 'ids': 选手ID列表或None} 调用 callback
+        
+        返回取消订阅的函数。回调在保存数据的线程中执行，不应耗时。
+        """
+        with self._change_lock:
+            self._subscribers.append(callback)
+        
+        def unsubscribe():
+            with self._change_lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+        return unsubscribe
+    
+    def _publish(self, contestant_ids: Optional[List[int]]) -> int:
+        """记录一次变更并通知订阅者，返回新的版本号；contestant_ids 为None表示需要整体刷新"""
+        with self._change_lock:
+            self._change_version += 1
+            self._change_log.append((self._change_version, contestant_ids))
+            self._change_storage_version = self.storage.get_version()
+            change = {'version': self._change_version, 'ids': contestant_ids}
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(change)
+        return change['version']
+    
+    def start_background(self, workers: int = BACKGROUND_WORKERS) -> Recomputer:
+        """启动后台重算：此后每次保存后，在后台线程中重新计算摘要、评委分析和排名
+        
+        页面通过 self.background 读取结果（见 Recomputer.latest / get），尚未计算过的结果在首次读取时计算。
+        三种Excel导出只在下载时按当前数据版本生成，同一版本重复下载复用同一文件。
+        重复调用返回同一实例。
+        """
+        with self._change_lock:
+            if self.background is not None:
+                return self.background
+            self.background = Recomputer({
+                'summary': self.get_summary,
+                'judges': self.get_judge_analytics,
+                # 排名索引在此同步（如评分规则或其他进程修改数据后需要整体重建），页面查询时不必等待
+                'rankings': lambda: self.get_top(3),
+            }, self.get_data_version, workers, on_demand={
+                # 每次保存后都重新生成会长时间占用GIL，且多数版本不会被下载
+                'export_contestants': lambda: self.export_contestants('xlsx'),
+                'export_scores': lambda: self.export_scores('xlsx'),
+                'export_rankings': lambda: self.export_rankings('xlsx'),
+            })
+        self.subscribe(lambda change: self.background.schedule(change['version']))
+        return self.background
+    
+    def get_change_version(self) -> int:
+        """排行榜版本号；数据被其他进程修改时也会递增"""
+        with self._change_lock:
+            storage_version = self.storage.get_version()
+            if self._change_storage_version is None:
+                self._change_storage_version = storage_version
+            if storage_version == self._change_storage_version:
+                return self._change_version
+        return self._publish(None)
+    
+    def get_data_version(self) -> int:
+        """数据版本号：选手、评分或设置每次修改后单调递增（包括其他进程的修改），可作为派生数据的缓存键"""
+        return self.get_change_version()
+    
+    def _changed_since(self, since_version: Optional[int]) -> Optional[set]:
+        """自某版本以来变更过的选手ID，无法确定（需要整体刷新）时返回None"""
+        with self._change_lock:
+            if since_version == self._change_version:
+                return set()
+            # 首次获取，或需要的记录已被淘汰
+            if since_version is None or not self._change_log or self._change_log[0][0] > since_version + 1:
+                return None
+            changed = set()
+            for version, ids in self._change_log:
+                if version <= since_version:
+                    continue
+                if ids is None:
+                    return None
+                changed.update(ids)
+            return changed
+    
+    @timed()
+    def get_leaderboard_update(self, since_version: Optional[int], limit: int,
+                               known_ids=()) -> Dict:
+        """获取前 limit 名排行榜相对于 since_version 的增量
+        
+        返回 {'version': 当前版本, 'full': 是否整体刷新, 'order': 名次顺序的选手ID（无变化时为None），
+        'ranks': 与 order 对应的名次, 'rows': 需要更新的排名记录}。
+        只返回变更过或调用方尚未持有（known_ids 之外）的选手；并列时其他选手的名次也会变化，以 ranks 为准。
+        """
+        version = self.get_change_version()
+        if since_version == version:
+            return {'version': version, 'full': False, 'order': None, 'ranks': None, 'rows': []}
+        
+        changed = self._changed_since(since_version)
+        with self._ranking_lock:
+            entries = self._sync_ranking_index().top_k(limit)
+        if changed is None:
+            needed = entries
+        else:
+            known = set(known_ids)
+            needed = [entry for entry in entries if entry[0] not in known or entry[0] in changed]
+        return {
+            'version': version,
+            'full': changed is None,
+            'order': [contestant_id for contestant_id, _, _ in entries],
+            'ranks': [rank for _, _, rank in entries],
+            'rows': self._build_rankings(needed)
+        }
+    
+    def get_score_history(self, contestant_id=None) -> List[Dict]:
+        """获取评分修改记录（按时间顺序），可按选手过滤"""
+        return self.storage.load_score_history(contestant_id)
+    
+    @timed()
+    def _sync_ranking_index(self) -> RankingIndex:
+        """获取与存储数据一致的排名索引，数据被其他途径修改时重建（调用方需持有 _ranking_lock）"""
+        version = self.storage.get_version()
+        if version != self._ranking_version:
+            table, _, scored, _, summary = self._summarize_scored(complete_only=True)
+            rule = self.get_ranking_rule()
+            ids = table.ids[scored]
+            self._ranking = RankingIndex.from_arrays(ids, summary['final'], sort_keys(ids, summary, rule['tie_break']),
+                                                     rule['method'])
+            self._ranking_version = version
+        return self._ranking
+    
+    @timed()
+    def get_rank(self, contestant_id) -> Optional[int]:
+        """获取选手名次（从1开始，并列时相同），分数未集齐返回None"""
+        with self._ranking_lock:
+            return self._sync_ranking_index().rank(int(contestant_id))
+    
+    @timed()
+    def get_top(self, k: int) -> List[Dict]:
+        """获取名次顺序中的前k位选手"""
+        with self._ranking_lock:
+            entries = self._sync_ranking_index().top_k(k)
+        return self._build_rankings(entries)
     
     def calculate_final_score(self, scores: List[float]) -> float:
-        """计算最终得分：去掉最高分和最低分后的平均分"""
-        if len(scores) < 3:
-            return 0.0
+        """按当前评分规则计算最终得分"""
+        return final_score(scores, self.get_scoring_rule())
+    
+    @timed()
+    def _summarize_scored(self, contestants: Optional[List[Dict]] = None, complete_only: bool = False):
+        """对已评分选手（按录入顺序）批量计算得分统计；complete_only 时只包含已集齐全部评委分数的选手
+        
+        返回 (选手表, 评分表, 已评分选手在选手表中的行号, 在评分表中的行号, 统计结果)
+        """
+        table = self.contestant_table() if contestants is None else ContestantTable.from_records(contestants)
+        scores = self.score_table()
         
-        sorted_scores = sorted(scores)
-        # 去掉最高分和最低分
-        trimmed_scores = sorted_scores[1:-1]
-        return sum(trimmed_scores) / len(trimmed_scores)
+        score_rows = scores.rows(table.ids)
+        scored = np.flatnonzero(score_rows >= 0)
+        score_rows = score_rows[scored]
+        if complete_only:
+            complete = scores.complete(self.get_settings()['judge_count'], score_rows)
+            scored, score_rows = scored[complete], score_rows[complete]
+        summary = summarize(scores.decoded(score_rows), table.ids[scored], self.get_scoring_rule())
+        return table, scores, scored, score_rows, summary
     
-    def get_rankings(self) -> List[Dict]:
-        """获取选手排名"""
-        contestants = self.load_contestants()
-        scores_data = self.load_scores()
-        
-        rankings = []
-        for contestant in contestants:
-            contestant_id = str(contestant['id'])
-            if contestant_id in scores_data:
-                scores = scores_data[contestant_id]
-                final_score = self.calculate_final_score(scores)
-                rankings.append({
+    @timed()
+    def get_score_details(self, contestants: Optional[List[Dict]] = None) -> List[Dict]:
+        """获取已评分选手（默认全部，按录入顺序）的分数及最高分、最低分、平均分和最终得分
+
+        complete 表示是否已集齐全部评委的分数；未集齐的选手不计入排名，其最终得分仅供参考。
+        """
+        return list(self._iter_score_details(contestants))
+    
+    def _iter_score_details(self, contestants: Optional[List[Dict]] = None):
+        """逐条生成已评分选手的得分详情"""
+        table, scores, scored, score_rows, summary = self._summarize_scored(contestants)
+        highest = summary['max'].tolist()
+        lowest = summary['min'].tolist()
+        mean = summary['mean'].tolist()
+        final = summary['final'].tolist()
+        complete = scores.complete(self.get_settings()['judge_count'], score_rows).tolist()
+        
+        # 分批把列存数据转换为字典和列表，内存占用与总人数无关
+        for start in range(0, len(scored), CHUNK_ROWS):
+            stop = start + CHUNK_ROWS
+            rows = zip(table.take(scored[start:stop]), scores.score_lists(score_rows[start:stop]))
+            for i, (contestant, score_list) in enumerate(rows, start=start):
+                yield {
+                    'contestant': contestant,
+                    'scores': score_list,
+                    'final_score': final[i],
+                    'max_score': highest[i],
+                    'min_score': lowest[i],
+                    'mean_score': mean[i],
+                    'complete': complete[i]
+                }
+    
+    def _build_rankings(self, entries) -> List[Dict]:
+        """按名次顺序组装排名记录；entries 为 (选手ID, 最终得分, 名次) 列表"""
+        ids = [contestant_id for contestant_id, _, _ in entries]
+        finals = [final for _, final, _ in entries]
+        ranks = [rank for _, _, rank in entries]
+        return list(self._iter_rankings(ids, finals, ranks))
+    
+    def _iter_rankings(self, ids, finals, ranks=None):
+        """按名次顺序逐条生成排名记录
+        
+        ids / finals / ranks 为各条记录的选手ID、最终得分和名次，名次默认按顺序从1开始。
+        """
+        table = self.contestant_table()
+        scores = self.score_table()
+        ids = np.asarray(ids, dtype=np.int64)
+        finals = np.asarray(finals, dtype=np.float64)
+        ranks = np.arange(1, len(ids) + 1) if ranks is None else np.asarray(ranks, dtype=np.int64)
+        
+        rows = table.lookup('id', ids)
+        score_rows = scores.rows(ids)
+        selected = np.flatnonzero((rows >= 0) & (score_rows >= 0))
+        for start in range(0, len(selected), CHUNK_ROWS):
+            part = selected[start:start + CHUNK_ROWS]
+            summary = summarize(scores.decoded(score_rows[part]))
+            records = zip(table.take(rows[part]), scores.score_lists(score_rows[part]),
+                          finals[part].tolist(), ranks[part].tolist(), summary['max'].tolist(),
+                          summary['min'].tolist(), summary['mean'].tolist())
+            for contestant, score_list, final, rank, highest, lowest, mean in records:
+                yield {
+                    'rank': rank,
                     'id': contestant['id'],
                     'name': contestant['name'],
                     'gender': contestant.get('gender', ''),
@@ -79,159 +534,304 @@ class DataManager:
                     'province': contestant.get('province', ''),
                     'city': contestant.get('city', ''),
                     'phone': contestant['phone'],
-                    'scores': scores,
-                    'final_score': final_score
-                })
+                    'scores': score_list,
+                    'final_score': final,
+                    'max_score': highest,
+                    'min_score': lowest,
+                    'mean_score': mean
+                }
+    
+    @timed()
+    def get_rankings(self) -> List[Dict]:
+        """获取选手排名（按最终得分降序，同分按排名规则并列或决胜，同名次按ID升序）"""
+        with self._ranking_lock:
+            ids, finals, ranks = self._sync_ranking_index().arrays()
+        return list(self._iter_rankings(ids, finals, ranks))
+    
+    @staticmethod
+    def _clean_filters(filters: Optional[Dict]) -> Dict:
+        return {k: v for k, v in (filters or {}).items() if v is not None and v != ''}
+    
+    @timed()
+    def query_contestants(self, offset: int = 0, limit: int = 20, filters: Optional[Dict] = None,
+                          sort_by: str = 'id', descending: bool = False) -> Dict:
+        """分页查询选手
+        
+        filters 支持 school / province / class_name / gender 精确匹配、keyword（姓名或电话包含）
+        以及 scored（True 只看已评分，False 只看未评分）。
+        返回 {'total': 符合条件的总数, 'items': 当前页选手列表}
+        """
+        filters = self._clean_filters(filters)
+        scored = filters.pop('scored', None)
+        table = self.contestant_table()
         
-        # 按最终得分降序排列
-        rankings.sort(key=lambda x: x['final_score'], reverse=True)
-        return rankings
+        # 在列上批量筛选和排序，只把当前页转换为字典
+        mask = table.mask(filters)
+        if scored is not None:
+            mask &= (self.score_table().rows(table.ids) >= 0) == scored
+        rows = np.flatnonzero(mask)
+        if sort_by != 'id':
+            rows = table.order(rows, sort_by, descending)
+        elif descending:
+            rows = rows[::-1]
+        
+        return {'total': len(rows), 'items': table.take(rows[offset:offset + limit])}
     
-    def export_contestants_to_excel(self) -> bytes:
-        """导出选手信息到Excel"""
-        contestants = self.load_contestants()
-        if not contestants:
-            return None
+    @timed()
+    def query_rankings(self, offset: int = 0, limit: int = 20, filters: Optional[Dict] = None,
+                       sort_by: str = 'rank', descending: bool = False) -> Dict:
+        """分页查询排名，名次始终为全体排名中的名次
+        
+        sort_by 为 'rank' 或选手字段名。无筛选且按名次排序时直接截取排名索引，只组装当前页的记录。
+        返回 {'total': 符合条件的总数, 'items': 当前页排名记录}
+        """
+        filters = self._clean_filters(filters)
+        filters.pop('scored', None)
+        
+        with self._ranking_lock:
+            index = self._sync_ranking_index()
+            fast_path = not filters and sort_by == 'rank' and not descending
+            if fast_path:
+                total = len(index)
+                entries = index.slice(offset, offset + limit)
+            else:
+                ids, finals, ranks = index.arrays()
         
-        df = pd.DataFrame(contestants)
-        # 重新排列列的顺序
-        columns_order = ['id', 'name', 'gender', 'age', 'class_name', 'school', 'province', 'city', 'phone']
-        df = df.reindex(columns=[col for col in columns_order if col in df.columns])
-        
-        # 重命名列名为中文
-        column_names = {
-            'id': 'ID',
-            'name': '姓名',
-            'gender': '性别',
-            'age': '年龄',
-            'class_name': '班级',
-            'school': '学校',
-            'province': '省份',
-            'city': '城市',
-            'phone': '联系电话'
+        if fast_path:
+            return {'total': total, 'items': self._build_rankings(entries)}
+        
+        # 名次为全体排名中的名次；筛选和排序在列上批量完成
+        selected = np.arange(len(ids))
+        if filters or sort_by != 'rank':
+            table = self.contestant_table()
+            rows = table.lookup('id', ids)
+            keep = rows >= 0
+            if filters:
+                keep &= table.mask(filters)[rows]
+            selected = np.flatnonzero(keep)
+        if sort_by != 'rank' or descending:
+            # 稳定排序，同值（包括并列的名次）保持名次顺序；降序时整数键取反，不颠倒同值的先后
+            key = ranks[selected] if sort_by == 'rank' else table.sort_key(sort_by)[rows[selected]]
+            key = key.astype(np.int64)
+            selected = selected[np.argsort(-key if descending else key, kind='stable')]
+        
+        page = selected[offset:offset + limit]
+        return {
+            'total': len(selected),
+            'items': list(self._iter_rankings(ids[page], finals[page], ranks[page]))
         }
-        df = df.rename(columns=column_names)
+    
+    def get_filter_options(self) -> Dict[str, List[str]]:
+        """获取筛选项：各字段出现过的取值（按选手数据版本缓存）"""
+        version = self._contestants_version()
+        cached = self._filter_options
+        if cached is not None and cached[0] == version:
+            return cached[1]
         
-        # 使用BytesIO来创建Excel文件
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='选手信息')
-        return output.getvalue()
+        table = self.contestant_table()
+        options = {field: sorted(value for value in table.distinct(field) if value)
+                   for field in ('school', 'province', 'class_name', 'gender')}
+        self._filter_options = (version, options)
+        return options
     
-    def export_scores_to_excel(self) -> bytes:
-        """导出评分信息到Excel"""
-        contestants = self.load_contestants()
-        scores_data = self.load_scores()
+    @staticmethod
+    def _contestant_row(contestant: Dict) -> List:
+        """选手信息导出的一行"""
+        return [contestant.get(field, '') for field in CONTESTANT_FIELDS]
+    
+    def _contestant_rows(self):
+        """逐行生成选手信息导出数据"""
+        for contestant in self.contestant_table():
+            yield self._contestant_row(contestant)
+    
+    @staticmethod
+    def _score_row(detail: Dict, judge_count: int) -> List:
+        """评分详情导出的一行：评委分数补足 judge_count 列（未提交为空），统计列与表头对齐；
+        未集齐全部评委分数时与排名一致，最终得分留空"""
+        contestant = detail['contestant']
+        scores = list(detail['scores'])
+        return (
+            [contestant['id'], contestant['name'], contestant.get('gender', ''),
+             contestant.get('class_name', ''), contestant.get('school', '')]
+            + scores + [None] * (judge_count - len(scores))
+            + [detail['max_score'], detail['min_score'], round(detail['mean_score'], 2),
+               round(detail['final_score'], 2) if detail['complete'] else None]
+        )
+    
+    def _score_rows(self, details, judge_count: int):
+        """逐行生成评分详情导出数据"""
+        for detail in details:
+            yield self._score_row(detail, judge_count)
+    
+    def _score_width(self, scores_data: ScoreTable) -> int:
+        """评分详情导出的评委列数：评委人数与已录入的最多分数个数中的较大者"""
+        longest = int(scores_data.lengths.max()) if len(scores_data) else 0
+        return max(self.get_settings()['judge_count'], longest)
+    
+    @staticmethod
+    def _score_columns(judge_count: int) -> List[str]:
+        """评分详情导出的列"""
+        return (['ID', '姓名', '性别', '班级', '学校']
+                + [f'评委{i+1}' for i in range(judge_count)]
+                + ['最高分', '最低分', '平均分', '最终得分'])
+    
+    @staticmethod
+    def _ranking_row(contestant: Dict) -> List:
+        """排名导出的一行"""
+        return [
+            contestant['rank'], contestant['id'], contestant['name'], contestant['gender'],
+            contestant['age'], contestant['class_name'], contestant['school'],
+            contestant['province'], contestant['city'], contestant['phone'],
+            round(contestant['final_score'], 2), contestant['max_score'],
+            contestant['min_score'], round(contestant['mean_score'], 2)
+        ]
+    
+    def _ranking_rows(self, rankings):
+        """逐行生成排名导出数据"""
+        for contestant in rankings:
+            if contestant['scores']:
+                yield self._ranking_row(contestant)
+    
+    @timed()
+    def export_contestants(self, fmt: str = 'xlsx') -> Optional[bytes]:
+        """导出选手信息（xlsx/csv/parquet）"""
+        if not self.contestant_table():
+            return None
+        columns = [CONTESTANT_COLUMN_NAMES[field] for field in CONTESTANT_FIELDS]
+        return export_rows(columns, self._contestant_rows(), fmt, sheet_name='选手信息')
+    
+    @timed()
+    def export_scores(self, fmt: str = 'xlsx') -> Optional[bytes]:
+        """导出评分详情（xlsx/csv/parquet），逐行写出"""
+        scores_data = self.score_table()
+        if not scores_data:
+            return None
         
-        if not contestants or not scores_data:
+        judge_count = self._score_width(scores_data)
+        return export_rows(self._score_columns(judge_count), self._score_rows(self._iter_score_details(), judge_count),
+                           fmt, sheet_name='评分详情')
+    
+    @timed()
+    def export_rankings(self, fmt: str = 'xlsx') -> Optional[bytes]:
+        """导出排名信息（xlsx/csv/parquet），逐行写出"""
+        with self._ranking_lock:
+            ids, finals, ranks = self._sync_ranking_index().arrays()
+        if not len(ids):
             return None
         
-        scores_list = []
-        for contestant in contestants:
-            contestant_id = str(contestant['id'])
-            if contestant_id in scores_data:
-                scores = scores_data[contestant_id]
-                score_row = {
-                    'ID': contestant['id'],
-                    '姓名': contestant['name'],
-                    '性别': contestant.get('gender', ''),
-                    '班级': contestant.get('class_name', ''),
-                    '学校': contestant.get('school', ''),
-                }
-                
-                # 添加10位评委的分数
-                for i, score in enumerate(scores):
-                    score_row[f'评委{i+1}'] = score
-                
-                # 添加统计信息
-                score_row['最高分'] = max(scores)
-                score_row['最低分'] = min(scores)
-                score_row['平均分'] = round(sum(scores) / len(scores), 2)
-                score_row['最终得分'] = round(self.calculate_final_score(scores), 2)
-                
-                scores_list.append(score_row)
-        
-        df = pd.DataFrame(scores_list)
-        
-        # 使用BytesIO来创建Excel文件
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='评分详情')
-        return output.getvalue()
+        return export_rows(RANKING_COLUMNS, self._ranking_rows(self._iter_rankings(ids, finals, ranks)), fmt,
+                           sheet_name='选手排名')
     
-    def export_rankings_to_excel(self) -> bytes:
-        """导出排名信息到Excel"""
-        rankings = self.get_rankings()
+    @timed()
+    def export_report(self, group_by: Optional[str] = None, fmt: str = 'xlsx',
+                      max_workers: Optional[int] = None) -> Dict[str, bytes]:
+        """导出汇总报表：选手信息、评分详情和排名三个工作表，按 group_by（学校、省份等）每组一份
         
-        if not rankings:
-            return None
+        数据只加载和计算一次，再按组拆分，各组文件在进程池中并行生成；名次为全体排名中的名次。
+        group_by 为 None 时只生成一份全体报表。返回 {文件名: 文件内容}，没有选手时返回空字典。
+        """
+        if group_by is not None and group_by not in CATEGORY_FIELDS:
+            raise ValueError(f"不支持的分组字段: {group_by}")
+        table = self.contestant_table()
+        if not table:
+            return {}
         
-        ranking_data = []
-        for i, contestant in enumerate(rankings):
-            if contestant['scores']:
-                ranking_data.append({
-                    '排名': i + 1,
-                    'ID': contestant['id'],
-                    '姓名': contestant['name'],
-                    '性别': contestant['gender'],
-                    '年龄': contestant['age'],
-                    '班级': contestant['class_name'],
-                    '学校': contestant['school'],
-                    '省份': contestant['province'],
-                    '城市': contestant['city'],
-                    '联系电话': contestant['phone'],
-                    '最终得分': round(contestant['final_score'], 2),
-                    '最高分': max(contestant['scores']),
-                    '最低分': min(contestant['scores']),
-                    '平均分': round(sum(contestant['scores']) / len(contestant['scores']), 2)
-                })
-        
-        df = pd.DataFrame(ranking_data)
-        
-        # 使用BytesIO来创建Excel文件
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='选手排名')
-        return output.getvalue()
+        def group_of(contestant) -> str:
+            return (contestant.get(group_by) or '未知') if group_by else '全部'
+        
+        # 组名 -> (选手信息行, 评分详情行, 排名行)，边生成边拆分，不保留中间的字典
+        groups: Dict[str, tuple] = {}
+        def add(contestant, sheet: int, row: List):
+            groups.setdefault(group_of(contestant), ([], [], []))[sheet].append(row)
+        
+        judge_count = self._score_width(self.score_table())
+        for contestant in table:
+            add(contestant, 0, self._contestant_row(contestant))
+        for detail in self._iter_score_details():
+            add(detail['contestant'], 1, self._score_row(detail, judge_count))
+        with self._ranking_lock:
+            ids, finals, ranks = self._sync_ranking_index().arrays()
+        for record in self._iter_rankings(ids, finals, ranks):
+            if record['scores']:
+                add(record, 2, self._ranking_row(record))
+        
+        contestant_columns = [CONTESTANT_COLUMN_NAMES[field] for field in CONTESTANT_FIELDS]
+        score_columns = self._score_columns(judge_count)
+        
+        reports = {}
+        for name in sorted(groups):
+            contestant_rows, score_rows, ranking_rows = groups[name]
+            reports[name] = [
+                ('选手信息', contestant_columns, contestant_rows),
+                ('评分详情', score_columns, score_rows),
+                ('选手排名', RANKING_COLUMNS, ranking_rows),
+            ]
+        return export_reports(reports, fmt, max_workers)
+    
+    def export_contestants_to_excel(self) -> bytes:
+        """导出选手信息到Excel"""
+        return self.export_contestants('xlsx')
     
+    def export_scores_to_excel(self) -> bytes:
+        """导出评分信息到Excel"""
+        return self.export_scores('xlsx')
+    
+    def export_rankings_to_excel(self) -> bytes:
+        """导出排名信息到Excel"""
+        return self.export_rankings('xlsx')
+    
+    @timed()
     def get_statistics(self) -> Dict:
-        """获取统计信息"""
-        contestants = self.load_contestants()
-        scores_data = self.load_scores()
-        rankings = self.get_rankings()
-        
-        stats = {
-            'total_contestants': len(contestants),
-            'scored_contestants': len([c for c in contestants if str(c['id']) in scores_data]),
-            'unscored_contestants': len([c for c in contestants if str(c['id']) not in scores_data]),
-            'average_score': 0,
-            'highest_score': 0,
-            'lowest_score': 0,
-            'gender_distribution': {},
-            'province_distribution': {},
-            'class_distribution': {}
-        }
+        """获取统计信息；数据未被其他途径修改时直接返回增量维护的结果"""
+        with self._stats_lock:
+            version = self.storage.get_version()
+            if version != self._stats_version:
+                table, _, scored, _, summary = self._summarize_scored(complete_only=True)
+                self._stats = StatsAggregator.from_table(table, table.ids[scored], summary['final'])
+                self._stats_version = version
+            return self._stats.snapshot()
+    
+    @timed()
+    def get_summary(self) -> Dict:
+        """页面摘要：{'statistics': 同 get_statistics, 'completeness': 同 get_completeness_summary}，均为纯字典
+
+        摘要按数据版本保存在存储中，新进程或新会话直接读取，不必加载全部选手和评分；
+        数据变化后首次调用时重新计算并保存。
+        """
+        version = self.storage.get_version()
+        saved = self.storage.load_summary(version)
+        if saved is not None:
+            # JSON 的键均为字符串，分数段还原为整数
+            histogram = {int(bucket): count for bucket, count in saved['statistics']['score_histogram'].items()}
+            return {'statistics': dict(saved['statistics'], score_histogram=histogram),
+                    'completeness': dict(saved['completeness'])}
+        summary = {'statistics': self.get_statistics(), 'completeness': self.get_completeness_summary()}
+        self.storage.save_summary(version, summary)
+        return summary
+    
+    @timed()
+    def get_judge_analytics(self) -> Dict:
+        """评委分析：各评委的平均分、标准差、偏离共识程度、被去掉最高/最低分的比例和评委间相关系数
+        
+        只统计已集齐全部评委分数的选手（见 judges.analyze_judges）。结果按数据版本缓存，
+        并随该版本的预计算摘要一起保存，新进程中不必重新加载全部评分。
+        """
+        version = self.storage.get_version()
+        cached = self._judge_analytics
+        if cached is not None and cached[0] == version:
+            return cached[1]
         
-        if rankings:
-            final_scores = [r['final_score'] for r in rankings if r['final_score'] > 0]
-            if final_scores:
-                stats['average_score'] = sum(final_scores) / len(final_scores)
-                stats['highest_score'] = max(final_scores)
-                stats['lowest_score'] = min(final_scores)
-        
-        # 统计性别分布
-        for contestant in contestants:
-            gender = contestant.get('gender', '未知')
-            stats['gender_distribution'][gender] = stats['gender_distribution'].get(gender, 0) + 1
-        
-        # 统计省份分布
-        for contestant in contestants:
-            province = contestant.get('province', '未知')
-            stats['province_distribution'][province] = stats['province_distribution'].get(province, 0) + 1
-        
-        # 统计班级分布
-        for contestant in contestants:
-            class_name = contestant.get('class_name', '未知')
-            stats['class_distribution'][class_name] = stats['class_distribution'].get(class_name, 0) + 1
-        
-        return stats
+        saved = self.storage.load_summary(version)
+        analytics = saved.get('judges') if saved is not None else None
+        if analytics is None:
+            settings = self.get_settings()
+            judge_count = settings['judge_count']
+            scores = self.score_table()
+            rows = scores.rows(self.contestant_table().ids)
+            rows = rows[rows >= 0]
+            rows = rows[scores.complete(judge_count, rows)]
+            analytics = analyze_judges(scores.decoded(rows)[:, :judge_count], settings['scoring_rule'])
+            if saved is not None:
+                self.storage.save_summary(version, dict(saved, judges=analytics))
+        self._judge_analytics = (version, analytics)
+        return analytics
@@ -0,0 +1,216 @@
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ranking import DEFAULT_RANKING, RANK_METHODS, TIE_DECIMALS, assign_ranks
+from scoring import DEFAULT_JUDGE_COUNT, normalize_rule, summarize
+from storage import CONTESTANT_FIELDS, StorageBackend, StorageError, create_storage, file_lock
+
+# 默认赛事和轮次：沿用当前目录下原有的数据文件
+DEFAULT_EVENT = '默认赛事'
+DEFAULT_ROUND = '第1轮'
+
+# 跨轮次综合排名的计算方式
+AGGREGATE_METHODS = {
+    'sum': '各轮得分加权求和',
+    'mean': '各轮得分加权平均',
+}
+
+
+def _check_name(name: str, label: str) -> str:
+    """赛事/轮次名称同时作为目录名，不能包含路径分隔符"""
+    name = (name or '').strip()
+    if not name or name.startswith('.') or any(ch in name for ch in '/\\:*?"<>|') or len(name) > 50:
+        raise ValueError(f"{label}名称无效：不能为空、不能以.开头，不能包含 / \\ : * ? \" < > |")
+    return name
+
+
+class EventStore:
+    """赛事与轮次管理：每个赛事的每一轮是一个独立的存储分片，位于 <root>/<赛事>/<轮次>/
+
+    赛事目录下的 event.json 记录轮次顺序。默认赛事的第一轮使用当前目录下原有的数据文件。
+    """
+
+    def __init__(self, root: Optional[str] = None, backend: Optional[str] = None):
+        self.root = root or os.environ.get('SCORE_EVENTS_DIR', 'events')
+        self.backend = backend
+
+    def _event_dir(self, event: str) -> str:
+        return os.path.join(self.root, event)
+
+    def _manifest_file(self, event: str) -> str:
+        return os.path.join(self._event_dir(event), 'event.json')
+
+    def _read_manifest(self, event: str) -> Dict:
+        try:
+            with open(self._manifest_file(event), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'rounds': []}
+        except (OSError, ValueError) as e:
+            raise StorageError(f"赛事文件 {self._manifest_file(event)} 无法读取：{e}")
+
+    def _write_manifest(self, event: str, manifest: Dict):
+        path = self._manifest_file(event)
+        fd, temp_path = tempfile.mkstemp(prefix='event.json.', suffix='.tmp', dir=self._event_dir(event))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except OSError as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise StorageError(f"赛事文件 {path} 无法写入：{e}")
+
+    def list_events(self) -> List[str]:
+        """列出全部赛事，默认赛事在最前"""
+        events = []
+        if os.path.isdir(self.root):
+            events = sorted(name for name in os.listdir(self.root)
+                            if name != DEFAULT_EVENT and os.path.isfile(self._manifest_file(name)))
+        return [DEFAULT_EVENT] + events
+
+    def list_rounds(self, event: str) -> List[str]:
+        """按创建顺序列出赛事的轮次"""
+        rounds = self._read_manifest(event)['rounds']
+        if event == DEFAULT_EVENT and DEFAULT_ROUND not in rounds:
+            rounds = [DEFAULT_ROUND] + rounds
+        return rounds
+
+    def open(self, event: str, round_name: str) -> StorageBackend:
+        """打开某一轮的存储分片"""
+        if event == DEFAULT_EVENT and round_name == DEFAULT_ROUND:
+            return create_storage(self.backend)
+        if round_name not in self.list_rounds(event):
+            raise ValueError(f"赛事 {event} 没有轮次 {round_name}")
+        return create_storage(self.backend, os.path.join(self._event_dir(event), round_name))
+
+    def create_round(self, event: str, round_name: str, source_round: Optional[str] = None,
+                     top_n: Optional[int] = None) -> bool:
+        """新建赛事轮次（赛事不存在时一并创建）
+
+        指定 source_round 时从该轮复制评分设置和选手名单（保留选手ID），
+        再指定 top_n 时只复制该轮排名（按该轮的评分和排名规则，含决胜规则）中的前 top_n 位选手（晋级）。
+        先复制数据再登记轮次，中途失败不会留下已登记但没有数据的轮次。
+        """
+        event = _check_name(event, '赛事')
+        round_name = _check_name(round_name, '轮次')
+        os.makedirs(self._event_dir(event), exist_ok=True)
+
+        with file_lock(self._manifest_file(event)):
+            rounds = self.list_rounds(event)
+            if round_name in rounds:
+                raise ValueError(f"轮次 {round_name} 已存在")
+            if source_round is not None and source_round not in rounds:
+                raise ValueError(f"赛事 {event} 没有轮次 {source_round}")
+
+            # 上次中途失败留下的未登记数据
+            round_dir = os.path.join(self._event_dir(event), round_name)
+            if os.path.exists(round_dir):
+                shutil.rmtree(round_dir)
+            if source_round is not None and not self._copy_round(self.open(event, source_round),
+                                                                 create_storage(self.backend, round_dir), top_n):
+                return False
+
+            manifest = self._read_manifest(event)
+            manifest['rounds'] = manifest['rounds'] + [round_name]
+            self._write_manifest(event, manifest)
+        return True
+
+    @staticmethod
+    def _copy_round(source: StorageBackend, target: StorageBackend, top_n: Optional[int]) -> bool:
+        """把上一轮的评分设置和选手名单（或排名前 top_n 位）复制到新一轮的分片"""
+        from data_manager import DataManager
+
+        contestants = source.load_contestants()
+        if top_n is not None:
+            ids = [record['id'] for record in DataManager(source).get_top(top_n)]
+            contestants = contestants.take(contestants.lookup('id', ids))
+        settings = source.load_settings()
+        settings.pop('round_weight', None)
+        if settings and not target.save_settings(settings):
+            return False
+        return not len(contestants) or target.insert_contestants(list(contestants)) is not None
+
+    def set_round_weight(self, event: str, round_name: str, weight: float) -> bool:
+        """设置某一轮在综合排名中的权重（随该轮的设置保存）"""
+        if weight < 0:
+            raise ValueError("轮次权重不能为负数")
+        storage = self.open(event, round_name)
+        settings = storage.load_settings()
+        settings['round_weight'] = float(weight)
+        return storage.save_settings(settings)
+
+    def get_round_weight(self, event: str, round_name: str) -> float:
+        """获取某一轮在综合排名中的权重，默认为1"""
+        return float(self.open(event, round_name).load_settings().get('round_weight', 1.0))
+
+    @staticmethod
+    def _round_finals(storage: StorageBackend) -> Iterator[Tuple[Dict, float]]:
+        """按该轮的评分规则批量计算已集齐全部评委分数的选手的最终得分"""
+        contestants = storage.load_contestants()
+        scores = storage.load_scores()
+        settings = storage.load_settings()
+        rows = scores.rows(contestants.ids)
+        scored = np.flatnonzero(rows >= 0)
+        scored = scored[scores.complete(settings.get('judge_count', DEFAULT_JUDGE_COUNT), rows[scored])]
+        rule = normalize_rule(settings.get('scoring_rule'))
+        summary = summarize(scores.decoded(rows[scored]), contestants.ids[scored], rule)
+        return zip(contestants.take(scored), summary['final'].tolist())
+
+    def aggregate_rankings(self, event: str, rounds: Optional[List[str]] = None, method: str = 'sum',
+                           weights: Optional[Dict[str, float]] = None,
+                           rank_method: str = DEFAULT_RANKING['method']) -> List[Dict]:
+        """跨轮次综合排名：逐轮打开分片计算最终得分后累加，同一时间只有一轮的数据在内存中
+
+        选手按联系电话跨轮次对应；weights 未给出的轮次使用该轮设置中的权重（默认为1）。
+        method 为 sum 时按权重求和（未参加的轮次计0分），为 mean 时按参加轮次的权重求平均。
+        综合得分相同时按 rank_method（见 RANK_METHODS）并列，同名次按联系电话排列。
+        """
+        if method not in AGGREGATE_METHODS:
+            raise ValueError(f"未知的综合排名方式: {method}")
+        if rank_method not in RANK_METHODS:
+            raise ValueError(f"未知的名次方式: {rank_method}")
+        rounds = self.list_rounds(event) if rounds is None else rounds
+        weights = weights or {}
+
+        # 联系电话 -> 选手信息（取最后一轮）、加权得分和、权重和、各轮得分
+        entries: Dict[str, Dict] = {}
+        for round_name in rounds:
+            storage = self.open(event, round_name)
+            weight = weights.get(round_name)
+            if weight is None:
+                weight = float(storage.load_settings().get('round_weight', 1.0))
+            for contestant, final in self._round_finals(storage):
+                entry = entries.setdefault(contestant['phone'], {'total': 0.0, 'weight': 0.0, 'rounds': {}})
+                entry['contestant'] = contestant
+                entry['total'] += weight * final
+                entry['weight'] += weight
+                entry['rounds'][round_name] = final
+
+        totals = np.array([
+            entry['total'] if method == 'sum' else (entry['total'] / entry['weight'] if entry['weight'] else 0.0)
+            for entry in entries.values()
+        ], dtype=np.float64)
+        key = np.round(-totals, TIE_DECIMALS)
+        order = np.lexsort((np.array(list(entries), dtype=str), key))
+        ranks = assign_ranks([key[order]], rank_method)
+
+        values = list(entries.values())
+        rankings = []
+        for rank, row in zip(ranks.tolist(), order.tolist()):
+            entry, score = values[row], float(totals[row])
+            contestant = entry['contestant']
+            rankings.append({
+                'rank': rank,
+                **{field: contestant.get(field, '') for field in CONTESTANT_FIELDS},
+                'round_scores': entry['rounds'],
+                'total_score': score
+            })
+        return rankings
@@ -0,0 +1,211 @@
+import csv
+import io
+import multiprocessing
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from metrics import timed
+
+# 支持的导出格式：格式 -> (MIME类型, 文件扩展名)
+EXPORT_FORMATS = {
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+# Parquet 按批写入的行数
+PARQUET_BATCH_SIZE = 10000
+
+# 工作表：(工作表名, 列名, 行数据)
+Sheet = Tuple[str, List[str], List[Sequence]]
+
+# 文件名中不允许出现的字符
+UNSAFE_FILENAME = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+@timed()
+def export_rows(columns: List[str], rows: Iterable[Sequence], fmt: str = 'xlsx', sheet_name: str = 'Sheet1') -> bytes:
+    """逐行写出表格数据，不在内存中构建DataFrame或完整的单元格对象"""
+    if fmt == 'xlsx':
+        return _export_xlsx(columns, rows, sheet_name)
+    if fmt == 'csv':
+        return _export_csv(columns, rows)
+    if fmt == 'parquet':
+        return _export_parquet(columns, rows)
+    raise ValueError(f"不支持的导出格式: {fmt}")
+
+
+@timed()
+def _export_xlsx(columns: List[str], rows: Iterable[Sequence], sheet_name: str) -> bytes:
+    return export_workbook([(sheet_name, columns, rows)])
+
+
+@timed()
+def export_workbook(sheets: Iterable[Sheet]) -> bytes:
+    """把多个工作表写入同一个Excel工作簿"""
+    from openpyxl import Workbook
+
+    # 只写模式：行写出后即序列化，内存占用与行数无关
+    workbook = Workbook(write_only=True)
+    for sheet_name, columns, rows in sheets:
+        sheet = workbook.create_sheet(sheet_name)
+        sheet.append(columns)
+        for row in rows:
+            sheet.append(list(row))
+
+    output = io.BytesIO()
+    workbook.save(output)
+    return output.getvalue()
+
+
+@timed()
+def _export_csv(columns: List[str], rows: Iterable[Sequence]) -> bytes:
+    output = io.BytesIO()
+    # 带BOM的UTF-8，Excel打开中文不乱码
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+    text.flush()
+    data = output.getvalue()
+    text.detach()
+    return data
+
+
+def _parquet_type(values):
+    """根据首批数据中第一个非空值推断列类型"""
+    import pyarrow as pa
+
+    for value in values:
+        if value is None or value == '':
+            continue
+        if isinstance(value, (bool, int)):
+            return pa.int64()
+        if isinstance(value, float):
+            return pa.float64()
+        return pa.string()
+    return pa.string()
+
+
+def _coerce(value, arrow_type):
+    """把单元格值转换为列类型，空值或无法转换的值写为null"""
+    import pyarrow as pa
+
+    if value is None or value == '':
+        return None
+    try:
+        if arrow_type == pa.int64():
+            return int(value)
+        if arrow_type == pa.float64():
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+
+@timed()
+def _export_parquet(columns: List[str], rows: Iterable[Sequence]) -> bytes:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("导出Parquet需要安装 pyarrow：pip install pyarrow")
+
+    output = io.BytesIO()
+    rows = iter(rows)
+    writer = None
+    schema = None
+    while True:
+        batch = list(islice(rows, PARQUET_BATCH_SIZE))
+        if not batch and writer is not None:
+            break
+        column_values = list(zip(*batch)) if batch else [() for _ in columns]
+        if schema is None:
+            schema = pa.schema([
+                (name, _parquet_type(values)) for name, values in zip(columns, column_values)
+            ])
+            writer = pq.ParquetWriter(output, schema)
+        arrays = [
+            pa.array([_coerce(v, field.type) for v in values], type=field.type)
+            for field, values in zip(schema, column_values)
+        ]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        if not batch:
+            break
+    writer.close()
+    return output.getvalue()
+
+
+def safe_filename(name: str) -> str:
+    """把分组名等转换为可用作文件名的文本"""
+    return UNSAFE_FILENAME.sub('_', str(name)).strip('._') or '未命名'
+
+
+def _add_file(files: Dict[str, bytes], filename: str, data: bytes) -> None:
+    """加入 files；文件名已存在时（如 A/B 与 A_B 转换后相同）在扩展名前加序号，不覆盖"""
+    stem, dot, extension = filename.rpartition('.')
+    number = 1
+    while filename in files:
+        number += 1
+        filename = f"{stem}_{number}{dot}{extension}"
+    files[filename] = data
+
+
+def build_report(name: str, sheets: List[Sheet], fmt: str = 'xlsx') -> Dict[str, bytes]:
+    """生成一份报表：xlsx 为一个多工作表的工作簿，csv/parquet 每个工作表一个文件
+
+    返回 {文件名: 文件内容}；在子进程中执行，参数和返回值都需可序列化。
+    """
+    extension = EXPORT_FORMATS[fmt][1]
+    name = safe_filename(name)
+    if fmt == 'xlsx':
+        return {f"{name}.{extension}": export_workbook(sheets)}
+    files = {}
+    for sheet_name, columns, rows in sheets:
+        _add_file(files, f"{name}_{safe_filename(sheet_name)}.{extension}", export_rows(columns, rows, fmt))
+    return files
+
+
+@timed()
+def export_reports(reports: Dict[str, List[Sheet]], fmt: str = 'xlsx',
+                   max_workers: Optional[int] = None) -> Dict[str, bytes]:
+    """并行生成多份报表（如每个学校一份），返回 {文件名: 文件内容}
+
+    reports 为 {报表名: 工作表列表}。各报表在进程池中生成，默认进程数为CPU核数；
+    只有一份报表或 max_workers 为1时在当前进程中生成。报表名转换为文件名后相同时，
+    按 reports 的顺序在后出现的文件名上加序号。
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    workers = min(len(reports), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        files = {}
+        for name, sheets in reports.items():
+            for filename, data in build_report(name, sheets, fmt).items():
+                _add_file(files, filename, data)
+        return files
+
+    # 行数多的报表先提交，减少最后只剩一个进程在工作的时间；
+    # 使用 spawn 启动子进程，避免在 Streamlit 等多线程进程中 fork
+    names = sorted(reports, key=lambda n: -sum(len(rows) for _, _, rows in reports[n]))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = {name: pool.submit(build_report, name, reports[name], fmt) for name in names}
+        files = {}
+        for name in reports:
+            for filename, data in futures[name].result().items():
+                _add_file(files, filename, data)
+    return files
+
+
+def zip_files(files: Dict[str, bytes]) -> bytes:
+    """把 {文件名: 文件内容} 打包为zip"""
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return output.getvalue()
@@ -0,0 +1,77 @@
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from columnar import ContestantTable
+from storage import CONTESTANT_COLUMN_NAMES, CONTESTANT_FIELDS
+
+# 导入时必须提供的字段
+REQUIRED_FIELDS = ['name', 'gender', 'province', 'phone']
+GENDERS = ['男', '女']
+
+# 表头映射：同时接受中文列名和英文字段名
+HEADER_MAP = {**{label: field for field, label in CONTESTANT_COLUMN_NAMES.items()},
+              **{field: field for field in CONTESTANT_FIELDS}}
+
+
+def read_contestant_file(file, filename: str) -> pd.DataFrame:
+    """读取上传的CSV或Excel文件，所有列按字符串读取以保留电话号码前导0"""
+    if filename.lower().endswith('.csv'):
+        return pd.read_csv(file, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    if filename.lower().endswith(('.xlsx', '.xls')):
+        return pd.read_excel(file, dtype=str, keep_default_na=False)
+    raise ValueError("仅支持 CSV 或 Excel 文件")
+
+
+def validate_contestants(df: pd.DataFrame, existing: ContestantTable) -> Tuple[List[Dict], List[Dict]]:
+    """整表校验选手数据（existing 为已有选手），返回 (有效记录, 逐行错误)
+
+    错误中的行号与表格文件一致（表头为第1行）。有效记录尚未分配ID。
+    """
+    df = df.rename(columns=HEADER_MAP)
+    missing = [CONTESTANT_COLUMN_NAMES[f] for f in REQUIRED_FIELDS if f not in df.columns]
+    if missing:
+        raise ValueError(f"缺少必填列：{'、'.join(missing)}")
+
+    df = df.reset_index(drop=True)
+    columns = {}
+    for field in CONTESTANT_FIELDS[1:]:
+        if field in df.columns:
+            columns[field] = df[field].fillna('').astype(str).str.strip()
+        else:
+            columns[field] = pd.Series('', index=df.index)
+    data = pd.DataFrame(columns)
+
+    errors = pd.Series('', index=data.index)
+
+    def flag(mask, message):
+        nonlocal errors
+        errors = errors.where(~mask, errors + message + '；')
+
+    for field in REQUIRED_FIELDS:
+        flag(data[field] == '', f"{CONTESTANT_COLUMN_NAMES[field]}不能为空")
+    flag((data['gender'] != '') & ~data['gender'].isin(GENDERS), "性别只能为男或女")
+
+    ages = pd.to_numeric(data['age'], errors='coerce')
+    bad_age = (data['age'] != '') & (ages.isna() | (ages % 1 != 0) | (ages < 1) | (ages > 100))
+    flag(bad_age, "年龄必须为1-100的整数")
+
+    # 姓名与电话唯一：在已有选手的有序列上一次批量查找整列，批内重复保留首次出现
+    for field, label in (('name', '姓名'), ('phone', '联系电话')):
+        present = data[field] != ''
+        flag(present & (existing.lookup(field, data[field].tolist()) >= 0), f"该{label}已存在")
+        flag(present & data[field].duplicated(keep='first'), f"{label}在文件中重复")
+
+    valid = errors == ''
+    data['age'] = ages.where(data['age'] != '')
+    records = []
+    for row in data[valid].itertuples(index=False):
+        record = row._asdict()
+        record['age'] = int(record['age']) if pd.notna(record['age']) else ''
+        records.append(record)
+
+    error_rows = [
+        {'row': int(index) + 2, 'message': message.rstrip('；')}
+        for index, message in errors[~valid].items()
+    ]
+    return records, error_rows
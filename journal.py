@@ -0,0 +1,129 @@
+import json
+import os
+import re
+from datetime import datetime
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 事件行中的选手ID（score_event 生成的事件以 id 开头）
+EVENT_ID = re.compile(rb'^\{"id": (-?\d+)[,}]')
+
+
+def score_event(contestant_id, judge_index: int, score: Optional[float], timestamp: Optional[str] = None) -> Dict:
+    """单个评委分数的修改事件；分数为None表示删除该评委的分数"""
+    return {'id': int(contestant_id), 'judge': int(judge_index), 'score': score,
+            'ts': timestamp or datetime.now().isoformat(timespec='seconds')}
+
+
+def diff_events(contestant_id, old_scores: List, new_scores: List) -> List[Dict]:
+    """比较新旧分数，生成需要追加的事件；分数为None表示删除该评委的分数"""
+    timestamp = datetime.now().isoformat(timespec='seconds')
+    events = []
+    for judge_index in range(max(len(old_scores), len(new_scores))):
+        old = old_scores[judge_index] if judge_index < len(old_scores) else None
+        new = new_scores[judge_index] if judge_index < len(new_scores) else None
+        if old != new:
+            events.append(score_event(contestant_id, judge_index, new, timestamp))
+    return events
+
+
+def apply_events(scores: Dict, events: List[Dict]):
+    """把事件依次应用到评分数据上；被修改的列表整体替换，不影响已返回给调用方的旧列表"""
+    for event in events:
+        key = str(event['id'])
+        values = list(scores.get(key, []))
+        judge_index = event['judge']
+        if judge_index >= len(values):
+            values.extend([None] * (judge_index + 1 - len(values)))
+        values[judge_index] = event['score']
+        # 去掉末尾被删除的评委分数
+        while values and values[-1] is None:
+            values.pop()
+        if values:
+            scores[key] = values
+        else:
+            scores.pop(key, None)
+
+
+def append_events(log_file: str, events: List[Dict]):
+    """追加事件并 fsync；上次写入中断留下的半行会先被截掉"""
+    with open(log_file, 'a+b') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size:
+            f.seek(size - 1)
+            if f.read(1) != b'\n':
+                f.seek(0)
+                valid = f.read().rfind(b'\n') + 1
+                f.truncate(valid)
+                f.seek(valid)
+        f.write(''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in events).encode('utf-8'))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_events(log_file: str, offset: int = 0) -> Tuple[List[Dict], int]:
+    """从字节偏移 offset 开始读取完整的事件行，返回 (事件列表, 新偏移)"""
+    try:
+        with open(log_file, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0
+
+    # 只处理到最后一个换行符，末尾未写完的半行留到下次
+    end = data.rfind(b'\n') + 1
+    events = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return events, offset + end
+
+
+def index_events(f: BinaryIO, offset: int = 0) -> Tuple[np.ndarray, np.ndarray, int]:
+    """为已打开的日志从字节偏移 offset 开始的完整事件行建立索引，返回 (各行的选手ID, 各行的起始偏移, 新偏移)
+
+    只从行首取出选手ID，不解析整行JSON。
+    """
+    f.seek(offset)
+    data = f.read()
+    end = data.rfind(b'\n') + 1
+    ids, starts = [], []
+    start = 0
+    for line in data[:end].split(b'\n')[:-1]:
+        if line.strip():
+            match = EVENT_ID.match(line)
+            ids.append(int(match.group(1)) if match else json.loads(line)['id'])
+            starts.append(offset + start)
+        start += len(line) + 1
+    return np.array(ids, dtype=np.int64), np.array(starts, dtype=np.int64), offset + end
+
+
+def read_events_at(f: BinaryIO, starts) -> List[Dict]:
+    """读取已打开的日志中从各偏移开始的事件行"""
+    events = []
+    for start in starts:
+        f.seek(start)
+        events.append(json.loads(f.readline()))
+    return events
+
+
+def log_signature(log_file: str) -> Optional[Tuple[int, int]]:
+    """日志文件的 (inode, 大小)；日志被压缩替换后inode改变"""
+    try:
+        stat = os.stat(log_file)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_size)
+
+
+def archive_events(log_file: str, history_file: str):
+    """压缩前把当前日志追加到历史文件，保留完整的修改记录"""
+    try:
+        with open(log_file, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return
+    data = data[:data.rfind(b'\n') + 1]
+    if data:
+        with open(history_file, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
@@ -0,0 +1,93 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from scoring import normalize_rule
+
+# 评委平均偏离共识超过该分数时标记为异常
+BIAS_THRESHOLD = 5.0
+
+# 评委与其他评委的平均相关系数低于该值时标记为异常
+CORRELATION_THRESHOLD = 0.3
+
+
+def _trimmed_share(matrix: np.ndarray, trim: int, highest: bool) -> np.ndarray:
+    """每个分数被去掉（作为 trim 个最高分或最低分之一）的份额
+
+    与临界分数同分的评委平分剩余名额，结果与评委顺序无关。
+    """
+    ordered = np.sort(matrix, axis=1)
+    if highest:
+        edge = ordered[:, -trim][:, None]
+        beyond = matrix > edge
+    else:
+        edge = ordered[:, trim - 1][:, None]
+        beyond = matrix < edge
+    tied = matrix == edge
+    slots = trim - beyond.sum(axis=1)
+    return beyond + tied * (slots / tied.sum(axis=1))[:, None]
+
+
+def _to_list(values: np.ndarray) -> List[Optional[float]]:
+    """转为列表，NaN 转为 None"""
+    return [None if value != value else value for value in values.tolist()]
+
+
+def analyze_judges(matrix: np.ndarray, rule: Optional[Dict] = None) -> Dict:
+    """对已集齐分数的选手 × 评委分数矩阵（不含NaN）一次性计算评委维度的统计
+
+    共识分为同一选手全部评委分数的中位数（不受个别评委整体偏高或偏低的影响），偏差为评委分数减共识分。
+    去分比例按评分规则去掉的最高/最低分个数统计，非去分规则时按各1个统计。
+    返回 {'contestants': 选手数, 'trim': 统计的最高/最低分个数,
+    'judges': [{'judge': 评委序号（从0开始）, 'mean', 'std', 'bias': 平均偏差, 'abs_deviation': 平均绝对偏差,
+    'trimmed_high': 作为最高分被去掉的比例, 'trimmed_low': 作为最低分被去掉的比例,
+    'correlation': 与其他评委的平均相关系数, 'flagged': 是否异常}],
+    'correlation': 评委两两之间的相关系数矩阵}，无法计算的值为None。
+    """
+    rule = normalize_rule(rule)
+    trim = rule['trim'] if rule['method'] == 'trimmed' else 1
+    rows, width = matrix.shape
+    result = {'contestants': rows, 'trim': trim, 'judges': [], 'correlation': []}
+    if not rows or not width:
+        return result
+
+    mean = matrix.mean(axis=0)
+    std = matrix.std(axis=0, ddof=1) if rows > 1 else np.zeros(width)
+
+    # 共识分：每位选手全部评委分数的中位数
+    deviation = matrix - np.median(matrix, axis=1)[:, None]
+    bias = deviation.mean(axis=0)
+    abs_deviation = np.abs(deviation).mean(axis=0)
+
+    trim = min(trim, width)
+    if trim:
+        trimmed_high = _trimmed_share(matrix, trim, True).mean(axis=0)
+        trimmed_low = _trimmed_share(matrix, trim, False).mean(axis=0)
+    else:
+        trimmed_high = trimmed_low = np.zeros(width)
+
+    # 相关系数：分数无变化的评委无法计算（NaN）
+    if rows > 1 and width > 1:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlation = np.atleast_2d(np.corrcoef(matrix, rowvar=False))
+        others = correlation.copy()
+        np.fill_diagonal(others, np.nan)
+        valid = ~np.isnan(others)
+        counts = valid.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            average = np.where(counts > 0, np.where(valid, others, 0.0).sum(axis=1) / counts, np.nan)
+    else:
+        correlation = np.full((width, width), np.nan)
+        average = np.full(width, np.nan)
+
+    flagged = ((np.abs(bias) >= BIAS_THRESHOLD)
+               | (np.nan_to_num(average, nan=1.0) < CORRELATION_THRESHOLD))
+    columns = zip(mean.tolist(), std.tolist(), bias.tolist(), abs_deviation.tolist(), trimmed_high.tolist(),
+                  trimmed_low.tolist(), _to_list(average), flagged.tolist())
+    result['judges'] = [
+        {'judge': judge, 'mean': m, 'std': s, 'bias': b, 'abs_deviation': d, 'trimmed_high': high,
+         'trimmed_low': low, 'correlation': c, 'flagged': f}
+        for judge, (m, s, b, d, high, low, c, f) in enumerate(columns)
+    ]
+    result['correlation'] = [_to_list(row) for row in correlation]
+    return result
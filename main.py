@@ -1,12 +1,31 @@
+import hmac
+import os
 import streamlit as st
-import pandas as pd
+from collections import OrderedDict
+from contextlib import nullcontext
 from datetime import datetime
+from columnar import CATEGORY_FIELDS
 from data_manager import DataManager
+from events import AGGREGATE_METHODS, DEFAULT_EVENT, DEFAULT_ROUND, EventStore
+from exporter import EXPORT_FORMATS, export_rows, zip_files
+from metrics import increment, metrics, timed, timer
+from ranking import RANK_METHODS, TIE_BREAKERS, describe_ranking
+from scoring import RULE_METHODS, describe_rule
+from storage import CONTESTANT_COLUMN_NAMES, StorageError
+
+# 每个会话缓存的派生表格个数，超出时淘汰最久未使用的
+VIEW_CACHE_SIZE = 16
+
+# 初始化数据管理器：每个赛事轮次一个实例，各自带一个所有会话共享的后台重算线程
+@st.cache_resource
+def get_data_manager(event=DEFAULT_EVENT, round_name=DEFAULT_ROUND):
+    data_manager = DataManager(event=event, round_name=round_name)
+    data_manager.start_background()
+    return data_manager
 
-# 初始化数据管理器
 @st.cache_resource
-def get_data_manager():
-    return DataManager()
+def get_event_store():
+    return EventStore()
 
 def main():
     st.set_page_config(
@@ -15,25 +34,74 @@ def main():
         layout="wide"
     )
     
-    # 初始化session state
-    if 'current_page' not in st.session_state:
+    # 初始化session state；新会话的首次渲染（含按需加载的依赖）计入 startup.first_render
+    first_run = 'current_page' not in st.session_state
+    if first_run:
         st.session_state.current_page = 'main'
     
-    data_manager = get_data_manager()
-    
-    # 主界面
-    if st.session_state.current_page == 'main':
-        show_main_menu()
-    elif st.session_state.current_page == 'contestant_input':
-        show_contestant_input(data_manager)
-    elif st.session_state.current_page == 'score_input':
-        show_score_input(data_manager)
-    elif st.session_state.current_page == 'contestant_scores':
-        show_contestant_scores(data_manager)
-    elif st.session_state.current_page == 'rankings':
-        show_rankings(data_manager)
-    elif st.session_state.current_page == 'statistics':
-        show_statistics(data_manager)
+    try:
+        with timer("startup.first_render") if first_run else nullcontext():
+            event, round_name = show_event_selector(get_event_store())
+            data_manager = get_data_manager(event, round_name)
+            show_page(data_manager)
+    except StorageError as e:
+        st.error(f"数据读取失败，请检查数据文件后重试：{e}")
+
+def show_page(data_manager):
+    """根据当前页面分发，并记录每个页面的渲染耗时"""
+    page = st.session_state.current_page
+    with timer(f"show_page.{page}"):
+        # 主界面
+        if page == 'main':
+            show_main_menu()
+        elif page == 'contestant_input':
+            show_contestant_input(data_manager)
+        elif page == 'contestant_import':
+            show_contestant_import(data_manager)
+        elif page == 'score_input':
+            show_score_input(data_manager)
+        elif page == 'contestant_scores':
+            show_contestant_scores(data_manager)
+        elif page == 'rankings':
+            show_rankings(data_manager)
+        elif page == 'statistics':
+            show_statistics(data_manager)
+        elif page == 'aggregate':
+            show_aggregate_rankings(get_event_store(), data_manager.event)
+        elif page == 'performance':
+            show_performance(data_manager)
+
+def show_event_selector(event_store):
+    """侧边栏：选择赛事和轮次，新建轮次"""
+    # 新建轮次后切换过去（须在选择框创建前修改其取值）
+    if 'pending_round' in st.session_state:
+        st.session_state.event, st.session_state.round = st.session_state.pop('pending_round')
+    
+    with st.sidebar:
+        st.header("🗂️ 赛事与轮次")
+        event = st.selectbox("赛事", options=event_store.list_events(), key="event")
+        round_name = st.selectbox("轮次", options=event_store.list_rounds(event), key="round")
+        
+        with st.expander("➕ 新建赛事/轮次"):
+            with st.form("create_round", clear_on_submit=True):
+                new_event = st.text_input("赛事名称", value=event)
+                new_round = st.text_input("轮次名称", placeholder="如：第2轮、决赛")
+                copy_from = st.checkbox(f"从当前轮次（{round_name}）复制选手和评分规则", value=True)
+                top_n = st.number_input("只复制排名前N名（0为全部）", min_value=0, value=0, step=1)
+                
+                if st.form_submit_button("创建"):
+                    try:
+                        same_event = new_event.strip() == event
+                        event_store.create_round(
+                            new_event, new_round,
+                            source_round=round_name if copy_from and same_event else None,
+                            top_n=int(top_n) or None
+                        )
+                        st.session_state.pending_round = (new_event.strip(), new_round.strip())
+                        st.rerun()
+                    except ValueError as e:
+                        st.error(str(e))
+    return event, round_name
 
 def show_main_menu():
     """显示主菜单"""
@@ -50,6 +118,10 @@ def show_main_menu():
             st.session_state.current_page = 'contestant_input'
             st.rerun()
             
+        if st.button("📥 批量导入选手", use_container_width=True, key="btn_import"):
+            st.session_state.current_page = 'contestant_import'
+            st.rerun()
+            
         if st.button("2️⃣ 评委分数录入", use_container_width=True, key="btn_2"):
             st.session_state.current_page = 'score_input'
             st.rerun()
@@ -66,11 +138,146 @@ def show_main_menu():
             st.session_state.current_page = 'statistics'
             st.rerun()
             
+        if st.button("🏅 综合排名（跨轮次）", use_container_width=True, key="btn_aggregate"):
+            st.session_state.current_page = 'aggregate'
+            st.rerun()
+            
+        # 性能监控仅在配置了管理员口令时提供
+        if os.environ.get('SCORE_ADMIN_TOKEN'):
+            if st.button("⚙️ 性能监控（管理员）", use_container_width=True, key="btn_performance"):
+                st.session_state.current_page = 'performance'
+                st.rerun()
+            
         st.markdown("")
         if st.button("5️⃣ 结束程序", use_container_width=True, key="btn_5", type="secondary"):
             st.success("感谢使用选手评分排名系统！")
             st.balloons()
 
+def show_download_button(label, file_prefix, export, key):
+    """显示导出格式选择和下载按钮，点击下载时才生成文件"""
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col2:
+        fmt = st.selectbox("导出格式", options=list(EXPORT_FORMATS.keys()), key=f"{key}_format",
+                           label_visibility="collapsed")
+    mime, extension = EXPORT_FORMATS[fmt]
+    with col1:
+        st.download_button(
+            label=label,
+            data=lambda: export(fmt) or b'',
+            file_name=f"{file_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+            mime=mime,
+            key=key
+        )
+
+def background_export(data_manager, task):
+    """导出函数：Excel 在下载时由后台按当前数据版本生成并缓存（正在生成时等待同一任务），其他格式即时生成"""
+    export = getattr(data_manager, task)
+    
+    def run(fmt):
+        if fmt == 'xlsx':
+            return data_manager.background.get(task)
+        return export(fmt)
+    return run
+
+def show_stale_notice(current):
+    """后台结果不是最新数据时的提示"""
+    if not current:
+        st.caption("⏳ 数据已更新，正在后台重新计算，当前显示的是上一次的结果")
+
+def show_filters(data_manager, key, scored_filter=False):
+    """显示筛选控件，返回筛选条件"""
+    options = data_manager.get_filter_options()
+    cols = st.columns(6 if scored_filter else 5)
+    filters = {}
+    with cols[0]:
+        filters['keyword'] = st.text_input("搜索", placeholder="姓名或电话", key=f"{key}_keyword").strip()
+    for col, (field, label) in zip(cols[1:5], [('gender', '性别'), ('province', '省份'),
+                                               ('school', '学校'), ('class_name', '班级')]):
+        with col:
+            value = st.selectbox(label, options=["全部"] + options[field], key=f"{key}_{field}")
+            filters[field] = None if value == "全部" else value
+    if scored_filter:
+        with cols[5]:
+            status = st.selectbox("评分状态", options=["全部", "已评分", "未评分"], key=f"{key}_scored")
+            filters['scored'] = {"全部": None, "已评分": True, "未评分": False}[status]
+    return filters
+
+def show_report_download(data_manager):
+    """汇总报表下载：选手、评分、排名三个工作表，可按学校等分组，每组一个文件，打包为zip"""
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+    with col2:
+        group_by = st.selectbox("分组", options=[None, *CATEGORY_FIELDS], key="download_report_group",
+                                format_func=lambda f: "不分组" if f is None else f"按{CONTESTANT_COLUMN_NAMES[f]}",
+                                label_visibility="collapsed")
+    with col3:
+        fmt = st.selectbox("导出格式", options=list(EXPORT_FORMATS.keys()), key="download_report_format",
+                           label_visibility="collapsed")
+    with col1:
+        st.download_button(
+            label="📦 下载汇总报表",
+            data=lambda: zip_files(data_manager.export_report(group_by, fmt)),
+            file_name=f"汇总报表_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+            mime="application/zip",
+            key="download_report"
+        )
+
+def _freeze(value):
+    """把查询参数转换为可哈希的缓存键"""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+def memoized_view(data_manager, name, args, build):
+    """按数据版本缓存页面派生的表格（DataFrame / Styler 等）
+    
+    键为 (视图名, 数据管理器, 数据版本, 参数)：数据未变化时，表单输入等交互引起的重新运行直接复用。
+    缓存保存在会话中，Styler 不会被多个会话同时渲染。
+    """
+    cache = st.session_state.setdefault('view_cache', OrderedDict())
+    key = (name, id(data_manager), data_manager.get_data_version(), _freeze(args))
+    if key in cache:
+        cache.move_to_end(key)
+        increment('view_cache.hit')
+        return cache[key]
+    
+    increment('view_cache.miss')
+    value = cache[key] = build()
+    while len(cache) > VIEW_CACHE_SIZE:
+        cache.popitem(last=False)
+    return value
+
+def paged_view(data_manager, key, query, build, page_size=20, **kwargs):
+    """按当前页码分页查询，并用 build 把当前页转换为显示用的表格，返回 (表格, 总条数, 总页数)
+    
+    查询与构建结果按数据版本缓存，只有数据、页码或查询条件变化时才重新计算。
+    """
+    page_key = f"{key}_page"
+    
+    def load(page):
+        def run():
+            result = query(offset=(page - 1) * page_size, limit=page_size, **kwargs)
+            return build(result['items']), result['total']
+        return memoized_view(data_manager, key, (page, page_size, kwargs), run)
+    
+    page = st.session_state.get(page_key, 1)
+    view, total = load(page)
+    pages = max(1, -(-total // page_size))
+    if page > pages:
+        # 筛选条件变化后页码超出范围，回到最后一页
+        st.session_state[page_key] = pages
+        view, total = load(pages)
+    return view, total, pages
+
+def show_pager(key, total, pages):
+    """显示分页控件"""
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        st.number_input("页码", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    with col2:
+        st.caption(f"共 {total} 条，{pages} 页")
+
 def show_contestant_input(data_manager):
     """选手信息录入界面"""
     st.title("1️⃣ 选手信息录入")
@@ -82,42 +289,38 @@ def show_contestant_input(data_manager):
     
     st.markdown("---")
     
-    # 加载现有选手数据
-    contestants = data_manager.load_contestants()
-    
-    # 显示现有选手
-    if contestants:
+    # 显示现有选手（分页）
+    if data_manager.query_contestants(limit=1)['total']:
         st.subheader("📋 现有选手信息")
         
+        filters = show_filters(data_manager, "contestants")
+        
         # 创建DataFrame用于显示
-        display_data = []
-        for contestant in contestants:
-            display_data.append({
-                'ID': contestant['id'],
-                '姓名': contestant['name'],
-                '性别': contestant.get('gender', ''),
-                '年龄': contestant.get('age', ''),
-                '班级': contestant.get('class_name', ''),
-                '学校': contestant.get('school', ''),
-                '省份': contestant.get('province', ''),
-                '城市': contestant.get('city', ''),
-                '联系电话': contestant['phone']
-            })
+        def build(contestants):
+            import pandas as pd
+            display_data = []
+            for contestant in contestants:
+                display_data.append({
+                    'ID': contestant['id'],
+                    '姓名': contestant['name'],
+                    '性别': contestant.get('gender', ''),
+                    '年龄': contestant.get('age', ''),
+                    '班级': contestant.get('class_name', ''),
+                    '学校': contestant.get('school', ''),
+                    '省份': contestant.get('province', ''),
+                    '城市': contestant.get('city', ''),
+                    '联系电话': contestant['phone']
+                })
+            return pd.DataFrame(display_data)
         
-        df = pd.DataFrame(display_data)
+        df, total, pages = paged_view(data_manager, "contestants", data_manager.query_contestants, build,
+                                      filters=filters)
         st.dataframe(df, use_container_width=True)
+        show_pager("contestants", total, pages)
         
         # 添加下载按钮
-        col1, col2, col3 = st.columns([1, 1, 2])
-        with col1:
-            excel_data = data_manager.export_contestants_to_excel()
-            if excel_data:
-                st.download_button(
-                    label="📥 下载选手信息表",
-                    data=excel_data,
-                    file_name=f"选手信息_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+        show_download_button("📥 下载选手信息表", "选手信息", background_export(data_manager, 'export_contestants'),
+                             "download_contestants")
         
         st.markdown("---")
     
@@ -153,20 +356,15 @@ def show_contestant_input(data_manager):
             if not name or not phone or gender == "请选择" or province == "请选择":
                 st.error("请填写所有必填字段（标有 * 的字段）！")
             else:
-                # 生成新的ID
-                new_id = len(contestants) + 1 if contestants else 1
-                
                 # 检查是否已存在相同姓名或电话
-                existing_names = [c['name'] for c in contestants]
-                existing_phones = [c['phone'] for c in contestants]
-                
-                if name in existing_names:
+                if data_manager.exists_name(name):
                     st.error("该选手姓名已存在！")
-                elif phone in existing_phones:
+                elif data_manager.find_by_phone(phone):
                     st.error("该联系电话已存在！")
                 else:
+                    # ID由数据管理器统一分配，删除选手或多端同时添加也不会冲突
                     new_contestant = {
-                        'id': new_id,
+                        'id': None,
                         'name': name,
                         'gender': gender,
                         'age': age,
@@ -176,14 +374,101 @@ def show_contestant_input(data_manager):
                         'city': city,
                         'phone': phone
                     }
-                    contestants.append(new_contestant)
-                    
-                    if data_manager.save_contestants(contestants):
+                    if data_manager.add_contestant(new_contestant):
                         st.success(f"选手 {name} 添加成功！")
                         st.rerun()
                     else:
                         st.error("保存失败，请重试！")
 
+def show_contestant_import(data_manager):
+    """批量导入选手界面"""
+    st.title("📥 批量导入选手")
+    
+    # 返回按钮
+    if st.button("← 返回主菜单", key="back_import"):
+        st.session_state.current_page = 'main'
+        st.rerun()
+    
+    st.markdown("---")
+    
+    st.markdown("上传CSV或Excel文件，表头可使用中文列名或英文字段名。"
+                "必填列：**姓名、性别、省份、联系电话**；可选列：年龄、班级、学校、城市。")
+    
+    template = "姓名,性别,年龄,班级,学校,省份,城市,联系电话\n张三,男,20,计算机1班,示例大学,北京市,北京,13800138001\n"
+    st.download_button(
+        label="📄 下载导入模板",
+        data=template.encode('utf-8-sig'),
+        file_name="选手导入模板.csv",
+        mime="text/csv"
+    )
+    
+    uploaded = st.file_uploader("选择文件", type=['csv', 'xlsx', 'xls'])
+    if uploaded is None:
+        return
+    
+    from importer import read_contestant_file
+    try:
+        df = read_contestant_file(uploaded, uploaded.name)
+    except Exception as e:
+        st.error(f"文件读取失败：{e}")
+        return
+    
+    st.info(f"文件共 {len(df)} 行数据")
+    st.dataframe(df.head(20), use_container_width=True)
+    
+    if st.button("开始导入", use_container_width=True, key="do_import"):
+        try:
+            result = data_manager.import_contestants(df)
+        except ValueError as e:
+            st.error(str(e))
+            return
+        
+        if result['imported']:
+            st.success(f"成功导入 {result['imported']} 名选手！")
+        if result['errors']:
+            st.warning(f"{len(result['errors'])} 行未导入，请修改后重新上传：")
+            import pandas as pd
+            errors_df = pd.DataFrame(result['errors']).rename(columns={'row': '行号', 'message': '错误原因'})
+            st.dataframe(errors_df, use_container_width=True)
+
+def show_rule_settings(data_manager, settings):
+    """评分规则与评委人数设置"""
+    rule = settings['scoring_rule']
+    with st.expander(f"⚙️ 评分规则：{describe_rule(rule)}（{settings['judge_count']}位评委）"):
+        with st.form("rule_settings"):
+            methods = list(RULE_METHODS)
+            method = st.selectbox("计分方法", methods, index=methods.index(rule['method']),
+                                  format_func=RULE_METHODS.get)
+            judge_count = st.number_input("评委人数", min_value=1, max_value=50,
+                                          value=settings['judge_count'], step=1)
+            trim = st.number_input("去掉最高分/最低分的个数（仅去极值平均）", min_value=0, max_value=10,
+                                   value=rule.get('trim', 1), step=1)
+            weights = st.text_input("评委权重（仅加权平均，用逗号分隔，未填写的评委权重为1）",
+                                    value=', '.join(f"{w:g}" for w in rule.get('weights', [])))
+            ranking_rule = settings['ranking_rule']
+            rank_methods = list(RANK_METHODS)
+            rank_method = st.selectbox("同分名次", rank_methods, index=rank_methods.index(ranking_rule['method']),
+                                       format_func=RANK_METHODS.get)
+            tie_break = st.multiselect("决胜规则（最终得分相同时按选择顺序依次比较，全部相同才并列）",
+                                       list(TIE_BREAKERS), default=ranking_rule['tie_break'],
+                                       format_func=TIE_BREAKERS.get)
+            
+            if st.form_submit_button("保存设置"):
+                new_rule = {'method': method}
+                try:
+                    if method == 'trimmed':
+                        new_rule['trim'] = int(trim)
+                    elif method == 'weighted':
+                        new_rule['weights'] = [float(w) for w in weights.replace('，', ',').split(',') if w.strip()]
+                    if (data_manager.set_scoring_rule(new_rule) and data_manager.set_judge_count(int(judge_count))
+                            and data_manager.set_ranking_rule({'method': rank_method, 'tie_break': tie_break})):
+                        st.success("设置已保存，排名已按新规则重新计算")
+                        st.rerun()
+                    else:
+                        st.error("保存失败，请重试！")
+                except ValueError as e:
+                    st.error(f"设置无效：{e}")
+
 def show_score_input(data_manager):
     """评委分数录入界面"""
     st.title("2️⃣ 评委分数录入")
@@ -195,71 +480,107 @@ def show_score_input(data_manager):
     
     st.markdown("---")
     
-    contestants = data_manager.load_contestants()
-    scores_data = data_manager.load_scores()
-    
-    if not contestants:
+    if not data_manager.query_contestants(limit=1)['total']:
         st.warning("请先录入选手信息！")
         return
     
-    # 显示已评分选手
+    scores_data = data_manager.score_table()
+    settings = data_manager.get_settings()
+    judge_count = settings['judge_count']
+    
+    show_rule_settings(data_manager, settings)
+    
+    # 显示已评分选手（分页）
     if scores_data:
         st.subheader("📊 已评分选手")
-        scored_contestants = []
-        for contestant in contestants:
-            if str(contestant['id']) in scores_data:
-                scores = scores_data[str(contestant['id'])]
-                final_score = data_manager.calculate_final_score(scores)
+        progress = data_manager.get_summary()['completeness']
+        col1, col2, col3 = st.columns(3)
+        col1.metric("已集齐分数", progress['complete'])
+        col2.metric("部分评委已提交", progress['partial'])
+        col3.metric("尚未评分", progress['unscored'])
+        
+        def build(contestants):
+            import pandas as pd
+            scored_contestants = []
+            for detail in data_manager.get_score_details(contestants):
+                contestant = detail['contestant']
+                submitted = sum(score is not None for score in detail['scores'][:judge_count])
                 scored_contestants.append({
                     'ID': contestant['id'],
                     '姓名': contestant['name'],
                     '性别': contestant.get('gender', ''),
                     '班级': contestant.get('class_name', ''),
-                    '最终得分': round(final_score, 2)
+                    '评分进度': f"{submitted}/{judge_count}",
+                    # 分数未集齐时不计入排名，不显示最终得分
+                    '最终得分': round(detail['final_score'], 2) if detail['complete'] else None
                 })
+            return pd.DataFrame(scored_contestants)
         
-        if scored_contestants:
-            df = pd.DataFrame(scored_contestants)
+        df, total, pages = paged_view(data_manager, "scored", data_manager.query_contestants, build,
+                                      filters={'scored': True})
+        if not df.empty:
             st.dataframe(df, use_container_width=True)
+            show_pager("scored", total, pages)
             
             # 下载评分表
-            col1, col2, col3 = st.columns([1, 1, 2])
-            with col1:
-                excel_data = data_manager.export_scores_to_excel()
-                if excel_data:
-                    st.download_button(
-                        label="📥 下载评分详情表",
-                        data=excel_data,
-                        file_name=f"评分详情_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
+            show_download_button("📥 下载评分详情表", "评分详情", background_export(data_manager, 'export_scores'),
+                                 "download_scores")
         
         st.markdown("---")
     
-    # 选择选手
+    # 选择选手：按姓名或电话搜索，只列出前100个匹配
     st.subheader("👤 选择选手")
-    contestant_options = {f"{c['name']} ({c.get('gender', '')}, {c.get('class_name', '')}) - ID: {c['id']}": c['id'] for c in contestants}
+    keyword = st.text_input("搜索选手", placeholder="输入姓名或电话筛选", key="score_search").strip()
+    matches = data_manager.query_contestants(limit=100, filters={'keyword': keyword})
+    if matches['total'] > len(matches['items']):
+        st.caption(f"共 {matches['total']} 名匹配选手，仅显示前 {len(matches['items'])} 名，请输入更多关键字")
+    contestant_options = {f"{c['name']} ({c.get('gender', '')}, {c.get('class_name', '')}) - ID: {c['id']}": c['id'] for c in matches['items']}
     selected_contestant = st.selectbox("请选择要录入分数的选手", options=list(contestant_options.keys()))
     
     if selected_contestant:
         contestant_id = contestant_options[selected_contestant]
-        contestant_name = selected_contestant.split(' (')[0]
+        contestant_name = data_manager.get_contestant(contestant_id)['name']
         
         st.markdown("---")
         st.subheader(f"🎯 为选手 {contestant_name} 录入评委分数")
         
-        # 显示当前分数（如果有）
-        current_scores = scores_data.get(str(contestant_id), [])
+        # 显示当前分数和评分进度
+        progress = data_manager.get_score_progress(contestant_id)
+        current_scores = progress['scores']
+        if progress['submitted'] and not progress['complete']:
+            st.progress((judge_count - len(progress['missing'])) / judge_count,
+                        text=f"已提交 {judge_count - len(progress['missing'])}/{judge_count} 位评委，"
+                             f"待提交：{'、'.join(f'评委{i+1}' for i in progress['missing'])}")
+        
+        history = data_manager.get_score_history(contestant_id)
+        if history:
+            with st.expander(f"📜 修改记录（{len(history)} 条）"):
+                import pandas as pd
+                history_df = pd.DataFrame([
+                    {
+                        '时间': event['ts'],
+                        '评委': f"评委{event['judge'] + 1}",
+                        '分数': '已删除' if event['score'] is None else f"{event['score']:.1f}"
+                    }
+                    for event in reversed(history)
+                ])
+                st.dataframe(history_df, use_container_width=True)
+        
+        mode = st.radio("录入方式", ["整组录入", "按评委录入"], horizontal=True, key="score_mode",
+                        help="按评委录入：各评委在自己的设备上只提交自己的分数，集齐全部评委的分数后计入排名")
+        if mode == "按评委录入":
+            show_judge_score_input(data_manager, contestant_id, contestant_name, progress)
+            return
         
         with st.form(f"score_input_{contestant_id}"):
-            st.markdown("请输入10位评委的分数（0-100分）：")
+            st.markdown(f"请输入{judge_count}位评委的分数（0-100分）：")
             
             cols = st.columns(5)
             scores = []
             
-            for i in range(10):
+            for i in range(judge_count):
                 with cols[i % 5]:
-                    default_value = current_scores[i] if i < len(current_scores) else 0.0
+                    default_value = current_scores[i] if current_scores[i] is not None else 0.0
                     score = st.number_input(
                         f"评委{i+1}", 
                         min_value=0.0, 
@@ -273,9 +594,9 @@ def show_score_input(data_manager):
             submitted = st.form_submit_button("保存分数", use_container_width=True)
             
             if submitted:
-                scores_data[str(contestant_id)] = scores
-                if data_manager.save_scores(scores_data):
-                    st.success(f"选手 {contestant_name} 的分数保存成功！")
+                if data_manager.save_contestant_scores(contestant_id, scores):
+                    rank = data_manager.get_rank(contestant_id)
+                    st.success(f"选手 {contestant_name} 的分数保存成功！当前排名：第 {rank} 名")
                     
                     # 显示分数统计
                     st.markdown("### 📊 分数统计")
@@ -293,6 +614,40 @@ def show_score_input(data_manager):
                 else:
                     st.error("保存失败，请重试！")
 
+def show_judge_score_input(data_manager, contestant_id, contestant_name, progress):
+    """单个评委提交自己的分数，不影响其他评委已提交的分数"""
+    judge_count = progress['judge_count']
+    # 评委序号保存在会话中，切换选手后仍是同一位评委
+    judge_index = st.selectbox("我是", options=list(range(judge_count)), format_func=lambda i: f"评委{i+1}",
+                               key="judge_slot")
+    current = progress['scores'][judge_index]
+    
+    with st.form(f"judge_score_{contestant_id}_{judge_index}"):
+        score = st.number_input(
+            f"评委{judge_index+1}的分数（0-100分）",
+            min_value=0.0,
+            max_value=100.0,
+            value=float(current) if current is not None else 0.0,
+            step=0.1
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            submitted = st.form_submit_button("提交分数", use_container_width=True)
+        with col2:
+            withdrawn = st.form_submit_button("撤回分数", use_container_width=True, disabled=current is None)
+    
+    if submitted or withdrawn:
+        if not data_manager.submit_judge_score(contestant_id, judge_index, score if submitted else None):
+            st.error("保存失败，请重试！")
+            return
+        progress = data_manager.get_score_progress(contestant_id)
+        if progress['complete']:
+            rank = data_manager.get_rank(contestant_id)
+            st.success(f"评委{judge_index+1}的分数已保存，选手 {contestant_name} 已集齐全部评委分数，当前排名：第 {rank} 名")
+        else:
+            missing = '、'.join(f"评委{i+1}" for i in progress['missing'])
+            st.success(f"评委{judge_index+1}的分数已保存，选手 {contestant_name} 还需：{missing}")
+
 def show_contestant_scores(data_manager):
     """选手得分界面"""
     st.title("3️⃣ 选手得分")
@@ -304,24 +659,30 @@ def show_contestant_scores(data_manager):
     
     st.markdown("---")
     
-    contestants = data_manager.load_contestants()
-    scores_data = data_manager.load_scores()
-    
-    if not contestants:
+    if not data_manager.query_contestants(limit=1)['total']:
         st.warning("请先录入选手信息！")
         return
     
-    if not scores_data:
+    if not data_manager.query_contestants(limit=1, filters={'scored': True})['total']:
         st.warning("请先录入评委分数！")
         return
     
     st.subheader("🎯 选手得分详情")
-    st.markdown("*计算方法：去掉最高分和最低分后的平均分*")
+    st.markdown(f"*计算方法：{describe_rule(data_manager.get_scoring_rule())}*")
+    
+    # 只渲染当前页的选手
+    filters = show_filters(data_manager, "contestant_scores", scored_filter=True)
+    
+    def build(contestants):
+        return contestants, {d['contestant']['id']: d for d in data_manager.get_score_details(contestants)}
+    
+    (contestants, details), total, pages = paged_view(data_manager, "contestant_scores",
+                                                      data_manager.query_contestants, build, filters=filters)
     
     for contestant in contestants:
-        contestant_id = str(contestant['id'])
-        if contestant_id in scores_data:
-            scores = scores_data[contestant_id]
+        detail = details.get(contestant['id'])
+        if detail:
+            scores = detail['scores']
             
             with st.expander(f"🏃‍♂️ {contestant['name']} ({contestant.get('gender', '')}, {contestant.get('class_name', '')}) - ID: {contestant['id']}"):
                 col1, col2 = st.columns([2, 1])
@@ -331,17 +692,63 @@ def show_contestant_scores(data_manager):
                     score_cols = st.columns(5)
                     for i, score in enumerate(scores):
                         with score_cols[i % 5]:
-                            st.metric(f"评委{i+1}", f"{score:.1f}")
+                            st.metric(f"评委{i+1}", "未提交" if score is None else f"{score:.1f}")
                 
                 with col2:
                     st.markdown("**统计信息：**")
-                    st.metric("最高分", f"{max(scores):.1f}")
-                    st.metric("最低分", f"{min(scores):.1f}")
-                    final_score = data_manager.calculate_final_score(scores)
-                    st.metric("**最终得分**", f"{final_score:.1f}")
+                    st.metric("最高分", f"{detail['max_score']:.1f}")
+                    st.metric("最低分", f"{detail['min_score']:.1f}")
+                    # 分数未集齐时不计入排名，不显示最终得分
+                    st.metric("**最终得分**", f"{detail['final_score']:.1f}" if detail['complete'] else "未集齐")
         else:
             with st.expander(f"🏃‍♂️ {contestant['name']} ({contestant.get('gender', '')}, {contestant.get('class_name', '')}) - ID: {contestant['id']}"):
                 st.warning("该选手尚未录入分数")
+    
+    show_pager("contestant_scores", total, pages)
+
+# 使用颜色突出前三名
+def highlight_top3(row):
+    if row['排名'] == 1:
+        return ['background-color: #FFD700'] * len(row)  # 金色
+    elif row['排名'] == 2:
+        return ['background-color: #C0C0C0'] * len(row)  # 银色
+    elif row['排名'] == 3:
+        return ['background-color: #CD7F32'] * len(row)  # 铜色
+    else:
+        return [''] * len(row)
+
+@st.fragment(run_every=2)
+@timed()
+def show_live_leaderboard(data_manager, top_n):
+    """大屏实时排行榜：每2秒检查排行榜版本号，有变化时只取回变更的排名记录"""
+    key = f"live_board_{data_manager.event}_{data_manager.round_name}_{top_n}"
+    board = st.session_state.setdefault(key, {'version': None, 'rows': {}, 'styled': None})
+    
+    update = data_manager.get_leaderboard_update(board['version'], top_n, board['rows'].keys())
+    if update['order'] is not None:
+        rows = {} if update['full'] else board['rows']
+        rows.update({row['id']: row for row in update['rows']})
+        board['rows'] = {contestant_id: rows[contestant_id] for contestant_id in update['order']}
+        import pandas as pd
+        df = pd.DataFrame([
+            {
+                '排名': rank,
+                '姓名': row['name'],
+                '班级': row['class_name'],
+                '学校': row['school'],
+                '最终得分': f"{row['final_score']:.2f}"
+            }
+            for rank, row in zip(update['ranks'], board['rows'].values())
+        ])
+        with timer("show_live_leaderboard.style"):
+            board['styled'] = df.style.apply(highlight_top3, axis=1) if not df.empty else None
+        board['version'] = update['version']
+    
+    if board['styled'] is None:
+        st.info("暂无排名数据")
+    else:
+        st.dataframe(board['styled'], use_container_width=True, hide_index=True)
+    st.caption(f"自动刷新 · 数据版本 {board['version']}")
 
 def show_rankings(data_manager):
     """选手排名界面"""
@@ -354,94 +761,89 @@ def show_rankings(data_manager):
     
     st.markdown("---")
     
-    rankings = data_manager.get_rankings()
+    # 大屏模式：只显示自动刷新的前N名
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        live = st.toggle("📺 大屏实时模式", key="live_mode")
+    if live:
+        with col2:
+            top_n = st.number_input("显示前N名", min_value=3, max_value=100, value=10, step=1, key="live_top_n")
+        show_live_leaderboard(data_manager, int(top_n))
+        return
     
-    if not rankings:
+    top3 = memoized_view(data_manager, "top3", (), lambda: data_manager.get_top(3))
+    
+    if not top3:
         st.warning("暂无排名数据，请先录入选手信息和评委分数！")
         return
     
     st.subheader("🏆 选手排名榜")
-    st.markdown("*按最终得分从高到低排序*")
+    st.markdown(f"*{describe_ranking(data_manager.get_ranking_rule())}*")
+    
+    # 只查询当前页的排名
+    filters = show_filters(data_manager, "rankings")
     
     # 创建排名表格
-    ranking_data = []
-    for i, contestant in enumerate(rankings):
-        if contestant['scores']:  # 只显示有分数的选手
-            ranking_data.append({
-                '排名': i + 1,
-                '选手ID': contestant['id'],
-                '姓名': contestant['name'],
-                '性别': contestant['gender'],
-                '年龄': contestant['age'],
-                '班级': contestant['class_name'],
-                '学校': contestant['school'],
-                '省份': contestant['province'],
-                '城市': contestant['city'],
-                '联系电话': contestant['phone'],
-                '最终得分': f"{contestant['final_score']:.2f}",
-                '最高分': f"{max(contestant['scores']):.1f}",
-                '最低分': f"{min(contestant['scores']):.1f}",
-                '平均分': f"{sum(contestant['scores'])/len(contestant['scores']):.2f}"
-            })
+    def build(contestants):
+        ranking_data = []
+        for contestant in contestants:
+            if contestant['scores']:  # 只显示有分数的选手
+                ranking_data.append({
+                    '排名': contestant['rank'],
+                    '选手ID': contestant['id'],
+                    '姓名': contestant['name'],
+                    '性别': contestant['gender'],
+                    '年龄': contestant['age'],
+                    '班级': contestant['class_name'],
+                    '学校': contestant['school'],
+                    '省份': contestant['province'],
+                    '城市': contestant['city'],
+                    '联系电话': contestant['phone'],
+                    '最终得分': f"{contestant['final_score']:.2f}",
+                    '最高分': f"{contestant['max_score']:.1f}",
+                    '最低分': f"{contestant['min_score']:.1f}",
+                    '平均分': f"{contestant['mean_score']:.2f}"
+                })
+        if not ranking_data:
+            return None
+        import pandas as pd
+        return pd.DataFrame(ranking_data).style.apply(highlight_top3, axis=1)
     
-    if ranking_data:
-        df = pd.DataFrame(ranking_data)
-        
-        # 使用颜色突出前三名
-        def highlight_top3(row):
-            if row['排名'] == 1:
-                return ['background-color: #FFD700'] * len(row)  # 金色
-            elif row['排名'] == 2:
-                return ['background-color: #C0C0C0'] * len(row)  # 银色
-            elif row['排名'] == 3:
-                return ['background-color: #CD7F32'] * len(row)  # 铜色
-            else:
-                return [''] * len(row)
-        
-        styled_df = df.style.apply(highlight_top3, axis=1)
-        st.dataframe(styled_df, use_container_width=True)
+    styled_df, total, pages = paged_view(data_manager, "rankings", data_manager.query_rankings, build,
+                                         filters=filters)
+    
+    if styled_df is not None:
+        # Styler 在 st.dataframe 中才真正计算样式，一并计时
+        with timer("show_rankings.style"):
+            st.dataframe(styled_df, use_container_width=True)
+        show_pager("rankings", total, pages)
+    else:
+        st.info("没有符合筛选条件的选手")
+    
+    # 下载排名表
+    show_download_button("📥 下载排名表", "选手排名", background_export(data_manager, 'export_rankings'),
+                         "download_rankings")
+    show_report_download(data_manager)
+    
+    # 显示获奖选手（全体前三位，并列时按名次显示同一奖项）
+    ranking_data = [
+        {'名次': c['rank'], '姓名': c['name'], '最终得分': f"{c['final_score']:.2f}", '班级': c['class_name']}
+        for c in top3 if c['scores']
+    ]
+    if len(ranking_data) >= 1:
+        st.markdown("---")
+        st.subheader("🎉 获奖选手")
         
-        # 下载排名表
-        col1, col2, col3 = st.columns([1, 1, 2])
-        with col1:
-            excel_data = data_manager.export_rankings_to_excel()
-            if excel_data:
-                st.download_button(
-                    label="📥 下载排名表",
-                    data=excel_data,
-                    file_name=f"选手排名_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+        cols = st.columns(3)
+        awards = {1: ("### 🥇 冠军", st.success), 2: ("### 🥈 亚军", st.info), 3: ("### 🥉 季军", st.warning)}
         
-        # 显示获奖选手
-        if len(ranking_data) >= 1:
-            st.markdown("---")
-            st.subheader("🎉 获奖选手")
-            
-            cols = st.columns(3)
-            
-            if len(ranking_data) >= 1:
-                with cols[0]:
-                    st.markdown("### 🥇 冠军")
-                    st.success(f"**{ranking_data[0]['姓名']}**")
-                    st.write(f"得分: {ranking_data[0]['最终得分']}")
-                    st.write(f"班级: {ranking_data[0]['班级']}")
-            
-            if len(ranking_data) >= 2:
-                with cols[1]:
-                    st.markdown("### 🥈 亚军")
-                    st.info(f"**{ranking_data[1]['姓名']}**")
-                    st.write(f"得分: {ranking_data[1]['最终得分']}")
-                    st.write(f"班级: {ranking_data[1]['班级']}")
-            
-            if len(ranking_data) >= 3:
-                with cols[2]:
-                    st.markdown("### 🥉 季军")
-                    st.warning(f"**{ranking_data[2]['姓名']}**")
-                    st.write(f"得分: {ranking_data[2]['最终得分']}")
-                    st.write(f"班级: {ranking_data[2]['班级']}")
-    else:
-        st.warning("所有选手都尚未录入分数！")
+        for col, winner in zip(cols, ranking_data):
+            title, show = awards.get(winner['名次'], awards[3])
+            with col:
+                st.markdown(title)
+                show(f"**{winner['姓名']}**")
+                st.write(f"得分: {winner['最终得分']}")
+                st.write(f"班级: {winner['班级']}")
 
 def show_statistics(data_manager):
     """数据统计界面"""
@@ -454,10 +856,10 @@ def show_statistics(data_manager):
     
     st.markdown("---")
     
-    # 获取统计数据
-    stats = data_manager.get_statistics()
-    contestants = data_manager.load_contestants()
-    rankings = data_manager.get_rankings()
+    # 获取统计数据：使用后台最近一次计算完成的摘要，不等待本次保存后的重算
+    summary, current = data_manager.background.latest('summary')
+    stats = summary['statistics']
+    show_stale_notice(current)
     
     # 基本统计
     st.subheader("📈 基本统计")
@@ -486,17 +888,22 @@ def show_statistics(data_manager):
             st.metric("平均分", f"{stats['average_score']:.2f}")
         
         # 分数分布图
-        if rankings:
+        if stats['score_histogram']:
             st.markdown("---")
             st.subheader("📊 分数分布")
-            final_scores = [r['final_score'] for r in rankings if r['final_score'] > 0]
-            df_scores = pd.DataFrame({'最终得分': final_scores})
-            st.bar_chart(df_scores['最终得分'])
+            # 指标不需要 pandas，分布图和表格才加载
+            import pandas as pd
+            df_scores = pd.DataFrame({
+                '分数段': list(stats['score_histogram']),
+                '人数': list(stats['score_histogram'].values())
+            })
+            st.bar_chart(df_scores, x='分数段', y='人数')
     
     # 人员分布统计
-    if contestants:
+    if stats['total_contestants']:
         st.markdown("---")
         st.subheader("👥 人员分布")
+        import pandas as pd
         
         col1, col2, col3 = st.columns(3)
         
@@ -517,6 +924,181 @@ def show_statistics(data_manager):
             if stats['class_distribution']:
                 class_df = pd.DataFrame(list(stats['class_distribution'].items()), columns=['班级', '人数'])
                 st.dataframe(class_df, use_container_width=True)
+    
+    show_judge_analytics(data_manager)
+
+def show_judge_analytics(data_manager):
+    """评委分析：各评委打分的平均水平、离散程度、偏离共识程度、被去掉最高/最低分的比例和评委间相关性"""
+    analytics, current = data_manager.background.latest('judges')
+    if not analytics['contestants']:
+        return
+    
+    st.markdown("---")
+    st.subheader("🧑‍⚖️ 评委分析")
+    st.caption(f"基于 {analytics['contestants']} 名已集齐分数的选手；共识分为每位选手全部评委分数的中位数")
+    show_stale_notice(current)
+    
+    for judge in analytics['judges']:
+        if judge['flagged']:
+            correlation = "无法计算" if judge['correlation'] is None else f"{judge['correlation']:.2f}"
+            st.warning(f"评委{judge['judge'] + 1} 打分可能异常：平均偏离共识 {judge['bias']:+.2f} 分，"
+                       f"与其他评委的平均相关系数 {correlation}")
+    
+    import pandas as pd
+    trimmed = "去掉" if data_manager.get_scoring_rule()['method'] == 'trimmed' else "作为"
+    df = pd.DataFrame([
+        {
+            '评委': f"评委{judge['judge'] + 1}",
+            '平均分': round(judge['mean'], 2),
+            '标准差': round(judge['std'], 2),
+            '平均偏差': round(judge['bias'], 2),
+            '平均绝对偏差': round(judge['abs_deviation'], 2),
+            f'{trimmed}最高分比例': f"{judge['trimmed_high'] * 100:.1f}%",
+            f'{trimmed}最低分比例': f"{judge['trimmed_low'] * 100:.1f}%",
+            '与其他评委相关系数': None if judge['correlation'] is None else round(judge['correlation'], 3),
+            '异常': "⚠️" if judge['flagged'] else ""
+        }
+        for judge in analytics['judges']
+    ])
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    
+    with st.expander("评委间相关系数"):
+        names = [f"评委{judge['judge'] + 1}" for judge in analytics['judges']]
+        st.dataframe(pd.DataFrame(analytics['correlation'], index=names, columns=names).round(3),
+                     use_container_width=True)
+
+def show_aggregate_rankings(event_store, event):
+    """跨轮次综合排名界面"""
+    st.title("🏅 综合排名")
+    
+    # 返回按钮
+    if st.button("← 返回主菜单", key="back_aggregate"):
+        st.session_state.current_page = 'main'
+        st.rerun()
+    
+    st.markdown("---")
+    
+    rounds = event_store.list_rounds(event)
+    st.subheader(f"赛事：{event}")
+    
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        method = st.selectbox("计算方式", options=list(AGGREGATE_METHODS), format_func=AGGREGATE_METHODS.get,
+                              key="aggregate_method")
+        rank_method = st.selectbox("同分名次", options=list(RANK_METHODS), format_func=RANK_METHODS.get,
+                                   key="aggregate_rank_method")
+    with col2:
+        selected_rounds = st.multiselect("参与综合排名的轮次", options=rounds, default=rounds,
+                                         key="aggregate_rounds")
+    
+    # 各轮权重随该轮设置保存
+    weights = {}
+    weight_cols = st.columns(max(len(selected_rounds), 1))
+    for col, round_name in zip(weight_cols, selected_rounds):
+        with col:
+            saved = event_store.get_round_weight(event, round_name)
+            weight = st.number_input(f"{round_name} 权重", min_value=0.0, value=saved, step=0.1,
+                                     key=f"weight_{event}_{round_name}")
+            if weight != saved:
+                event_store.set_round_weight(event, round_name, weight)
+            weights[round_name] = weight
+    
+    if not selected_rounds:
+        st.warning("请至少选择一个轮次！")
+        return
+    
+    rankings = event_store.aggregate_rankings(event, selected_rounds, method, weights, rank_method)
+    if not rankings:
+        st.warning("所选轮次暂无评分数据！")
+        return
+    
+    columns = ['排名', '选手ID', '姓名', '班级', '学校'] + selected_rounds + ['综合得分']
+    
+    def rows():
+        for item in rankings:
+            yield ([item['rank'], item['id'], item['name'], item['class_name'], item['school']]
+                   + [round(item['round_scores'][r], 2) if r in item['round_scores'] else None
+                      for r in selected_rounds]
+                   + [round(item['total_score'], 2)])
+    
+    import pandas as pd
+    df = pd.DataFrame(list(rows()), columns=columns)
+    st.dataframe(df, use_container_width=True, hide_index=True)
+    
+    show_download_button("📥 下载综合排名", f"{event}_综合排名",
+                         lambda fmt: export_rows(columns, rows(), fmt, '综合排名'), "download_aggregate")
+
+def show_performance(data_manager):
+    """性能监控界面（管理员）：各操作的调用次数、p50/p95耗时，可导出JSON或Prometheus格式"""
+    st.title("⚙️ 性能监控")
+    
+    # 返回按钮
+    if st.button("← 返回主菜单", key="back_performance"):
+        st.session_state.current_page = 'main'
+        st.rerun()
+    
+    st.markdown("---")
+    
+    admin_token = os.environ.get('SCORE_ADMIN_TOKEN')
+    if not admin_token:
+        st.warning("未配置管理员口令（环境变量 SCORE_ADMIN_TOKEN），性能监控不可用")
+        return
+    if not st.session_state.get('is_admin'):
+        token = st.text_input("管理员口令", type="password", key="admin_token")
+        if token and hmac.compare_digest(token, admin_token):
+            st.session_state.is_admin = True
+            st.rerun()
+        elif token:
+            st.error("口令错误")
+        return
+    
+    snapshot = metrics.snapshot()
+    cache = data_manager.get_cache_stats()
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("缓存命中", cache['hits'])
+    with col2:
+        st.metric("缓存未命中", cache['misses'])
+    with col3:
+        st.metric("命中率", f"{cache['hit_rate'] * 100:.1f}%")
+    
+    st.subheader("⏱️ 操作耗时（最近1000次）")
+    import pandas as pd
+    if snapshot['timers']:
+        df = pd.DataFrame([
+            {
+                '操作': item['name'],
+                '调用次数': item['calls'],
+                '失败次数': item['errors'],
+                'p50 (ms)': round(item['p50_ms'], 2),
+                'p95 (ms)': round(item['p95_ms'], 2),
+                '最大 (ms)': round(item['max_ms'], 2),
+                '累计 (s)': round(item['total_seconds'], 3)
+            }
+            for item in snapshot['timers']
+        ]).sort_values('累计 (s)', ascending=False)
+        st.dataframe(df, use_container_width=True, hide_index=True)
+    else:
+        st.info("暂无数据")
+    
+    if snapshot['counters']:
+        st.subheader("🔢 计数器")
+        st.dataframe(pd.DataFrame(list(snapshot['counters'].items()), columns=['名称', '次数']),
+                     use_container_width=True, hide_index=True)
+    
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("📥 导出JSON", data=metrics.to_json, file_name=f"metrics_{timestamp}.json",
+                           mime="application/json", key="download_metrics_json")
+    with col2:
+        st.download_button("📥 导出Prometheus", data=metrics.to_prometheus, file_name=f"metrics_{timestamp}.prom",
+                           mime="text/plain", key="download_metrics_prom")
+    with col3:
+        if st.button("🗑️ 清空统计", key="reset_metrics"):
+            metrics.reset()
+            st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,151 @@
+import functools
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+# 每个指标保留最近多少次耗时用于计算分位数
+WINDOW_SIZE = 1000
+
+
+class Metrics:
+    """进程内性能指标：各操作最近的耗时（滚动窗口）、累计调用次数与失败次数，以及计数器"""
+
+    def __init__(self, window_size: int = WINDOW_SIZE):
+        self.window_size = window_size
+        self._lock = threading.Lock()
+        self._durations: Dict[str, deque] = {}
+        self._calls: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._total_seconds: Dict[str, float] = {}
+        self._counters: Dict[str, int] = {}
+
+    def observe(self, name: str, seconds: float, error: bool = False):
+        """记录一次耗时"""
+        with self._lock:
+            window = self._durations.get(name)
+            if window is None:
+                window = self._durations[name] = deque(maxlen=self.window_size)
+            window.append(seconds)
+            self._calls[name] = self._calls.get(name, 0) + 1
+            self._total_seconds[name] = self._total_seconds.get(name, 0.0) + seconds
+            if error:
+                self._errors[name] = self._errors.get(name, 0) + 1
+
+    def increment(self, name: str, value: int = 1):
+        """计数器加 value"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, name: str):
+        """计时代码块，抛出异常时同时记为失败（页面跳转等控制流异常不计）"""
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start, error)
+
+    def timed(self, name: Optional[str] = None) -> Callable:
+        """计时装饰器，默认以函数的限定名作为指标名"""
+        def decorator(func):
+            metric = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(metric):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        """清空全部指标"""
+        with self._lock:
+            self._durations.clear()
+            self._calls.clear()
+            self._errors.clear()
+            self._total_seconds.clear()
+            self._counters.clear()
+
+    @staticmethod
+    def _percentile(ordered: List[float], fraction: float) -> float:
+        """最近秩法取分位数"""
+        if not ordered:
+            return 0.0
+        return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+    def snapshot(self) -> Dict:
+        """当前指标：{'timers': [{name, calls, errors, p50_ms, p95_ms, max_ms, mean_ms, total_seconds}], 'counters': {...}}
+
+        分位数和最大值基于最近 window_size 次调用，调用次数和总耗时为累计值。
+        """
+        with self._lock:
+            windows = {name: sorted(window) for name, window in self._durations.items()}
+            calls = dict(self._calls)
+            errors = dict(self._errors)
+            totals = dict(self._total_seconds)
+            counters = dict(self._counters)
+
+        timers = []
+        for name in sorted(windows):
+            ordered = windows[name]
+            timers.append({
+                'name': name,
+                'calls': calls[name],
+                'errors': errors.get(name, 0),
+                'p50_ms': self._percentile(ordered, 0.5) * 1000,
+                'p95_ms': self._percentile(ordered, 0.95) * 1000,
+                'max_ms': ordered[-1] * 1000,
+                'mean_ms': sum(ordered) / len(ordered) * 1000,
+                'total_seconds': totals[name]
+            })
+        return {'timers': timers, 'counters': dict(sorted(counters.items()))}
+
+    def to_json(self) -> str:
+        """导出为JSON文本"""
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix: str = 'score') -> str:
+        """导出为 Prometheus 文本格式：耗时为 summary，计数器为 counter"""
+        snapshot = self.snapshot()
+
+        def label(value: str) -> str:
+            return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        lines = [
+            f"# HELP {prefix}_latency_seconds Operation latency over the recent window.",
+            f"# TYPE {prefix}_latency_seconds summary",
+        ]
+        for item in snapshot['timers']:
+            name = label(item['name'])
+            for quantile, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms')):
+                lines.append(f'{prefix}_latency_seconds{{name="{name}",quantile="{quantile}"}} {item[key] / 1000:.6f}')
+            lines.append(f'{prefix}_latency_seconds_sum{{name="{name}"}} {item["total_seconds"]:.6f}')
+            lines.append(f'{prefix}_latency_seconds_count{{name="{name}"}} {item["calls"]}')
+        lines += [
+            f"# HELP {prefix}_errors_total Operations that raised an exception.",
+            f"# TYPE {prefix}_errors_total counter",
+        ]
+        for item in snapshot['timers']:
+            lines.append(f'{prefix}_errors_total{{name="{label(item["name"])}"}} {item["errors"]}')
+        lines += [
+            f"# HELP {prefix}_events_total Event counters.",
+            f"# TYPE {prefix}_events_total counter",
+        ]
+        for name, value in snapshot['counters'].items():
+            lines.append(f'{prefix}_events_total{{name="{label(name)}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# 全进程共享的指标实例
+metrics = Metrics()
+timer = metrics.timer
+timed = metrics.timed
+increment = metrics.increment
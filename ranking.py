@@ -0,0 +1,318 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 名次方式
+RANK_METHODS = {
+    'competition': '并列同名次，其后名次跳过（如1、2、2、4）',
+    'dense': '并列同名次，其后名次连续（如1、2、2、3）',
+    'ordinal': '不并列，依次排名（如1、2、3、4）',
+}
+
+# 决胜规则：最终得分相同时依次比较，全部相同才并列
+TIE_BREAKERS = {
+    'mean': '平均分（不去掉最高/最低分）高者优先',
+    'max': '最高分高者优先',
+    'min': '最低分高者优先',
+    'id': '选手ID小者优先',
+}
+
+# 默认排名规则：同分并列，其后名次跳过
+DEFAULT_RANKING = {'method': 'competition', 'tie_break': []}
+
+# 比较是否同分时保留的小数位数，避免浮点累加误差把同分判为不同
+TIE_DECIMALS = 8
+
+
+def normalize_ranking(rule: Optional[Dict] = None) -> Dict:
+    """校验排名规则并补全默认值，规则无效时抛出 ValueError
+
+    规则示例：
+        {'method': 'competition'}                              同分并列（1224）
+        {'method': 'dense', 'tie_break': ['mean', 'max']}      同分先比平均分，再比最高分，仍相同则并列（1223）
+        {'method': 'competition', 'tie_break': ['mean', 'id']} 最后按选手ID决胜，不会并列
+    无论是否并列，同名次的选手都按选手ID升序排列。
+    """
+    rule = dict(rule or DEFAULT_RANKING)
+    method = rule.get('method', DEFAULT_RANKING['method'])
+    if method not in RANK_METHODS:
+        raise ValueError(f"未知的名次方式: {method}")
+    tie_break = list(rule.get('tie_break') or [])
+    for key in tie_break:
+        if key not in TIE_BREAKERS:
+            raise ValueError(f"未知的决胜规则: {key}")
+    if len(set(tie_break)) != len(tie_break):
+        raise ValueError("决胜规则不能重复")
+    return {'method': method, 'tie_break': tie_break}
+
+
+def describe_ranking(rule: Optional[Dict] = None) -> str:
+    """排名规则的中文说明"""
+    rule = normalize_ranking(rule)
+    text = "按最终得分从高到低排名"
+    if rule['tie_break']:
+        text += "，同分依次比较：" + "、".join(TIE_BREAKERS[key] for key in rule['tie_break'])
+    return f"{text}；{RANK_METHODS[rule['method']]}"
+
+
+def sort_keys(ids: np.ndarray, values: Dict[str, np.ndarray], tie_break: Sequence[str]) -> List[np.ndarray]:
+    """排序键：[-最终得分, 各决胜规则的键]，均为越小越靠前
+
+    values 提供 'final' 及决胜规则用到的 'mean' / 'max' / 'min' 数组。
+    """
+    keys = [np.round(-np.asarray(values['final'], dtype=np.float64), TIE_DECIMALS)]
+    for key in tie_break:
+        if key == 'id':
+            keys.append(np.asarray(ids, dtype=np.float64))
+        else:
+            keys.append(np.round(-np.asarray(values[key], dtype=np.float64), TIE_DECIMALS))
+    return keys
+
+
+def assign_ranks(keys: Sequence[np.ndarray], method: str) -> np.ndarray:
+    """按已排好序的排序键一次计算全部名次：相邻两行的键全部相同即为并列"""
+    size = len(keys[0]) if keys else 0
+    positions = np.arange(1, size + 1)
+    if method == 'ordinal' or not size:
+        return positions
+    new = np.zeros(size, dtype=bool)
+    new[0] = True
+    for column in keys:
+        new[1:] |= column[1:] != column[:-1]
+    if method == 'dense':
+        return np.cumsum(new)
+    # 并列的选手取第一位的名次
+    return np.maximum.accumulate(np.where(new, positions, 0))
+
+
+class RankingIndex:
+    """排名索引：按排序键（-最终得分、决胜规则）和选手ID有序保存在数组中，单个选手得分变化时二分定位，
+    只移动该选手新旧位置之间的元素
+
+    名次按需计算并缓存：修改只使修改位置之后的名次失效，读取前N名时只补算到第N位。
+    """
+
+    def __init__(self, entries: Iterable[Tuple[int, float]] = (), method: str = DEFAULT_RANKING['method']):
+        scores = dict(entries)
+        ids = np.fromiter(scores.keys(), dtype=np.int64, count=len(scores))
+        finals = np.fromiter(scores.values(), dtype=np.float64, count=len(scores))
+        self.method = method
+        self._build(ids, finals, sort_keys(ids, {'final': finals}, []))
+
+    @classmethod
+    def from_arrays(cls, ids: np.ndarray, finals: np.ndarray, keys: Optional[List[np.ndarray]] = None,
+                    method: str = DEFAULT_RANKING['method']) -> 'RankingIndex':
+        """由选手ID数组、最终得分数组和排序键（见 sort_keys，默认只按最终得分）建立索引，ID重复时取后出现的"""
+        ids = np.asarray(ids, dtype=np.int64)
+        finals = np.asarray(finals, dtype=np.float64)
+        if keys is None:
+            keys = sort_keys(ids, {'final': finals}, [])
+        # 倒序后取首次出现即为原顺序中最后一次出现
+        unique, first = np.unique(ids[::-1], return_index=True)
+        index = cls.__new__(cls)
+        index.method = method
+        index._build(unique, finals[::-1][first], [np.asarray(key)[::-1][first] for key in keys])
+        return index
+
+    def _build(self, ids: np.ndarray, finals: np.ndarray, keys: List[np.ndarray]):
+        # 名次顺序：排序键依次比较，全部相同时按ID升序；整体建立时一次向量化排序并计算全部名次
+        order = np.lexsort((ids, *reversed(keys)))
+        self._keys = [np.asarray(key, dtype=np.float64)[order] for key in keys]
+        self._ids = ids[order]
+        self._finals = finals[order]
+        self._ranks = assign_ranks(self._keys, self.method)
+        # 按ID升序的排序键，用于二分查找单个选手当前的位置
+        by_id = np.argsort(ids, kind='stable')
+        self._by_id = ids[by_id]
+        self._by_id_keys = [np.asarray(key, dtype=np.float64)[by_id] for key in keys]
+        # 数组可预留空位，前 _size 个有效；前 _ranked 位的名次已算出
+        self._size = len(ids)
+        self._ranked = self._size
+        # arrays() 返回的是内部数组的视图，之后修改前先复制
+        self._shared = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _find(self, contestant_id: int) -> Tuple[int, bool]:
+        """选手在按ID有序数组中的位置，以及是否存在"""
+        i = int(np.searchsorted(self._by_id[:self._size], contestant_id))
+        return i, i < self._size and self._by_id[i] == contestant_id
+
+    def __contains__(self, contestant_id) -> bool:
+        return self._find(int(contestant_id))[1]
+
+    def __iter__(self) -> Iterator[Tuple[int, float]]:
+        """按名次依次返回 (选手ID, 最终得分)"""
+        return zip(self._ids[:self._size].tolist(), self._finals[:self._size].tolist())
+
+    def _extend_ranks(self, stop: int):
+        """补算前 stop 位的名次：从上一次算到的位置接着向量化计算"""
+        start = self._ranked
+        stop = min(stop, self._size)
+        if stop <= start:
+            return
+        if self.method == 'ordinal':
+            self._ranks[start:stop] = np.arange(start + 1, stop + 1)
+        else:
+            # 连同前一位一起比较，判断第一位是否与其并列
+            base = max(start - 1, 0)
+            new = np.zeros(stop - base, dtype=bool)
+            new[0] = not start
+            for column in self._keys:
+                new[1:] |= column[base + 1:stop] != column[base:stop - 1]
+            previous = self._ranks[start - 1] if start else 0
+            if self.method == 'dense':
+                ranks = previous + np.cumsum(new)
+            else:
+                ranks = np.where(new, np.arange(base + 1, stop + 1), 0)
+                ranks[0] = max(ranks[0], previous)
+                ranks = np.maximum.accumulate(ranks)
+            self._ranks[start:stop] = ranks[start - base:]
+        self._ranked = stop
+
+    def ranks(self) -> np.ndarray:
+        """按名次顺序的名次数组"""
+        return self.arrays()[2]
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """按名次顺序的 (选手ID数组, 最终得分数组, 名次数组)，为只读视图"""
+        self._extend_ranks(self._size)
+        self._shared = True
+        return self._ids[:self._size], self._finals[:self._size], self._ranks[:self._size]
+
+    def _columns(self) -> List[np.ndarray]:
+        """按名次顺序存放、随选手一起移动的数组"""
+        return [self._ids, self._finals, *self._keys]
+
+    def _reserve(self, count: int):
+        """修改前取得独占的数组（已通过 arrays() 交出时复制），并保证还能再放 count 位选手"""
+        size = self._size + count
+        if not self._shared and size <= len(self._ids):
+            return
+        capacity = max(size, len(self._ids)) if size <= len(self._ids) else size + size // 8 + 16
+
+        def resized(array: np.ndarray) -> np.ndarray:
+            copy = np.empty(capacity, dtype=array.dtype)
+            copy[:self._size] = array[:self._size]
+            return copy
+
+        self._ids, self._finals, self._ranks = resized(self._ids), resized(self._finals), resized(self._ranks)
+        self._keys = [resized(column) for column in self._keys]
+        self._by_id = resized(self._by_id)
+        self._by_id_keys = [resized(column) for column in self._by_id_keys]
+        self._shared = False
+
+    def _key(self, i: int) -> List[float]:
+        return [float(column[i]) for column in self._by_id_keys]
+
+    def _span(self, key: Sequence[float]) -> Tuple[int, int]:
+        """排序键与 key 相同的选手在名次顺序中的范围：按排序键逐列二分缩小范围"""
+        low, high = 0, self._size
+        for column, value in zip(self._keys, key):
+            part = column[low:high]
+            start = int(np.searchsorted(part, value, side='left'))
+            stop = int(np.searchsorted(part, value, side='right'))
+            low, high = low + start, low + stop
+        return low, high
+
+    def _position(self, contestant_id: int, key: Sequence[float]) -> int:
+        """排序键为 key 的选手在名次顺序中的位置（不存在时为应插入的位置）"""
+        low, high = self._span(key)
+        return low + int(np.searchsorted(self._ids[low:high], contestant_id))
+
+    def _move(self, old: int, new: int, values: Sequence):
+        """把名次顺序中 old 位置的选手移到 new 位置（old 为 _size 时表示新增，new 为 _size 时表示移除）"""
+        for column, value in zip(self._columns(), values):
+            if new < old:
+                column[new + 1:old + 1] = column[new:old]
+            elif new > old:
+                column[old:new] = column[old + 1:new + 1]
+            if value is not None:
+                column[new] = value
+        self._ranked = min(self._ranked, old, new)
+
+    def update(self, contestant_id, final_score: float, key: Optional[Sequence[float]] = None):
+        """新增或更新选手得分，二分定位后移动到新位置
+
+        key 为该选手的排序键（各列与建立索引时的排序键对应），默认只按最终得分。
+        """
+        contestant_id = int(contestant_id)
+        if key is None:
+            key = [float(k[0]) for k in sort_keys([contestant_id], {'final': [final_score]}, [])]
+        key = [float(value) for value in key]
+        values = [contestant_id, final_score, *key]
+        i, found = self._find(contestant_id)
+        if found:
+            old_key = self._key(i)
+            old = self._position(contestant_id, old_key)
+            if old_key == key:
+                if self._finals[old] != final_score:
+                    self._reserve(0)
+                    self._finals[old] = final_score
+                return
+            self._reserve(0)
+            new = self._position(contestant_id, key)
+            # 新位置在原位置之后时，原位置移走后前移一位
+            self._move(old, new - 1 if new > old else new, values)
+        else:
+            self._reserve(1)
+            position = self._position(contestant_id, key)
+            self._by_id[i + 1:self._size + 1] = self._by_id[i:self._size]
+            self._by_id[i] = contestant_id
+            for column in self._by_id_keys:
+                column[i + 1:self._size + 1] = column[i:self._size]
+            self._size += 1
+            self._move(self._size - 1, position, values)
+        for column, value in zip(self._by_id_keys, key):
+            column[i] = value
+
+    def remove(self, contestant_id):
+        """移除选手"""
+        contestant_id = int(contestant_id)
+        i, found = self._find(contestant_id)
+        if not found:
+            return
+        self._reserve(0)
+        position = self._position(contestant_id, self._key(i))
+        self._move(position, self._size - 1, [None] * len(self._columns()))
+        self._by_id[i:self._size - 1] = self._by_id[i + 1:self._size]
+        for column in self._by_id_keys:
+            column[i:self._size - 1] = column[i + 1:self._size]
+        self._size -= 1
+
+    def get_score(self, contestant_id) -> Optional[float]:
+        """获取选手最终得分"""
+        contestant_id = int(contestant_id)
+        i, found = self._find(contestant_id)
+        if not found:
+            return None
+        return float(self._finals[self._position(contestant_id, self._key(i))])
+
+    def rank(self, contestant_id) -> Optional[int]:
+        """获取选手名次（从1开始，并列时相同），未评分返回None"""
+        contestant_id = int(contestant_id)
+        i, found = self._find(contestant_id)
+        if not found:
+            return None
+        key = self._key(i)
+        if self.method == 'competition':
+            # 排序键严格更靠前的人数加1
+            return self._span(key)[0] + 1
+        position = self._position(contestant_id, key)
+        if self.method == 'ordinal':
+            return position + 1
+        self._extend_ranks(position + 1)
+        return int(self._ranks[position])
+
+    def top_k(self, k: int) -> List[Tuple[int, float, int]]:
+        """获取前k位的 (选手ID, 最终得分, 名次)"""
+        return self.slice(0, k)
+
+    def slice(self, start: int, stop: int) -> List[Tuple[int, float, int]]:
+        """获取名次顺序中第 start+1 位到第 stop 位的 (选手ID, 最终得分, 名次)"""
+        stop = min(stop, self._size)
+        start = min(start, stop)
+        self._extend_ranks(stop)
+        return list(zip(self._ids[start:stop].tolist(), self._finals[start:stop].tolist(),
+                        self._ranks[start:stop].tolist()))
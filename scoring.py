@@ -0,0 +1,203 @@
+import json
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+# 默认评分规则：去掉一个最高分和一个最低分后取平均
+DEFAULT_RULE = {'method': 'trimmed', 'trim': 1}
+
+# 支持的计分方法
+RULE_METHODS = {
+    'trimmed': '去掉最高分和最低分后的平均分',
+    'median': '中位数',
+    'weighted': '加权平均分',
+}
+
+# 默认规则所需的最少评委人数（去掉一个最高分和一个最低分后至少剩一个）
+MIN_JUDGES = 3
+
+# 默认评委人数
+DEFAULT_JUDGE_COUNT = 10
+
+
+def normalize_rule(rule: Optional[Dict] = None) -> Dict:
+    """校验评分规则并补全默认值，规则无效时抛出 ValueError
+
+    规则示例：
+        {'method': 'trimmed', 'trim': 2}             去掉2个最高分和2个最低分
+        {'method': 'median'}                         取中位数
+        {'method': 'weighted', 'weights': [2, 1, 1]} 按评委权重加权平均，未列出的评委权重为1
+    min_judges 为计分所需的最少评委人数，不足时最终得分为0。
+    """
+    rule = dict(rule or DEFAULT_RULE)
+    method = rule.get('method')
+    if method not in RULE_METHODS:
+        raise ValueError(f"未知的计分方法: {method}")
+
+    normalized = {'method': method}
+    if method == 'trimmed':
+        trim = rule.get('trim', 1)
+        if not isinstance(trim, int) or isinstance(trim, bool) or trim < 0:
+            raise ValueError("去掉的最高分/最低分个数必须为非负整数")
+        normalized['trim'] = trim
+        default_min = 2 * trim + 1
+    elif method == 'weighted':
+        weights = [float(w) for w in rule.get('weights', [])]
+        if any(w < 0 for w in weights) or (weights and not any(weights)):
+            raise ValueError("评委权重不能为负数且不能全为0")
+        normalized['weights'] = weights
+        default_min = 1
+    else:
+        default_min = 1
+
+    min_judges = rule.get('min_judges', default_min)
+    if not isinstance(min_judges, int) or isinstance(min_judges, bool) or min_judges < default_min:
+        raise ValueError(f"最少评委人数必须为不小于{default_min}的整数")
+    normalized['min_judges'] = min_judges
+    return normalized
+
+
+def describe_rule(rule: Optional[Dict] = None) -> str:
+    """评分规则的中文说明"""
+    rule = normalize_rule(rule)
+    if rule['method'] == 'trimmed':
+        if rule['trim'] == 0:
+            return "所有评委分数的平均分"
+        if rule['trim'] == 1:
+            return "去掉最高分和最低分后的平均分"
+        return f"去掉{rule['trim']}个最高分和{rule['trim']}个最低分后的平均分"
+    if rule['method'] == 'weighted':
+        weights = '、'.join(f"{w:g}" for w in rule['weights']) or '均为1'
+        return f"按评委权重（{weights}）加权平均分"
+    return "所有评委分数的中位数"
+
+
+def compile_rule(rule: Optional[Dict] = None) -> Callable[[np.ndarray], np.ndarray]:
+    """把评分规则编译为对整个分数矩阵计算最终得分的函数（同一规则只编译一次）"""
+    return _compile(json.dumps(normalize_rule(rule), sort_keys=True))
+
+
+@lru_cache(maxsize=32)
+def _compile(key: str) -> Callable[[np.ndarray], np.ndarray]:
+    rule = json.loads(key)
+    min_judges = rule['min_judges']
+
+    if rule['method'] == 'trimmed':
+        trim = rule['trim']
+
+        def evaluate(matrix: np.ndarray) -> np.ndarray:
+            # 行内排序（NaN排在末尾），去掉首尾各trim个后按从小到大逐列累加，
+            # 与对排序后的列表切片求和的结果逐位一致
+            rows, width = matrix.shape
+            count = (~np.isnan(matrix)).sum(axis=1)
+            ordered = np.sort(matrix, axis=1)
+            total = np.zeros(rows)
+            for column in range(trim, max(width - trim, trim)):
+                total += np.where(column < count - trim, ordered[:, column], 0.0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where(count >= min_judges, total / (count - 2 * trim), 0.0)
+
+    elif rule['method'] == 'median':
+
+        def evaluate(matrix: np.ndarray) -> np.ndarray:
+            count = (~np.isnan(matrix)).sum(axis=1)
+            if not matrix.shape[1]:
+                return np.zeros(matrix.shape[0])
+            with np.errstate(invalid='ignore'):
+                ordered = np.sort(matrix, axis=1)
+                row_index = np.arange(matrix.shape[0])
+                low = ordered[row_index, np.maximum((count - 1) // 2, 0)]
+                high = ordered[row_index, np.maximum(count // 2, 0)]
+                return np.where(count >= min_judges, (low + high) / 2, 0.0)
+
+    else:
+        configured = np.array(rule['weights'], dtype=np.float64)
+
+        def evaluate(matrix: np.ndarray) -> np.ndarray:
+            rows, width = matrix.shape
+            # 未配置权重的评委按1计，多出的权重忽略
+            weights = np.ones(width)
+            weights[:min(width, configured.size)] = configured[:width]
+            valid = ~np.isnan(matrix)
+            count = valid.sum(axis=1)
+            weight_sum = (valid * weights).sum(axis=1)
+            total = (np.where(valid, matrix, 0.0) * weights).sum(axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return np.where((count >= min_judges) & (weight_sum > 0), total / weight_sum, 0.0)
+
+    return evaluate
+
+
+def score_matrix(score_lists: Sequence[Sequence[float]], width: Optional[int] = None) -> np.ndarray:
+    """把各选手的评委分数组装成二维矩阵：行为选手，列为评委，缺失的分数为NaN"""
+    if width is None:
+        width = max((len(scores) for scores in score_lists), default=0)
+    lengths = {len(scores) for scores in score_lists}
+    if lengths == {width}:
+        # 所有选手评委人数一致时直接整体转换
+        return np.array(score_lists, dtype=np.float64).reshape(len(score_lists), width)
+
+    matrix = np.full((len(score_lists), width), np.nan)
+    for row, scores in enumerate(score_lists):
+        matrix[row, :len(scores)] = scores
+    return matrix
+
+
+def summarize(matrix: np.ndarray, ids: Optional[Sequence[int]] = None,
+              rule: Optional[Dict] = None) -> Dict[str, np.ndarray]:
+    """对整个分数矩阵一次性计算每位选手的最终得分、最高分、最低分、平均分和名次
+
+    最终得分按评分规则计算（默认去掉一个最高分和一个最低分后的平均分），
+    与 final_score() 的结果逐位一致。
+    """
+    rows, width = matrix.shape
+    valid = ~np.isnan(matrix)
+    count = valid.sum(axis=1)
+    has_scores = count > 0
+
+    # 原顺序逐列累加求平均分
+    total = np.zeros(rows)
+    for column in range(width):
+        total += np.where(valid[:, column], matrix[:, column], 0.0)
+
+    # 行内排序（NaN排在末尾），首列为最低分，第 count-1 列为最高分
+    ordered = np.sort(matrix, axis=1)
+    row_index = np.arange(rows)
+    lowest = np.where(has_scores, ordered[:, 0] if width else 0.0, 0.0)
+    highest = np.where(has_scores, ordered[row_index, np.maximum(count - 1, 0)] if width else 0.0, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(has_scores, total / count, 0.0)
+    final = compile_rule(rule)(matrix)
+
+    # 名次：最终得分降序，同分按选手ID（未提供时按行号）升序
+    tie_break = np.arange(rows) if ids is None else np.asarray(ids)
+    order = np.lexsort((tie_break, -final))
+    rank = np.empty(rows, dtype=np.int64)
+    rank[order] = np.arange(1, rows + 1)
+
+    return {
+        'final': final,
+        'max': highest,
+        'min': lowest,
+        'mean': mean,
+        'count': count,
+        'rank': rank,
+        'order': order
+    }
+
+
+def final_score(scores: Sequence[Optional[float]], rule: Optional[Dict] = None) -> float:
+    """单个选手的最终得分，默认规则为去掉最高分和最低分后的平均分；None 为空缺的评委分数"""
+    if None in scores:
+        return float(compile_rule(rule)(score_matrix([scores]))[0])
+    if rule is None or normalize_rule(rule) == normalize_rule(DEFAULT_RULE):
+        if len(scores) < MIN_JUDGES:
+            return 0.0
+
+        sorted_scores = sorted(scores)
+        # 去掉最高分和最低分
+        trimmed_scores = sorted_scores[1:-1]
+        return sum(trimmed_scores) / len(trimmed_scores)
+    return float(compile_rule(rule)(score_matrix([scores]))[0])
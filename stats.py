@@ -0,0 +1,160 @@
+from math import floor
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from columnar import ContestantTable
+
+# 人员分布统计的字段：字段名 -> 统计结果中的键
+DISTRIBUTION_FIELDS = {
+    'gender': 'gender_distribution',
+    'province': 'province_distribution',
+    'class_name': 'class_distribution',
+}
+
+
+class StatsAggregator:
+    """统计聚合器：一次批量计算人数、分布、最高/最低/平均分，之后随单个选手或分数的修改增量更新
+
+    只有同时存在选手信息和最终得分的选手计入已评分（DataManager 只给出已集齐全部评委分数的选手）；
+    最终得分大于0的计入得分统计。
+    选手按ID有序保存在数组中：是否存在、最终得分（NaN 表示无分数）和各分布字段的取值编号。
+    """
+
+    def __init__(self, contestants: Iterable[Dict] = (), finals: Iterable[Tuple[int, float]] = ()):
+        finals = dict(finals)
+        self._build(ContestantTable.from_records(contestants),
+                    np.fromiter(finals.keys(), dtype=np.int64, count=len(finals)),
+                    np.fromiter(finals.values(), dtype=np.float64, count=len(finals)))
+
+    @classmethod
+    def from_table(cls, contestants: ContestantTable, final_ids: np.ndarray,
+                   finals: np.ndarray) -> 'StatsAggregator':
+        """由选手列存表和已评分选手的 (ID数组, 最终得分数组) 批量建立"""
+        aggregator = cls.__new__(cls)
+        aggregator._build(contestants, np.asarray(final_ids, dtype=np.int64), np.asarray(finals, dtype=np.float64))
+        return aggregator
+
+    def _build(self, table: ContestantTable, final_ids: np.ndarray, finals: np.ndarray):
+        self._ids = np.union1d(table.ids, final_ids)
+        rows = np.searchsorted(self._ids, table.ids)
+        self._present = np.zeros(len(self._ids), dtype=bool)
+        self._present[rows] = True
+        self._finals = np.full(len(self._ids), np.nan)
+        self._finals[np.searchsorted(self._ids, final_ids)] = finals
+        self._total = int(self._present.sum())
+
+        # 分布字段：取值列表、取值 -> 编号、每位选手的编号（-1 为无选手信息）、各取值人数
+        self._values: Dict[str, list] = {}
+        self._lookups: Dict[str, Dict[str, int]] = {}
+        self._codes: Dict[str, np.ndarray] = {}
+        self._counts: Dict[str, list] = {}
+        for field in DISTRIBUTION_FIELDS:
+            values = list(table.categories[field])
+            codes = np.full(len(self._ids), -1, dtype=np.int32)
+            codes[rows] = table.codes[field]
+            self._values[field] = values
+            self._lookups[field] = {value: code for code, value in enumerate(values)}
+            self._codes[field] = codes
+            self._counts[field] = np.bincount(codes[self._present], minlength=len(values)).tolist()
+
+        # 大于0的最终得分：有序数组取最值，累加和求平均，整数分段计数作分布图
+        scored = self._present & ~np.isnan(self._finals)
+        self._scored = int(scored.sum())
+        positive = self._finals[scored]
+        self._positive = np.sort(positive[positive > 0])
+        self._positive_sum = float(self._positive.sum())
+        buckets, counts = np.unique(np.floor(self._positive).astype(np.int64), return_counts=True)
+        self._histogram: Dict[int, int] = dict(zip(buckets.tolist(), counts.tolist()))
+
+    def _slot(self, contestant_id: int) -> int:
+        """选手在数组中的位置，不存在时插入"""
+        i = int(np.searchsorted(self._ids, contestant_id))
+        if i == len(self._ids) or self._ids[i] != contestant_id:
+            self._ids = np.insert(self._ids, i, contestant_id)
+            self._present = np.insert(self._present, i, False)
+            self._finals = np.insert(self._finals, i, np.nan)
+            for field in DISTRIBUTION_FIELDS:
+                self._codes[field] = np.insert(self._codes[field], i, -1)
+        return i
+
+    def _find(self, contestant_id: int) -> Optional[int]:
+        i = int(np.searchsorted(self._ids, contestant_id))
+        return i if i < len(self._ids) and self._ids[i] == contestant_id else None
+
+    def update_contestant(self, contestant: Dict):
+        """新增或更新选手信息"""
+        contestant_id = int(contestant['id'])
+        self.remove_contestant(contestant_id)
+        i = self._slot(contestant_id)
+        for field in DISTRIBUTION_FIELDS:
+            value = contestant.get(field, '')
+            code = self._lookups[field].get(value)
+            if code is None:
+                code = self._lookups[field][value] = len(self._values[field])
+                self._values[field].append(value)
+                self._counts[field].append(0)
+            self._codes[field][i] = code
+            self._counts[field][code] += 1
+        self._present[i] = True
+        self._total += 1
+        self._count_final(i, 1)
+
+    def remove_contestant(self, contestant_id):
+        """移除选手信息（分数保留，选手重新加入时继续计入）"""
+        i = self._find(int(contestant_id))
+        if i is None or not self._present[i]:
+            return
+        self._count_final(i, -1)
+        for field in DISTRIBUTION_FIELDS:
+            self._counts[field][self._codes[field][i]] -= 1
+            self._codes[field][i] = -1
+        self._present[i] = False
+        self._total -= 1
+
+    def update_score(self, contestant_id, final: Optional[float]):
+        """设置选手最终得分，None表示该选手已无分数"""
+        i = self._slot(int(contestant_id))
+        self._count_final(i, -1)
+        self._finals[i] = np.nan if final is None else final
+        self._count_final(i, 1)
+
+    def _count_final(self, i: int, sign: int):
+        """把第 i 位选手的得分计入（sign=1）或移出（sign=-1）统计"""
+        final = float(self._finals[i])
+        if not self._present[i] or final != final:
+            return
+        self._scored += sign
+        if final <= 0:
+            return
+        bucket = floor(final)
+        position = int(np.searchsorted(self._positive, final))
+        if sign > 0:
+            self._positive = np.insert(self._positive, position, final)
+            self._positive_sum += final
+            self._histogram[bucket] = self._histogram.get(bucket, 0) + 1
+        else:
+            self._positive = np.delete(self._positive, position)
+            self._positive_sum -= final
+            self._histogram[bucket] -= 1
+            if not self._histogram[bucket]:
+                del self._histogram[bucket]
+
+    def snapshot(self) -> Dict:
+        """返回当前统计结果（与数据量无关的开销）"""
+        stats = {
+            'total_contestants': self._total,
+            'scored_contestants': self._scored,
+            'unscored_contestants': self._total - self._scored,
+            'average_score': 0,
+            'highest_score': 0,
+            'lowest_score': 0,
+            'score_histogram': dict(sorted(self._histogram.items())),
+        }
+        if len(self._positive):
+            stats['average_score'] = self._positive_sum / len(self._positive)
+            stats['highest_score'] = float(self._positive[-1])
+            stats['lowest_score'] = float(self._positive[0])
+        for field, key in DISTRIBUTION_FIELDS.items():
+            stats[key] = {value: count for value, count in zip(self._values[field], self._counts[field]) if count}
+        return stats
@@ -0,0 +1,806 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+import journal
+from columnar import CONTESTANT_FIELDS, ContestantTable, ScoreTable
+from metrics import timer
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 选手字段的中文列名
+CONTESTANT_COLUMN_NAMES = {
+    'id': 'ID',
+    'name': '姓名',
+    'gender': '性别',
+    'age': '年龄',
+    'class_name': '班级',
+    'school': '学校',
+    'province': '省份',
+    'city': '城市',
+    'phone': '联系电话'
+}
+
+
+class StorageError(Exception):
+    """数据文件损坏或无法读取"""
+
+
+@contextmanager
+def file_lock(path: str):
+    """跨进程排他锁（锁文件为 path.lock），保护读-改-写过程"""
+    with open(path + '.lock', 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class StorageBackend(ABC):
+    """存储后端接口：DataManager 通过它读写选手和评分数据"""
+
+    def __init__(self):
+        # 后端实例由所有会话共享，缓存与计数器需要加锁
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @abstractmethod
+    def load_contestants(self) -> ContestantTable:
+        """加载全部选手（只读列存表，可按列表使用）"""
+
+    @abstractmethod
+    def save_contestants(self, contestants: List[Dict]) -> bool:
+        """整体替换选手列表"""
+
+    @abstractmethod
+    def load_scores(self) -> ScoreTable:
+        """加载全部评分（只读列存表，可按 {选手ID字符串: [评委分数]} 使用）"""
+
+    @abstractmethod
+    def save_scores(self, scores: Dict) -> bool:
+        """整体替换评分数据"""
+
+    @abstractmethod
+    def upsert_contestant(self, contestant: Dict) -> Optional[Tuple]:
+        """新增或更新单个选手，返回选手表的 (写入前版本, 写入后版本)，失败返回None
+
+        两个版本即 get_version()[0] 在本次写入前后的取值，在写锁内取得，中间没有其他写入。
+        """
+
+    @abstractmethod
+    def insert_contestants(self, contestants: List[Dict]) -> Optional[Tuple]:
+        """批量新增选手，一次写入；返回值同 upsert_contestant"""
+
+    @abstractmethod
+    def allocate_ids(self, count: int = 1) -> int:
+        """分配 count 个连续的新选手ID，返回第一个ID；ID单调递增，删除选手后也不会复用"""
+
+    @abstractmethod
+    def load_contestant_scores(self, contestant_id) -> List[Optional[float]]:
+        """单个选手的评委分数（按评委序号，空缺为None，没有评分为空列表），不加载全部评分"""
+
+    @abstractmethod
+    def upsert_scores(self, contestant_id, scores: List[float]) -> Optional[Tuple]:
+        """新增或更新单个选手的评委分数，返回评分表（get_version()[1]）的 (写入前版本, 写入后版本)，失败返回None"""
+
+    @abstractmethod
+    def upsert_judge_score(self, contestant_id, judge_index: int, score: Optional[float]) -> Optional[Tuple]:
+        """设置单个评委对单个选手的分数（None 为删除），不改写其他评委的分数；返回值同 upsert_scores"""
+
+    @abstractmethod
+    def load_score_history(self, contestant_id=None) -> List[Dict]:
+        """按时间顺序获取评分修改记录：[{'id', 'judge', 'score', 'ts'}]"""
+
+    @abstractmethod
+    def load_settings(self) -> Dict:
+        """加载赛事设置（评分规则、评委人数等）"""
+
+    @abstractmethod
+    def save_settings(self, settings: Dict) -> bool:
+        """整体替换赛事设置"""
+
+    @abstractmethod
+    def load_summary(self, version) -> Optional[Dict]:
+        """读取数据版本 version 的预计算摘要（纯JSON数据），没有或已过期时返回None"""
+
+    @abstractmethod
+    def save_summary(self, version, summary: Dict) -> bool:
+        """保存数据版本 version 的预计算摘要，不改变数据版本"""
+
+    @abstractmethod
+    def get_version(self):
+        """获取数据版本标记：(选手版本, 评分版本, 设置版本)，任一数据变化后返回值随之改变"""
+
+    def get_cache_stats(self) -> Dict:
+        """获取缓存命中统计"""
+        with self._lock:
+            total = self.cache_hits + self.cache_misses
+            return {
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'hit_rate': self.cache_hits / total if total else 0.0
+            }
+
+
+class JsonStorage(StorageBackend):
+    """JSON文件存储：contestants.json + scores.json
+
+    写入先落到临时文件并 fsync，再原子替换原文件；读-改-写过程持有文件锁，
+    多台设备同时保存时不会互相覆盖。
+    """
+
+    # 日志累计多少条事件后压缩进快照
+    COMPACT_EVENTS = 5000
+
+    def __init__(self, contestants_file: str = "contestants.json", scores_file: str = "scores.json",
+                 meta_file: str = "meta.json", settings_file: str = "settings.json",
+                 summary_file: str = "summary.json"):
+        super().__init__()
+        self.contestants_file = contestants_file
+        self.scores_file = scores_file
+        self.meta_file = meta_file
+        self.settings_file = settings_file
+        self.summary_file = summary_file
+        # 评分以 scores.json 为快照，之后的每次修改追加到事件日志
+        self.scores_log_file = scores_file + '.log'
+        self.scores_history_file = scores_file + '.history.log'
+        # 内存快照：文件路径 -> (文件签名, 解析后的数据)
+        self._snapshots = {}
+        # 评分状态：快照签名、日志inode与已读偏移、日志事件数、当前评分数据
+        self._score_state = None
+        self._score_lock = threading.RLock()
+        # 修改记录的按选手索引：文件路径 -> (inode, 已建立索引的偏移, 各事件的选手ID, 各事件的起始偏移)
+        self._history_index = {}
+        self._history_lock = threading.Lock()
+
+    @staticmethod
+    def _file_signature(path: str):
+        """文件签名：修改时间、大小和inode，任一变化即视为文件已更新"""
+        return JsonStorage._stat_signature(os.stat(path))
+
+    @staticmethod
+    def _stat_signature(stat):
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def _read_json(self, path: str, default, convert: Optional[Callable] = None):
+        """读取JSON文件，文件未变化时直接返回内存快照；convert 把解析结果转换为缓存的形式"""
+        try:
+            signature = self._file_signature(path)
+        except OSError:
+            return default
+
+        with self._lock:
+            cached = self._snapshots.get(path)
+            if cached is not None and cached[0] == signature:
+                self.cache_hits += 1
+                return cached[1]
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f, timer('JsonStorage.parse'):
+                data = json.load(f)
+            if convert is not None:
+                data = convert(data)
+        except FileNotFoundError:
+            return default
+        except (OSError, ValueError) as e:
+            # 不能当作空数据返回，否则下一次保存会覆盖原有数据
+            raise StorageError(f"数据文件 {path} 无法读取：{e}")
+
+        with self._lock:
+            self.cache_misses += 1
+            self._snapshots[path] = (signature, data)
+        return data
+
+    def _write_json(self, path: str, data, convert: Optional[Callable] = None) -> bool:
+        """原子写入JSON文件：写临时文件、fsync 后替换原文件，并刷新内存快照"""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+                signature = self._stat_signature(os.fstat(f.fileno()))
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError):
+            with self._lock:
+                self._snapshots.pop(path, None)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+        if convert is not None:
+            data = convert(data)
+        with self._lock:
+            self._snapshots[path] = (signature, data)
+        return True
+
+    def _signature_or_none(self, path: str):
+        try:
+            return self._file_signature(path)
+        except OSError:
+            return None
+
+    def _scores_version(self):
+        return self._signature_or_none(self.scores_file), journal.log_signature(self.scores_log_file)
+
+    def get_version(self):
+        return (
+            self._signature_or_none(self.contestants_file),
+            self._scores_version(),
+            self._signature_or_none(self.settings_file)
+        )
+
+    def load_contestants(self) -> ContestantTable:
+        # 内存中只保留列存表，返回的表只读，不会被调用方修改
+        return self._read_json(self.contestants_file, ContestantTable.from_records([]),
+                               ContestantTable.from_records)
+
+    def _write_contestants(self, contestants: List[Dict]) -> bool:
+        return self._write_json(self.contestants_file, contestants, ContestantTable.from_records)
+
+    def save_contestants(self, contestants: List[Dict]) -> bool:
+        with file_lock(self.contestants_file):
+            return self._write_contestants(list(contestants))
+
+    def _load_score_state(self) -> Dict:
+        """快照加日志尾部重建评分数据；日志只增长时仅读取新增的事件"""
+        with self._score_lock:
+            snapshot_signature = self._signature_or_none(self.scores_file)
+            log = journal.log_signature(self.scores_log_file)
+            state = self._score_state
+
+            if (state is not None and state['snapshot'] == snapshot_signature
+                    and log is not None and state['log_inode'] == log[0] and log[1] >= state['offset']):
+                if log[1] == state['offset']:
+                    with self._lock:
+                        self.cache_hits += 1
+                    return state
+                events, state['offset'] = journal.read_events(self.scores_log_file, state['offset'])
+                state['data'] = state['data'].apply_events(events)
+                state['events'] += len(events)
+            else:
+                events, offset = journal.read_events(self.scores_log_file)
+                data = self._read_json(self.scores_file, ScoreTable.empty(), ScoreTable.from_dict)
+                data = data.apply_events(events)
+                state = {
+                    'snapshot': snapshot_signature,
+                    'log_inode': log[0] if log else None,
+                    'offset': offset,
+                    'events': len(events),
+                    'data': data
+                }
+                self._score_state = state
+
+            with self._lock:
+                self.cache_misses += 1
+            return state
+
+    def load_scores(self) -> ScoreTable:
+        # 评分表只读，日志新增事件时生成新表，已返回的旧表不受影响
+        return self._load_score_state()['data']
+
+    def _write_snapshot(self, scores: ScoreTable) -> bool:
+        """把评分写成新快照，归档并清空事件日志（调用方需持有评分文件锁）
+
+        快照必须已包含日志中的全部事件：若在清空日志前中断，重放这些事件结果不变。
+        """
+        if not self._write_json(self.scores_file, scores.to_dict(), ScoreTable.from_dict):
+            return False
+        journal.archive_events(self.scores_log_file, self.scores_history_file)
+        if os.path.exists(self.scores_log_file):
+            fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(self.scores_log_file) + '.',
+                                             dir=os.path.dirname(os.path.abspath(self.scores_log_file)))
+            os.close(fd)
+            os.replace(temp_path, self.scores_log_file)
+        return True
+
+    def compact_scores(self) -> bool:
+        """把事件日志压缩进快照"""
+        with file_lock(self.scores_file), self._score_lock:
+            return self._write_snapshot(self._load_score_state()['data'])
+
+    def save_scores(self, scores: Dict) -> bool:
+        # 整体替换也先记为事件再压缩：中断后重放日志得到的仍是替换后的数据
+        with file_lock(self.scores_file), self._score_lock:
+            current = self._load_score_state()['data'].to_dict()
+            events = []
+            for key in set(current) | set(scores):
+                events.extend(journal.diff_events(key, current.get(key, []), list(scores.get(key, []))))
+            try:
+                journal.append_events(self.scores_log_file, events)
+            except OSError:
+                return False
+            return self._write_snapshot(self._load_score_state()['data'])
+
+    def load_contestant_scores(self, contestant_id) -> List[Optional[float]]:
+        # 评分状态只读取日志新增的事件
+        return list(self.load_scores().get(str(contestant_id), []))
+
+    def _append_score_events(self, events: List[Dict]) -> Optional[Tuple]:
+        """追加评分事件，日志过长时压缩进快照（调用方需持有评分文件锁），返回评分版本的 (写入前, 写入后)"""
+        before = self._scores_version()
+        if events:
+            try:
+                journal.append_events(self.scores_log_file, events)
+            except OSError:
+                return None
+            state = self._load_score_state()
+            if state['events'] >= self.COMPACT_EVENTS:
+                self._write_snapshot(state['data'])
+        return before, self._scores_version()
+
+    def upsert_scores(self, contestant_id, scores: List[float]) -> Optional[Tuple]:
+        """追加该选手变化的评委分数事件，日志过长时压缩进快照"""
+        with file_lock(self.scores_file), self._score_lock:
+            state = self._load_score_state()
+            events = journal.diff_events(contestant_id, state['data'].get(str(contestant_id), []), list(scores))
+            return self._append_score_events(events)
+
+    def upsert_judge_score(self, contestant_id, judge_index: int, score: Optional[float]) -> Optional[Tuple]:
+        """分数有变化时追加一条事件；多名评委同时提交时各自只追加自己的事件"""
+        with file_lock(self.scores_file), self._score_lock:
+            state = self._load_score_state()
+            current = state['data'].get(str(contestant_id), [])
+            if (current[judge_index] if judge_index < len(current) else None) == score:
+                return self._append_score_events([])
+            return self._append_score_events([journal.score_event(contestant_id, judge_index, score)])
+
+    def load_score_history(self, contestant_id=None) -> List[Dict]:
+        """按选手读取时只解析该选手的事件行：各文件的行偏移索引只在文件增长后补充新增的部分"""
+        if contestant_id is None:
+            events = []
+            for path in (self.scores_history_file, self.scores_log_file):
+                events.extend(journal.read_events(path)[0])
+            return events
+
+        events = []
+        with self._history_lock:
+            for path in (self.scores_history_file, self.scores_log_file):
+                try:
+                    f = open(path, 'rb')
+                except FileNotFoundError:
+                    continue
+                with f:
+                    # 在同一个文件句柄上判断、补充索引和读取，日志被压缩替换时不会错位
+                    stat = os.fstat(f.fileno())
+                    cached = self._history_index.get(path)
+                    if cached is None or cached[0] != stat.st_ino or cached[1] > stat.st_size:
+                        cached = (stat.st_ino, 0, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+                    if stat.st_size > cached[1]:
+                        ids, starts, offset = journal.index_events(f, cached[1])
+                        cached = (stat.st_ino, offset, np.concatenate([cached[2], ids]),
+                                  np.concatenate([cached[3], starts]))
+                    self._history_index[path] = cached
+                    events.extend(journal.read_events_at(f, cached[3][cached[2] == int(contestant_id)].tolist()))
+        return events
+
+    def _rewrite_contestants(self, contestants: List[Dict]) -> Optional[Tuple]:
+        """在文件锁内读取选手列表，原位替换已有ID、追加新ID后写回，返回选手版本的 (写入前, 写入后)
+
+        内存快照直接使用修改后的列存表，沿用其有序索引。
+        """
+        with file_lock(self.contestants_file):
+            before = self._signature_or_none(self.contestants_file)
+            table = self.load_contestants().with_records(contestants)
+            if not self._write_json(self.contestants_file, list(table), lambda _: table):
+                return None
+            return before, self._signature_or_none(self.contestants_file)
+
+    def upsert_contestant(self, contestant: Dict) -> Optional[Tuple]:
+        return self._rewrite_contestants([contestant])
+
+    def insert_contestants(self, contestants: List[Dict]) -> Optional[Tuple]:
+        return self._rewrite_contestants(contestants)
+
+    def load_settings(self) -> Dict:
+        return dict(self._read_json(self.settings_file, {}))
+
+    def save_settings(self, settings: Dict) -> bool:
+        with file_lock(self.settings_file):
+            return self._write_json(self.settings_file, settings)
+
+    def load_summary(self, version) -> Optional[Dict]:
+        try:
+            saved = self._read_json(self.summary_file, {})
+        except StorageError:
+            # 摘要只是缓存，损坏时重新计算即可
+            return None
+        if saved.get('version') != _version_key(version):
+            return None
+        return saved.get('summary')
+
+    def save_summary(self, version, summary: Dict) -> bool:
+        # 摘要文件不计入 get_version，写入不会使其他缓存失效
+        return self._write_json(self.summary_file, {'version': _version_key(version), 'summary': summary})
+
+    def allocate_ids(self, count: int = 1) -> int:
+        with file_lock(self.meta_file):
+            meta = dict(self._read_json(self.meta_file, {}))
+            # 首次分配或计数器落后时，从现有最大ID之后开始
+            ids = self.load_contestants().ids
+            max_id = int(ids.max()) if len(ids) else 0
+            first_id = max(meta.get('next_contestant_id', 1), max_id + 1)
+            meta['next_contestant_id'] = first_id + count
+            if not self._write_json(self.meta_file, meta):
+                raise StorageError(f"数据文件 {self.meta_file} 无法写入")
+        return first_id
+
+
+class SqliteStorage(StorageBackend):
+    """SQLite存储：WAL模式，每个选手、每个评委分数各占一行"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS contestants (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            gender TEXT,
+            age INTEGER,
+            class_name TEXT,
+            school TEXT,
+            province TEXT,
+            city TEXT,
+            phone TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_contestants_name ON contestants(name);
+        CREATE INDEX IF NOT EXISTS idx_contestants_phone ON contestants(phone);
+        CREATE TABLE IF NOT EXISTS scores (
+            contestant_id INTEGER NOT NULL,
+            judge_index INTEGER NOT NULL,
+            score REAL NOT NULL,
+            PRIMARY KEY (contestant_id, judge_index)
+        );
+        CREATE TABLE IF NOT EXISTS score_events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            contestant_id INTEGER NOT NULL,
+            judge_index INTEGER NOT NULL,
+            score REAL,
+            ts TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_score_events_contestant ON score_events(contestant_id);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS summary (
+            key TEXT PRIMARY KEY,
+            version TEXT NOT NULL,
+            value TEXT NOT NULL
+        );
+    """
+
+    # 分批读取评分时每批的行数
+    FETCH_ROWS = 100000
+
+    def __init__(self, db_file: str = "scores.db"):
+        super().__init__()
+        self.db_file = db_file
+        # sqlite3 连接不能跨线程使用，Streamlit 每个会话在独立线程中运行
+        self._local = threading.local()
+        # 表名 -> (数据版本, 数据)
+        self._snapshots = {}
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection, table: str) -> int:
+        """在写事务内递增表版本号并返回新版本号，其他进程据此判断缓存是否失效"""
+        conn.execute(
+            "INSERT INTO meta(key, value) VALUES (?, 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1",
+            (table,)
+        )
+        return conn.execute("SELECT value FROM meta WHERE key = ?", (table,)).fetchone()[0]
+
+    def _read_cached(self, table: str, loader):
+        """版本号未变化时返回内存快照"""
+        conn = self._connect()
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (table,)).fetchone()
+        version = row[0] if row else 0
+
+        with self._lock:
+            cached = self._snapshots.get(table)
+            if cached is not None and cached[0] == version:
+                self.cache_hits += 1
+                return cached[1]
+
+        with timer(f'SqliteStorage.load_{table}'):
+            data = loader(conn)
+        with self._lock:
+            self.cache_misses += 1
+            self._snapshots[table] = (version, data)
+        return data
+
+    def _write(self, table: str, statements, patch: Optional[Callable] = None) -> Optional[Tuple]:
+        """在单个事务中执行写操作并递增版本号，返回该表的 (写入前版本, 写入后版本)，失败返回None
+
+        statements 返回本次写入后的数据（如被修改的行），patch(快照, 该数据) 返回更新后的快照：
+        内存快照恰好是写入前的版本时原地更新，记录为新版本，不必重新加载整张表；
+        其他进程修改过的表仍在下次读取时整体重新加载。
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                written = statements(conn)
+                version = self._bump_version(conn, table)
+        except sqlite3.Error:
+            return None
+
+        if patch is not None:
+            with self._lock:
+                cached = self._snapshots.get(table)
+            if cached is not None and cached[0] == version - 1:
+                data = patch(cached[1], written)
+                with self._lock:
+                    # 期间其他线程已加载了更新的版本时保留较新的快照
+                    current = self._snapshots.get(table)
+                    if current is None or current[0] < version:
+                        self._snapshots[table] = (version, data)
+        return version - 1, version
+
+    def get_version(self):
+        rows = dict(self._connect().execute("SELECT key, value FROM meta"))
+        return (rows.get('contestants', 0), rows.get('scores', 0), rows.get('settings', 0))
+
+    @staticmethod
+    def _contestant_row(contestant: Dict):
+        return tuple(contestant.get(field, '') for field in CONTESTANT_FIELDS)
+
+    def load_contestants(self) -> ContestantTable:
+        def loader(conn):
+            rows = conn.execute(f"SELECT {', '.join(CONTESTANT_FIELDS)} FROM contestants ORDER BY id").fetchall()
+            columns = [list(column) for column in zip(*rows)] or [[] for _ in CONTESTANT_FIELDS]
+            del rows
+            return ContestantTable.from_columns(dict(zip(CONTESTANT_FIELDS, columns)))
+        return self._read_cached('contestants', loader)
+
+    def save_contestants(self, contestants: List[Dict]) -> bool:
+        def statements(conn):
+            conn.execute("DELETE FROM contestants")
+            conn.executemany(
+                f"INSERT INTO contestants VALUES ({', '.join('?' * len(CONTESTANT_FIELDS))})",
+                [self._contestant_row(c) for c in contestants]
+            )
+        return self._write('contestants', statements) is not None
+
+    def load_scores(self) -> ScoreTable:
+        def loader(conn):
+            # 分批读取转为数组，避免一次性生成全部行的元组
+            cursor = conn.execute("SELECT contestant_id, judge_index, score FROM scores")
+            parts = []
+            while True:
+                rows = cursor.fetchmany(self.FETCH_ROWS)
+                if not rows:
+                    break
+                parts.append(np.array(rows, dtype=np.float64))
+            if not parts:
+                return ScoreTable.empty()
+            data = np.concatenate(parts)
+            return ScoreTable.from_rows(data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2])
+        return self._read_cached('scores', loader)
+
+    def save_scores(self, scores: Dict) -> bool:
+        def statements(conn):
+            conn.execute("DELETE FROM scores")
+            conn.executemany(
+                "INSERT INTO scores VALUES (?, ?, ?)",
+                [(int(cid), i, score) for cid, values in scores.items()
+                 for i, score in enumerate(values) if score is not None]
+            )
+        return self._write('scores', statements) is not None
+
+    @staticmethod
+    def _read_contestants(conn: sqlite3.Connection, ids: List[int]) -> List[Dict]:
+        """读回刚写入的选手（取值经过列类型转换，与整表加载得到的相同）"""
+        ids = sorted(set(ids))
+        if not ids:
+            return []
+        rows = conn.execute(f"SELECT {', '.join(CONTESTANT_FIELDS)} FROM contestants "
+                            "WHERE id BETWEEN ? AND ? ORDER BY id", (ids[0], ids[-1]))
+        wanted = set(ids)
+        return [dict(zip(CONTESTANT_FIELDS, row)) for row in rows if row[0] in wanted]
+
+    @staticmethod
+    def _patch_contestants(table: ContestantTable, written: List[Dict]) -> ContestantTable:
+        return table.with_records(written)
+
+    def upsert_contestant(self, contestant: Dict) -> Optional[Tuple]:
+        columns = ', '.join(CONTESTANT_FIELDS)
+        updates = ', '.join(f"{field} = excluded.{field}" for field in CONTESTANT_FIELDS[1:])
+
+        def statements(conn):
+            conn.execute(
+                f"INSERT INTO contestants({columns}) VALUES ({', '.join('?' * len(CONTESTANT_FIELDS))}) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}",
+                self._contestant_row(contestant)
+            )
+            return self._read_contestants(conn, [int(contestant['id'])])
+        return self._write('contestants', statements, self._patch_contestants)
+
+    def insert_contestants(self, contestants: List[Dict]) -> Optional[Tuple]:
+        def statements(conn):
+            conn.executemany(
+                f"INSERT INTO contestants VALUES ({', '.join('?' * len(CONTESTANT_FIELDS))})",
+                [self._contestant_row(c) for c in contestants]
+            )
+            return self._read_contestants(conn, [int(c['id']) for c in contestants])
+        return self._write('contestants', statements, self._patch_contestants)
+
+    def load_settings(self) -> Dict:
+        def loader(conn):
+            return {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM settings")}
+        return dict(self._read_cached('settings', loader))
+
+    def save_settings(self, settings: Dict) -> bool:
+        def statements(conn):
+            conn.execute("DELETE FROM settings")
+            conn.executemany(
+                "INSERT INTO settings VALUES (?, ?)",
+                [(key, json.dumps(value, ensure_ascii=False)) for key, value in settings.items()]
+            )
+        return self._write('settings', statements) is not None
+
+    def load_summary(self, version) -> Optional[Dict]:
+        row = self._connect().execute("SELECT version, value FROM summary WHERE key = 'summary'").fetchone()
+        if row is None or row[0] != _version_key(version):
+            return None
+        return json.loads(row[1])
+
+    def save_summary(self, version, summary: Dict) -> bool:
+        # 不递增 meta 中的版本号，写入不会使其他缓存失效
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO summary(key, version, value) VALUES ('summary', ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET version = excluded.version, value = excluded.value",
+                    (_version_key(version), json.dumps(summary, ensure_ascii=False))
+                )
+            return True
+        except sqlite3.Error:
+            return False
+
+    def allocate_ids(self, count: int = 1) -> int:
+        conn = self._connect()
+        with conn:
+            # 写事务内完成“读取-递增”，并发分配不会得到相同的ID
+            conn.execute(
+                "INSERT INTO meta(key, value) "
+                "VALUES ('next_contestant_id', (SELECT COALESCE(MAX(id), 0) + 1 FROM contestants) + ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = "
+                "MAX(value, (SELECT COALESCE(MAX(id), 0) + 1 FROM contestants)) + ?",
+                (count, count)
+            )
+            next_id = conn.execute("SELECT value FROM meta WHERE key = 'next_contestant_id'").fetchone()[0]
+        return next_id - count
+
+    def upsert_scores(self, contestant_id, scores: List[float]) -> Optional[Tuple]:
+        contestant_id = int(contestant_id)
+
+        def statements(conn):
+            # 记录变化的评委分数，作为修改历史；空缺的评委分数不占行
+            current = self._read_scores(conn, contestant_id)
+            self._insert_events(conn, journal.diff_events(contestant_id, current, list(scores)))
+            conn.execute("DELETE FROM scores WHERE contestant_id = ?", (contestant_id,))
+            conn.executemany(
+                "INSERT INTO scores VALUES (?, ?, ?)",
+                [(contestant_id, i, score) for i, score in enumerate(scores) if score is not None]
+            )
+            return self._read_scores(conn, contestant_id)
+        return self._write('scores', statements, self._patch_scores(contestant_id))
+
+    def upsert_judge_score(self, contestant_id, judge_index: int, score: Optional[float]) -> Optional[Tuple]:
+        contestant_id = int(contestant_id)
+        judge_index = int(judge_index)
+
+        def statements(conn):
+            row = conn.execute("SELECT score FROM scores WHERE contestant_id = ? AND judge_index = ?",
+                               (contestant_id, judge_index)).fetchone()
+            if (row[0] if row else None) == score:
+                return self._read_scores(conn, contestant_id)
+            self._insert_events(conn, [journal.score_event(contestant_id, judge_index, score)])
+            if score is None:
+                conn.execute("DELETE FROM scores WHERE contestant_id = ? AND judge_index = ?",
+                             (contestant_id, judge_index))
+            else:
+                conn.execute(
+                    "INSERT INTO scores VALUES (?, ?, ?) "
+                    "ON CONFLICT(contestant_id, judge_index) DO UPDATE SET score = excluded.score",
+                    (contestant_id, judge_index, score)
+                )
+            return self._read_scores(conn, contestant_id)
+        return self._write('scores', statements, self._patch_scores(contestant_id))
+
+    def load_contestant_scores(self, contestant_id) -> List[Optional[float]]:
+        # 按主键只读取该选手的行
+        return self._read_scores(self._connect(), int(contestant_id))
+
+    @staticmethod
+    def _read_scores(conn: sqlite3.Connection, contestant_id: int) -> List[Optional[float]]:
+        """单个选手的评委分数（按评委序号，空缺为None，没有评分为空列表）"""
+        rows = conn.execute(
+            "SELECT judge_index, score FROM scores WHERE contestant_id = ?", (contestant_id,)).fetchall()
+        scores = [None] * (max((judge for judge, _ in rows), default=-1) + 1)
+        for judge, score in rows:
+            scores[judge] = score
+        return scores
+
+    @staticmethod
+    def _patch_scores(contestant_id: int) -> Callable:
+        return lambda table, scores: table.with_scores({contestant_id: scores})
+
+    @staticmethod
+    def _insert_events(conn: sqlite3.Connection, events: List[Dict]):
+        conn.executemany(
+            "INSERT INTO score_events(contestant_id, judge_index, score, ts) VALUES (?, ?, ?, ?)",
+            [(e['id'], e['judge'], e['score'], e['ts']) for e in events]
+        )
+
+    def load_score_history(self, contestant_id=None) -> List[Dict]:
+        query = "SELECT contestant_id, judge_index, score, ts FROM score_events"
+        params = ()
+        if contestant_id is not None:
+            query += " WHERE contestant_id = ?"
+            params = (int(contestant_id),)
+        rows = self._connect().execute(query + " ORDER BY seq", params)
+        return [{'id': cid, 'judge': judge, 'score': score, 'ts': ts} for cid, judge, score, ts in rows]
+
+
+def _version_key(version) -> str:
+    """数据版本的文本形式，用于跨进程比较（元组经JSON往返后变为列表）"""
+    return json.dumps(version)
+
+
+def create_storage(backend: Optional[str] = None, directory: Optional[str] = None) -> StorageBackend:
+    """根据名称创建存储后端，默认读取环境变量 SCORE_STORAGE（json 或 sqlite）
+
+    指定 directory 时数据文件放在该目录下（赛事轮次分片），否则使用当前目录下的数据文件。
+    """
+    backend = (backend or os.environ.get('SCORE_STORAGE', 'json')).lower()
+    if backend not in ('json', 'sqlite'):
+        raise ValueError(f"未知的存储后端: {backend}")
+    if directory is None:
+        if backend == 'json':
+            return JsonStorage()
+        return SqliteStorage(os.environ.get('SCORE_DB_FILE', 'scores.db'))
+
+    os.makedirs(directory, exist_ok=True)
+    if backend == 'json':
+        return JsonStorage(*(os.path.join(directory, name) for name in
+                             ("contestants.json", "scores.json", "meta.json", "settings.json",
+                              "summary.json")))
+    return SqliteStorage(os.path.join(directory, "scores.db"))
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager  # noqa: E402
+from storage import create_storage  # noqa: E402
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def backend(request):
+    return request.param
+
+
+@pytest.fixture
+def storage(tmp_path, backend):
+    return create_storage(backend, str(tmp_path))
+
+
+@pytest.fixture
+def data_manager(storage):
+    data_manager = DataManager(storage)
+    data_manager.set_judge_count(3)
+    return data_manager
+
+
+def contestant(contestant_id, **fields):
+    record = {'id': contestant_id, 'name': f"选手{contestant_id}", 'gender': '男', 'age': 18,
+              'class_name': '1班', 'school': '一中', 'province': '北京', 'city': '', 'phone': f"1{contestant_id:010d}"}
+    record.update(fields)
+    return record
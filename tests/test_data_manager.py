@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+from conftest import contestant
+from data_manager import DataManager
+from storage import create_storage
+
+
+def fresh(backend, tmp_path):
+    return DataManager(create_storage(backend, str(tmp_path)))
+
+
+def ranking_pairs(data_manager):
+    return [(r['id'], r['rank'], r['final_score']) for r in data_manager.get_rankings()]
+
+
+def assert_statistics_equal(actual, expected):
+    # 增量累加与整体求和的浮点误差
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if isinstance(value, float):
+            assert actual[key] == pytest.approx(value)
+        else:
+            assert actual[key] == value, key
+
+
+def test_incremental_matches_rebuild(data_manager, backend, tmp_path):
+    rng = random.Random(3)
+    data_manager.save_contestants([contestant(i, gender=rng.choice(['男', '女'])) for i in range(1, 31)])
+    # 先读取一次，之后的保存走增量路径
+    data_manager.get_rankings()
+    data_manager.get_statistics()
+    for step in range(120):
+        contestant_id = rng.randint(1, 30)
+        if rng.random() < 0.3:
+            data_manager.submit_judge_score(contestant_id, rng.randrange(3), float(rng.randint(80, 90)))
+        else:
+            data_manager.save_contestant_scores(contestant_id, [float(rng.randint(80, 90)) for _ in range(3)])
+        if step % 20 == 0:
+            data_manager.add_contestant(contestant(100 + step))
+            assert ranking_pairs(data_manager) == ranking_pairs(fresh(backend, tmp_path))
+    rebuilt = fresh(backend, tmp_path)
+    assert ranking_pairs(data_manager) == ranking_pairs(rebuilt)
+    assert [data_manager.get_rank(i) for i in range(1, 32)] == [rebuilt.get_rank(i) for i in range(1, 32)]
+    assert_statistics_equal(data_manager.get_statistics(), rebuilt.get_statistics())
+
+
+def test_incomplete_scores_are_not_ranked(data_manager):
+    data_manager.save_contestants([contestant(1), contestant(2)])
+    data_manager.save_contestant_scores(1, [80.0, 90.0, 70.0])
+    data_manager.submit_judge_score(2, 0, 99.0)
+    assert data_manager.get_rank(2) is None
+    assert [r['id'] for r in data_manager.get_rankings()] == [1]
+    assert data_manager.get_statistics()['scored_contestants'] == 1
+    details = {d['contestant']['id']: d['complete'] for d in data_manager.get_score_details()}
+    assert details == {1: True, 2: False}
+
+
+def test_scores_without_contestant_record(data_manager, backend, tmp_path):
+    data_manager.save_contestants([contestant(1)])
+    data_manager.save_contestant_scores(1, [80.0, 80.0, 80.0])
+    data_manager.get_rankings()
+    data_manager.get_statistics()
+    data_manager.save_contestant_scores(7, [90.0, 90.0, 90.0])
+    assert data_manager.get_rank(7) is None
+    assert ranking_pairs(data_manager) == ranking_pairs(fresh(backend, tmp_path))
+    assert_statistics_equal(data_manager.get_statistics(), fresh(backend, tmp_path).get_statistics())
+    # 补录选手信息后计入排名
+    data_manager.add_contestant(contestant(7))
+    assert [r[:2] for r in ranking_pairs(data_manager)] == [(7, 1), (1, 2)]
+    assert_statistics_equal(data_manager.get_statistics(), fresh(backend, tmp_path).get_statistics())
+
+
+def test_rule_changes_rerank(data_manager, backend, tmp_path):
+    data_manager.save_contestants([contestant(i) for i in (1, 2, 3)])
+    data_manager.save_contestant_scores(1, [70.0, 80.0, 90.0])
+    data_manager.save_contestant_scores(2, [80.0, 80.0, 80.0])
+    data_manager.save_contestant_scores(3, [60.0, 95.0, 99.0])
+    assert [r[:2] for r in ranking_pairs(data_manager)] == [(3, 1), (1, 2), (2, 2)]
+    data_manager.set_ranking_rule({'method': 'dense', 'tie_break': ['max']})
+    assert [r[:2] for r in ranking_pairs(data_manager)] == [(3, 1), (1, 2), (2, 3)]
+    data_manager.set_scoring_rule({'method': 'weighted', 'weights': [3, 1, 1]})
+    assert [r[0] for r in ranking_pairs(data_manager)] == [2, 1, 3]
+    assert ranking_pairs(data_manager) == ranking_pairs(fresh(backend, tmp_path))
@@ -0,0 +1,58 @@
+import csv
+import io
+import zipfile
+
+from conftest import contestant
+from exporter import export_reports, export_rows, safe_filename, zip_files
+
+
+def read_csv(data):
+    return list(csv.reader(io.StringIO(data.decode('utf-8-sig'))))
+
+
+def test_export_rows_formats():
+    rows = [[1, '张三', 85.5], [2, '李四', None]]
+    assert read_csv(export_rows(['ID', '姓名', '得分'], rows, 'csv')) == \
+        [['ID', '姓名', '得分'], ['1', '张三', '85.5'], ['2', '李四', '']]
+    assert export_rows(['ID'], [[1]], 'xlsx')[:2] == b'PK'
+
+
+def test_score_rows_align_with_header(data_manager):
+    data_manager.save_contestants([contestant(i) for i in (1, 2, 3)])
+    data_manager.save_contestant_scores(1, [80.0, 90.0, 70.0])
+    data_manager.submit_judge_score(2, 0, 85.0)
+    # 评委人数之外多出的分数也要有对应的列
+    data_manager.save_contestant_scores(3, [90.0, 90.0, 90.0, 95.0])
+    header, *rows = read_csv(data_manager.export_scores('csv'))
+    assert header[5:] == ['评委1', '评委2', '评委3', '评委4', '最高分', '最低分', '平均分', '最终得分']
+    assert all(len(row) == len(header) for row in rows)
+    by_id = {row[0]: dict(zip(header, row)) for row in rows}
+    assert by_id['1']['评委3'] == '70.0' and by_id['1']['评委4'] == '' and by_id['1']['最终得分'] == '80.0'
+    assert by_id['3']['评委4'] == '95.0' and by_id['3']['最高分'] == '95.0'
+    # 分数未集齐的选手不给出最终得分
+    assert by_id['2']['评委1'] == '85.0' and by_id['2']['最终得分'] == ''
+
+
+def test_report_groups_align_with_header(data_manager):
+    data_manager.save_contestants([contestant(1, school='一中'), contestant(2, school='二中')])
+    data_manager.save_contestant_scores(1, [80.0, 80.0, 80.0])
+    data_manager.save_contestant_scores(2, [70.0, 70.0, 70.0, 75.0])
+    files = data_manager.export_report('school', 'csv', max_workers=1)
+    assert sorted(files) == sorted(f"{school}_{sheet}.csv" for school in ('一中', '二中')
+                                   for sheet in ('选手信息', '评分详情', '选手排名'))
+    for name, data in files.items():
+        header, *rows = read_csv(data)
+        assert rows and all(len(row) == len(header) for row in rows), name
+    assert read_csv(files['一中_评分详情.csv'])[0][5:9] == ['评委1', '评委2', '评委3', '评委4']
+
+
+def test_colliding_filenames_are_kept():
+    assert safe_filename('A/B') == safe_filename('A B') == safe_filename('A_B') == 'A_B'
+    assert safe_filename(' / ') == '未命名'
+    reports = {name: [('表', ['值'], [[name]])] for name in ('A/B', 'A_B', 'A B', 'A_B_2')}
+    for fmt, workers in (('xlsx', 1), ('csv', 1), ('csv', 2)):
+        files = export_reports(reports, fmt, workers)
+        assert len(files) == len(reports)
+    files = export_reports(reports, 'csv', 1)
+    assert [read_csv(data)[1][0] for data in files.values()] == list(reports)
+    assert zipfile.ZipFile(io.BytesIO(zip_files(files))).namelist() == list(files)
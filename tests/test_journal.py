@@ -0,0 +1,82 @@
+import os
+import random
+
+import pytest
+
+import journal
+from storage import JsonStorage, create_storage
+
+
+@pytest.fixture
+def json_storage(tmp_path):
+    storage = create_storage('json', str(tmp_path))
+    storage.COMPACT_EVENTS = 10
+    return storage
+
+
+def test_diff_and_apply_events():
+    scores = {'1': [80.0, 90.0, 70.0]}
+    events = journal.diff_events(1, scores['1'], [80.0, 95.0])
+    assert [(e['judge'], e['score']) for e in events] == [(1, 95.0), (2, None)]
+    old = scores['1']
+    journal.apply_events(scores, events)
+    assert scores == {'1': [80.0, 95.0]}
+    assert old == [80.0, 90.0, 70.0]
+    journal.apply_events(scores, journal.diff_events(1, scores['1'], []))
+    assert scores == {}
+
+
+def test_append_drops_partial_line(tmp_path):
+    log_file = str(tmp_path / 'scores.json.log')
+    journal.append_events(log_file, [journal.score_event(1, 0, 80.0)])
+    with open(log_file, 'ab') as f:
+        f.write(b'{"id": 2, "jud')
+    journal.append_events(log_file, [journal.score_event(3, 0, 70.0)])
+    events, offset = journal.read_events(log_file)
+    assert [e['id'] for e in events] == [1, 3]
+    assert offset == os.path.getsize(log_file)
+
+
+def test_compaction_keeps_scores_and_history(json_storage, tmp_path):
+    rng = random.Random(1)
+    expected = {}
+    for _ in range(40):
+        contestant_id = rng.randint(1, 8)
+        scores = [float(rng.randint(60, 100)) for _ in range(3)]
+        json_storage.upsert_scores(contestant_id, scores)
+        expected[str(contestant_id)] = scores
+
+    # 日志超过阈值后已压缩进快照，旧事件归档到历史文件
+    assert len(journal.read_events(json_storage.scores_log_file)[0]) < json_storage.COMPACT_EVENTS
+    assert os.path.getsize(json_storage.scores_history_file) > 0
+    assert json_storage.load_scores().to_dict() == expected
+    assert create_storage('json', str(tmp_path)).load_scores().to_dict() == expected
+
+    history = json_storage.load_score_history()
+    replayed = {}
+    journal.apply_events(replayed, history)
+    assert replayed == expected
+    for contestant_id in range(1, 10):
+        assert json_storage.load_score_history(contestant_id) == [e for e in history if e['id'] == contestant_id]
+
+
+def test_history_index_follows_compaction(json_storage):
+    json_storage.upsert_scores(1, [80.0, 80.0, 80.0])
+    assert len(json_storage.load_score_history(1)) == 3
+    # 压缩替换日志后，已建立的索引不能错位
+    json_storage.compact_scores()
+    json_storage.upsert_judge_score(1, 0, 90.0)
+    json_storage.upsert_judge_score(2, 0, 70.0)
+    assert [e['score'] for e in json_storage.load_score_history(1)] == [80.0, 80.0, 80.0, 90.0]
+    assert [e['score'] for e in json_storage.load_score_history(2)] == [70.0]
+
+
+def test_replaying_log_after_snapshot_is_idempotent(tmp_path):
+    # 写完快照、清空日志前中断：重放日志结果不变
+    storage = create_storage('json', str(tmp_path))
+    storage.upsert_scores(1, [80.0, 85.0, 90.0])
+    events, _ = journal.read_events(storage.scores_log_file)
+    storage.compact_scores()
+    journal.append_events(storage.scores_log_file, events)
+    assert JsonStorage(storage.contestants_file, storage.scores_file).load_scores().to_dict() == \
+        {'1': [80.0, 85.0, 90.0]}
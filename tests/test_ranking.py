@@ -0,0 +1,90 @@
+import random
+
+import numpy as np
+import pytest
+
+from ranking import RANK_METHODS, RankingIndex, assign_ranks, normalize_ranking, sort_keys
+
+
+def rebuilt(scores, method):
+    ids = np.array(sorted(scores), dtype=np.int64)
+    return RankingIndex.from_arrays(ids, np.array([scores[i] for i in ids], dtype=np.float64), method=method)
+
+
+def assert_same(index, scores, method):
+    expected = rebuilt(scores, method)
+    ids, finals, ranks = index.arrays()
+    expected_ids, expected_finals, expected_ranks = expected.arrays()
+    assert ids.tolist() == expected_ids.tolist()
+    assert finals.tolist() == expected_finals.tolist()
+    assert ranks.tolist() == expected_ranks.tolist()
+    for contestant_id in scores:
+        assert index.rank(contestant_id) == expected.rank(contestant_id)
+        assert index.get_score(contestant_id) == scores[contestant_id]
+
+
+@pytest.mark.parametrize('method, expected', [
+    ('competition', [1, 2, 2, 4, 5]),
+    ('dense', [1, 2, 2, 3, 4]),
+    ('ordinal', [1, 2, 3, 4, 5]),
+])
+def test_rank_methods_with_ties(method, expected):
+    index = RankingIndex([(5, 90.0), (3, 85.0), (1, 85.0), (4, 80.0), (2, 70.0)], method=method)
+    assert [entry[0] for entry in index.top_k(5)] == [5, 1, 3, 4, 2]
+    assert [entry[2] for entry in index.top_k(5)] == expected
+    assert [index.rank(i) for i in (5, 1, 3, 4, 2)] == expected
+    assert index.rank(99) is None
+
+
+def test_tie_values_compared_after_rounding():
+    # 浮点累加误差不应把同分判为不同名次
+    index = RankingIndex([(1, 0.1 + 0.2), (2, 0.3)])
+    assert index.rank(1) == index.rank(2) == 1
+
+
+def test_tie_break_keys():
+    ids = np.array([1, 2, 3, 4])
+    values = {'final': np.array([80.0, 80.0, 80.0, 70.0]), 'mean': np.array([79.0, 81.0, 81.0, 70.0]),
+              'max': np.array([90.0, 85.0, 88.0, 75.0])}
+    rule = normalize_ranking({'method': 'competition', 'tie_break': ['mean', 'max']})
+    index = RankingIndex.from_arrays(ids, values['final'], sort_keys(ids, values, rule['tie_break']), rule['method'])
+    assert [(i, rank) for i, _, rank in index.top_k(4)] == [(3, 1), (2, 2), (1, 3), (4, 4)]
+    # 只按最终得分时前三人并列
+    assert assign_ranks(sort_keys(ids, values, []), 'dense').tolist() == [1, 1, 1, 2]
+
+
+def test_invalid_rules():
+    with pytest.raises(ValueError):
+        normalize_ranking({'method': 'olympic'})
+    with pytest.raises(ValueError):
+        normalize_ranking({'tie_break': ['mean', 'mean']})
+
+
+@pytest.mark.parametrize('method', list(RANK_METHODS))
+def test_updates_match_rebuild(method):
+    rng = random.Random(7)
+    scores = {i: float(rng.randint(0, 20)) for i in range(1, 60)}
+    index = rebuilt(scores, method)
+    for step in range(500):
+        contestant_id = rng.randint(1, 80)
+        if rng.random() < 0.2:
+            index.remove(contestant_id)
+            scores.pop(contestant_id, None)
+        else:
+            # 分数取值少，制造大量并列
+            scores[contestant_id] = float(rng.randint(0, 20))
+            index.update(contestant_id, scores[contestant_id])
+        if step % 25 == 0:
+            # 只读取部分名次后继续修改，检验按需补算的名次
+            index.top_k(rng.randint(1, 10))
+    assert len(index) == len(scores)
+    assert_same(index, scores, method)
+
+
+def test_arrays_are_unchanged_by_later_updates():
+    index = RankingIndex([(1, 90.0), (2, 80.0)])
+    ids, finals, ranks = index.arrays()
+    index.update(3, 95.0)
+    index.remove(1)
+    assert (ids.tolist(), finals.tolist(), ranks.tolist()) == ([1, 2], [90.0, 80.0], [1, 2])
+    assert index.top_k(5) == [(3, 95.0, 1), (2, 80.0, 2)]
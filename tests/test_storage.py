@@ -0,0 +1,77 @@
+from conftest import contestant
+from storage import create_storage
+
+
+def reopen(storage, backend, tmp_path):
+    # 新的存储实例不命中内存快照，读到的是磁盘上的数据
+    return create_storage(backend, str(tmp_path))
+
+
+def test_contestants_round_trip(storage, backend, tmp_path):
+    records = [contestant(1), contestant(2, name='李四', gender='女')]
+    assert storage.save_contestants(records)
+    for loaded in (storage.load_contestants(), reopen(storage, backend, tmp_path).load_contestants()):
+        assert [c['id'] for c in loaded] == [1, 2]
+        assert loaded[loaded.find('id', 2)]['name'] == '李四'
+        assert loaded.find('phone', records[0]['phone']) == 0
+        assert loaded.find('id', 3) is None
+
+
+def test_upsert_contestant_replaces_and_appends(storage, backend, tmp_path):
+    storage.save_contestants([contestant(1), contestant(2)])
+    assert storage.upsert_contestant(contestant(1, name='改名')) is not None
+    assert storage.insert_contestants([contestant(3)]) is not None
+    loaded = reopen(storage, backend, tmp_path).load_contestants()
+    assert [c['id'] for c in loaded] == [1, 2, 3]
+    assert loaded.find('name', '改名') == 0
+    assert loaded.find('name', '选手1') is None
+
+
+def test_scores_round_trip(storage, backend, tmp_path):
+    assert storage.save_scores({'1': [80.0, 90.0, 85.0], '2': [70.0]})
+    storage.upsert_scores(2, [70.0, 75.0, 72.5])
+    storage.upsert_judge_score(1, 1, 95.0)
+    storage.upsert_judge_score(3, 2, 60.0)
+    expected = {'1': [80.0, 95.0, 85.0], '2': [70.0, 75.0, 72.5], '3': [None, None, 60.0]}
+    assert storage.load_scores().to_dict() == expected
+    reopened = reopen(storage, backend, tmp_path)
+    assert reopened.load_scores().to_dict() == expected
+    assert reopened.load_contestant_scores(3) == [None, None, 60.0]
+    assert reopened.load_contestant_scores(4) == []
+
+
+def test_writes_advance_version(storage):
+    versions = [storage.get_version()]
+    storage.save_contestants([contestant(1)])
+    versions.append(storage.get_version())
+    before, after = storage.upsert_scores(1, [80.0, 80.0, 80.0])
+    assert before != after
+    versions.append(storage.get_version())
+    storage.save_settings(dict(storage.load_settings(), judge_count=5))
+    versions.append(storage.get_version())
+    assert len(set(map(str, versions))) == len(versions)
+
+
+def test_score_history_by_contestant(storage):
+    storage.upsert_scores(1, [80.0, 80.0, 80.0])
+    storage.upsert_scores(2, [70.0, 70.0, 70.0])
+    storage.upsert_judge_score(1, 0, 85.0)
+    history = storage.load_score_history()
+    for contestant_id in (1, 2, 3):
+        expected = [e for e in history if int(e['id']) == contestant_id]
+        assert storage.load_score_history(contestant_id) == expected
+    assert [e['score'] for e in storage.load_score_history(1)] == [80.0, 80.0, 80.0, 85.0]
+
+
+def test_load_mutate_save(data_manager):
+    # 基线用法：取出列表和字典修改后整体保存
+    data_manager.save_contestants([contestant(1)])
+    contestants = data_manager.load_contestants()
+    contestants.append(contestant(2))
+    contestants[0]['name'] = '改名'
+    assert data_manager.save_contestants(contestants)
+    scores = data_manager.load_scores()
+    scores['2'] = [90.0, 90.0, 90.0]
+    assert data_manager.save_scores(scores)
+    assert [c['name'] for c in data_manager.load_contestants()] == ['改名', '选手2']
+    assert data_manager.load_scores() == {'2': [90.0, 90.0, 90.0]}